@@ -5,19 +5,27 @@ Handles permissions, roles, and role-permission assignments
 
 import streamlit as st
 from auth_login.database import AuthenticationManager
+from auth_login.loader import RequestLoader
+from auth_login.rbac import WILDCARD, is_wildcard, matching_permissions
 
 
 class AccessControlTab:
     """Access Control Tab - Manage roles, permissions, and access rules"""
     
-    def __init__(self, auth_manager: AuthenticationManager):
+    # Modules (matrix rows) per Permission Matrix page
+    MATRIX_PAGE_SIZE = 50
+    
+    def __init__(self, auth_manager: AuthenticationManager, loader: RequestLoader = None):
         """
         Initialize Access Control tab
         
         Args:
             auth_manager: AuthenticationManager instance for database operations
+            loader: Per-rerun batching loader (created if not provided)
         """
         self.auth = auth_manager
+        self.loader = loader or RequestLoader(auth_manager)
+        self._all_permissions = None  # loaded once per render to expand wildcards
     
     def render(self):
         """Render the Access Control tab"""
@@ -62,14 +70,14 @@ class AccessControlTab:
                         )
                         perm_module = st.text_input(
                             "Module", 
-                            placeholder="e.g., reports",
+                            placeholder="e.g., reports, or * for every module",
                             key="new_perm_module"
                         )
                     
                     with col2:
                         perm_action = st.text_input(
                             "Action", 
-                            placeholder="e.g., view, create, edit, delete",
+                            placeholder="e.g., view, create, edit, delete, or * for every action",
                             key="new_perm_action"
                         )
                         perm_description = st.text_area(
@@ -118,31 +126,47 @@ class AccessControlTab:
         col_matrix_left, col_matrix_center, col_matrix_right = st.columns([0.01, 0.98, 0.01])
         
         with col_matrix_center:
+            col_module, col_action = st.columns(2)
+            with col_module:
+                module_filter = st.text_input(
+                    "Filter modules",
+                    placeholder="Filter by module",
+                    key="perm_matrix_module",
+                    label_visibility="collapsed"
+                )
+            with col_action:
+                action_filter = st.text_input(
+                    "Filter actions",
+                    placeholder="Filter by action",
+                    key="perm_matrix_action",
+                    label_visibility="collapsed"
+                )
+            
+            # Keyset cursors: the module that precedes each visited page.
+            # Reset to the first page whenever the filters change.
+            filters = (module_filter.strip(), action_filter.strip())
+            if st.session_state.get('perm_matrix_filters') != filters:
+                st.session_state['perm_matrix_filters'] = filters
+                st.session_state['perm_matrix_cursors'] = [None]
+            cursors = st.session_state['perm_matrix_cursors']
+            
             try:
-                permissions = self.auth.get_all_permissions()
+                # Matrix page is built in SQL and cached until permissions change
+                matrix = self.auth.get_permission_matrix(
+                    module=filters[0] or None,
+                    action=filters[1] or None,
+                    after_module=cursors[-1],
+                    limit=self.MATRIX_PAGE_SIZE
+                )
                 
-                if permissions:
-                    # Build matrix structure
-                    # Get unique modules and actions
-                    modules = sorted(list(set([p.get('module', 'General') for p in permissions])))
-                    actions = sorted(list(set([p.get('action', 'N/A') for p in permissions])))
-                    
-                    # Create permission lookup
-                    perm_lookup = {}
-                    for perm in permissions:
-                        module = perm.get('module', 'General')
-                        action = perm.get('action', 'N/A')
-                        key = f"{module}_{action}"
-                        perm_lookup[key] = perm
-                    
-                    # Create permission matrix data structure
+                if matrix['rows']:
+                    actions = matrix['actions']
                     matrix_data = []
                     
-                    for module in modules:
-                        row = {"Module": f"📦 {module}"}
+                    for matrix_row in matrix['rows']:
+                        row = {"Module": f"📦 {matrix_row['module']}"}
                         for action in actions:
-                            key = f"{module}_{action}"
-                            row[action.capitalize()] = "✓" if key in perm_lookup else "✕"
+                            row[action.capitalize()] = "✓" if action in matrix_row['cells'] else "✕"
                         matrix_data.append(row)
                     
                     # Display using standard Streamlit dataframe
@@ -153,8 +177,31 @@ class AccessControlTab:
                     )
                     
                     # Show total count
-                    st.info(f"📊 Total Permissions: {len(permissions)} | Modules: {len(modules)} | Actions: {len(actions)}")
+                    st.info(f"📊 Total Permissions: {matrix['total_permissions']} | "
+                            f"Modules: {matrix['total_modules']} | Actions: {len(actions)}")
+                    
+                    # Page navigation
+                    col_prev, col_page, col_next = st.columns([1, 2, 1])
+                    
+                    with col_prev:
+                        if st.button("← Previous", key="perm_matrix_prev", disabled=len(cursors) == 1,
+                                     use_container_width=True):
+                            cursors.pop()
+                            st.rerun()
                     
+                    with col_page:
+                        st.markdown(f"<p style='text-align: center; margin: 0;'>Page {len(cursors)}</p>",
+                                    unsafe_allow_html=True)
+                    
+                    with col_next:
+                        if st.button("Next →", key="perm_matrix_next",
+                                     disabled=matrix['next_after_module'] is None,
+                                     use_container_width=True):
+                            cursors.append(matrix['next_after_module'])
+                            st.rerun()
+                    
+                elif any(filters):
+                    st.info("No permissions match the filters")
                 else:
                     st.info("No permissions found in the database")
             except Exception as e:
@@ -223,36 +270,36 @@ class AccessControlTab:
         
         with col_roles_center:
             try:
-                roles = self.auth.get_all_roles()
+                # Every role with its permissions pre-grouped by module, in one query
+                roles = self.auth.get_roles_with_permission_summary()
+                
+                # Direct inheritance edges of every role, in one query
+                inherits = {}
+                for edge in self.auth.get_role_inheritance():
+                    inherits.setdefault(edge['role_id'], []).append(edge['inherited_role_id'])
+                role_names = {role['id']: role['name'] for role in roles}
                 
                 if roles:
                     for role in roles:
-                        # Get permissions for this role
-                        role_permissions = self.auth.get_role_permissions(role['id'])
+                        perms_by_module = role['permissions_by_module']
                         
                         # Create expander for each role
                         with st.expander(f"🔷 {role.get('name')} (System Role)", expanded=False):
-                            st.markdown(f"**Description:** {role.get('description', 'N/A')}")
-                            st.markdown(f"**Created:** {role.get('created_by', 'N/A')}")
-                            st.markdown(f"**Assigned Permissions:** {len(role_permissions)}")
+                            st.markdown(f"**Description:** {role.get('description') or 'N/A'}")
+                            st.markdown(f"**Created:** {role.get('created_by') or 'N/A'}")
+                            st.markdown(f"**Assigned Permissions:** {role['permission_count']}")
+                            
+                            self._render_role_inheritance(role, role_names, inherits.get(role['id'], []))
                             
                             # View Assigned Permissions in nested expander
-                            if role_permissions:
+                            if perms_by_module:
                                 with st.expander("View Assigned Permissions", expanded=False):
                                     st.markdown("**Permissions by Module**")
                                     
-                                    # Group permissions by module
-                                    perms_by_module = {}
-                                    for perm in role_permissions:
-                                        module = perm.get('module', 'General')
-                                        if module not in perms_by_module:
-                                            perms_by_module[module] = []
-                                        perms_by_module[module].append(perm)
-                                    
                                     # Display permissions grouped by module (compact format)
                                     for module, perms in perms_by_module.items():
                                         # Get all actions for this module
-                                        actions = [perm.get('action', 'N/A').capitalize() for perm in perms]
+                                        actions = [self._format_action(perm) for perm in perms]
                                         # Display module with all actions on one line
                                         st.markdown(f"📦 **{module.capitalize()}** --> {', '.join(actions)}")
                             else:
@@ -262,6 +309,46 @@ class AccessControlTab:
             except Exception as e:
                 st.error(f"Error loading roles: {str(e)}")
     
+    def _format_action(self, perm):
+        """Action label of a role's permission; wildcards list what they cover"""
+        module, action = perm.get('module'), perm.get('action')
+        if not is_wildcard(module, action):
+            return (action or 'N/A').capitalize()
+        
+        if self._all_permissions is None:
+            self._all_permissions = self.auth.get_all_permissions()
+        covered = matching_permissions(module, action, self._all_permissions)
+        if module == WILDCARD:
+            labels = sorted({f"{p['module']}:{p['action']}" for p in covered})
+        else:
+            labels = sorted({(p['action'] or 'N/A').capitalize() for p in covered})
+        return f"{perm.get('name')} ({', '.join(labels) or 'nothing yet'})"
+    
+    def _render_role_inheritance(self, role, role_names, current_ids):
+        """Show and edit the roles a role inherits permissions from"""
+        role_id = role['id']
+        selected = st.multiselect(
+            "Inherits permissions from",
+            options=[rid for rid in role_names if rid != role_id],
+            default=current_ids,
+            format_func=lambda rid: role_names.get(rid, str(rid)),
+            key=f"role_inherits_{role_id}"
+        )
+        
+        if set(selected) == set(current_ids):
+            return
+        
+        if st.button("Save Inheritance", key=f"save_role_inherits_{role_id}", type="primary"):
+            try:
+                created_by = st.session_state.get('user_id', None)
+                self.auth.set_role_inheritance(role_id, selected, created_by)
+                st.success(f"✅ Inheritance updated for '{role['name']}'")
+                st.rerun()
+            except ValueError as e:
+                st.error(f"❌ {str(e)}")
+            except Exception as e:
+                st.error(f"❌ Error updating inheritance: {str(e)}")
+    
     def _render_role_permission_assignment_tab(self):
         """Render the Role-Permission Assignment tab"""
         st.markdown("### 🔗 Role-Permission Assignment")
@@ -328,43 +415,47 @@ class AccessControlTab:
                                 perms_by_module[module] = []
                             perms_by_module[module].append(perm)
                         
-                        # Display permissions grouped by module with accordions
+                        # Checkbox per permission, grouped by module with accordions
+                        selected_revoke = []
                         for module, perms in sorted(perms_by_module.items()):
                             with st.expander(f"📦 {module.capitalize()} ({len(perms)})", expanded=True):
                                 for perm in perms:
-                                    col_perm, col_btn = st.columns([0.75, 0.25])
-                                    
-                                    with col_perm:
-                                        # Display permission with icon
-                                        action = perm.get('action', 'N/A')
-                                        perm_name = perm.get('name', 'Unknown')
-                                        
-                                        # Icon based on action
-                                        icon = "•" 
-                                        
-                                        st.markdown(f"<span style='font-size: 1.1rem;'>{icon} <code>{perm_name}</code></span>", unsafe_allow_html=True)
-                                    
-                                    with col_btn:
-                                        # Remove button
-                                        if st.button(
-                                            "Remove",
-                                            key=f"remove_perm_{perm['id']}_{selected_role_id}",
-                                            type="secondary",
-                                            use_container_width=True
-                                        ):
-                                            if self.auth.remove_permission_from_role(selected_role_id, perm['id']):
-                                                st.session_state.permission_toast = {
-                                                    'type': 'success',
-                                                    'message': f"Permission '{perm_name}' removed from {selected_role_name}."
-                                                }
-                                                st.rerun()
-                                            else:
-                                                st.session_state.permission_toast = {
-                                                    'type': 'error',
-                                                    'message': f"Failed to remove permission '{perm_name}'."
-                                                }
-                                                st.rerun()
-
+                                    perm_name = perm.get('name', 'Unknown')
+                                    if st.checkbox(
+                                        f"• `{perm_name}`",
+                                        key=f"revoke_chk_{perm['id']}_{selected_role_id}"
+                                    ):
+                                        selected_revoke.append(perm['id'])
+                        
+                        col_revoke_sel, col_revoke_all = st.columns(2)
+                        with col_revoke_sel:
+                            if st.button(
+                                f"Revoke Selected ({len(selected_revoke)})",
+                                key=f"revoke_selected_{selected_role_id}",
+                                type="secondary",
+                                disabled=not selected_revoke,
+                                use_container_width=True
+                            ):
+                                self._apply_role_permission_changes(
+                                    selected_role_id, selected_role_name, revoke_ids=selected_revoke
+                                )
+                        with col_revoke_all:
+                            # Revoking everything is saved at once, so it takes a deliberate tick first
+                            confirm_revoke_all = st.checkbox(
+                                f"Confirm revoking all {len(assigned_permissions)}",
+                                key=f"revoke_all_confirm_{selected_role_id}"
+                            )
+                            if st.button(
+                                "Revoke All",
+                                key=f"revoke_all_{selected_role_id}",
+                                type="secondary",
+                                disabled=not confirm_revoke_all,
+                                use_container_width=True
+                            ):
+                                self._apply_role_permission_changes(
+                                    selected_role_id, selected_role_name,
+                                    revoke_ids=[p['id'] for p in assigned_permissions]
+                                )
                         
                         st.info(f"📊 Total: {len(assigned_permissions)} permission(s)")
                     else:
@@ -415,45 +506,45 @@ class AccessControlTab:
                                     perms_by_module[module] = []
                                 perms_by_module[module].append(perm)
                             
-                            # Display as compact accordions
+                            # Display as compact accordions with a checkbox per permission
+                            selected_grant = []
                             for module, perms in sorted(perms_by_module.items()):
                                 with st.expander(f"📦 {module.capitalize()} ({len(perms)})", expanded=False):
+                                    if st.button(
+                                        "Grant All in Module",
+                                        key=f"grant_module_{module}_{selected_role_id}",
+                                        type="primary",
+                                        use_container_width=True
+                                    ):
+                                        self._apply_role_permission_changes(
+                                            selected_role_id, selected_role_name,
+                                            grant_ids=[p['id'] for p in perms]
+                                        )
+                                    
                                     for perm in perms:
-                                        col_perm_name, col_assign_btn = st.columns([0.7, 0.3])
+                                        action = perm.get('action', 'N/A')
+                                        perm_name = perm.get('name', 'Unknown')
                                         
-                                        with col_perm_name:
-                                            action = perm.get('action', 'N/A')
-                                            perm_name = perm.get('name', 'Unknown')
-                                            
-                                            # Icon based on action
-                                            icon = "🔍" if action == "view" else "➕" if action == "create" else "✏️" if action == "edit" else "🗑️" if action == "delete" else "🔹"
-                                            
-                                            st.markdown(f"<span style='font-size: 1.1rem;'>{icon} <code>{perm_name}</code></span>", unsafe_allow_html=True)
-                                            
-                                            # Show description if available
-                                            if perm.get('description'):
-                                                st.caption(perm['description'])
+                                        # Icon based on action
+                                        icon = "🔍" if action == "view" else "➕" if action == "create" else "✏️" if action == "edit" else "🗑️" if action == "delete" else "🔹"
                                         
-                                        with col_assign_btn:
-                                            if st.button(
-                                                "Assign",
-                                                key=f"assign_perm_{perm['id']}_{selected_role_id}",
-                                                type="primary",
-                                                use_container_width=True
-                                            ):
-                                                created_by = st.session_state.get('user_id', None)
-                                                if self.auth.assign_permission_to_role(selected_role_id, perm['id'], created_by):
-                                                    st.session_state.permission_toast = {
-                                                        'type': 'success',
-                                                        'message': f"Permission '{perm_name}' added to {selected_role_name}."
-                                                    }
-                                                    st.rerun()
-                                                else:
-                                                    st.session_state.permission_toast = {
-                                                        'type': 'error',
-                                                        'message': f"Failed to add permission '{perm_name}'."
-                                                    }
-                                                    st.rerun()
+                                        if st.checkbox(
+                                            f"{icon} `{perm_name}`",
+                                            key=f"grant_chk_{perm['id']}_{selected_role_id}",
+                                            help=perm.get('description') or None
+                                        ):
+                                            selected_grant.append(perm['id'])
+                            
+                            if st.button(
+                                f"Grant Selected ({len(selected_grant)})",
+                                key=f"grant_selected_{selected_role_id}",
+                                type="primary",
+                                disabled=not selected_grant,
+                                use_container_width=True
+                            ):
+                                self._apply_role_permission_changes(
+                                    selected_role_id, selected_role_name, grant_ids=selected_grant
+                                )
                         else:
                             st.info(f"No permissions found matching '{search_query}'")
                     else:
@@ -461,4 +552,46 @@ class AccessControlTab:
                 
             except Exception as e:
                 st.error(f"Error loading role-permission assignment: {str(e)}")
-
+    
+    def _apply_role_permission_changes(self, role_id, role_name, grant_ids=None, revoke_ids=None):
+        """
+        Apply a bulk grant/revoke in one transaction, then rerun once
+        
+        Args:
+            role_id: The ID of the role
+            role_name: The name of the role (for the toast message)
+            grant_ids: IDs of permissions to grant
+            revoke_ids: IDs of permissions to revoke
+        """
+        grant_ids = grant_ids or []
+        revoke_ids = revoke_ids or []
+        
+        try:
+            result = self.auth.set_role_permissions(
+                role_id,
+                grant_ids=grant_ids,
+                revoke_ids=revoke_ids,
+                actor=st.session_state.get('user_id', None)
+            )
+            changes = []
+            if result['granted']:
+                changes.append(f"{result['granted']} permission(s) added to")
+            if result['revoked']:
+                changes.append(f"{result['revoked']} permission(s) removed from")
+            st.session_state.permission_toast = {
+                'type': 'success',
+                'message': f"{' and '.join(changes) or 'No changes to'} {role_name}."
+            }
+        except Exception as e:
+            st.session_state.permission_toast = {
+                'type': 'error',
+                'message': f"Failed to update permissions for {role_name}: {str(e)}"
+            }
+        
+        # Clear checkbox selections for permissions that moved between panels
+        for perm_id in grant_ids + revoke_ids:
+            st.session_state.pop(f"grant_chk_{perm_id}_{role_id}", None)
+            st.session_state.pop(f"revoke_chk_{perm_id}_{role_id}", None)
+        st.session_state.pop(f"revoke_all_confirm_{role_id}", None)
+        
+        st.rerun()
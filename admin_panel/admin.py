@@ -3,8 +3,10 @@ Admin Panel Main Orchestrator
 Coordinates all admin panel components and handles navigation
 """
 
+import logging
 import streamlit as st
 from auth_login.database import AuthenticationManager
+from auth_login.loader import RequestLoader
 from admin_panel.user_management import UserManagementTab
 from admin_panel.access_control import AccessControlTab
 from admin_panel.user_activity import UserActivityTab
@@ -18,9 +20,12 @@ class AdminPanelPage:
         """Initialize admin panel page"""
         self.auth_manager = AuthenticationManager()
         
+        # Batches and memoizes lookups for this rerun only
+        self.loader = RequestLoader(self.auth_manager)
+        
         # Initialize tab components
-        self.user_management = UserManagementTab(self.auth_manager)
-        self.access_control = AccessControlTab(self.auth_manager)
+        self.user_management = UserManagementTab(self.auth_manager, self.loader)
+        self.access_control = AccessControlTab(self.auth_manager, self.loader)
         self.user_activity = UserActivityTab(self.auth_manager)
         
         # Initialize session state for current section
@@ -115,6 +120,8 @@ class AdminPanelPage:
         
         # Additional spacing
         st.markdown("<br><br>", unsafe_allow_html=True)
+        
+        logging.info(f"Admin panel rerun issued {self.loader.query_count} queries")
 
 
 class AdminPanelApp:
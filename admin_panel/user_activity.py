@@ -3,11 +3,17 @@ User Activity Tab for Admin Panel
 Handles user activity monitoring and logs
 """
 
+import os
+import tempfile
 import streamlit as st
 import plotly.express as px
 import pandas as pd
 from datetime import datetime, timedelta
-from auth_login.database import AuthenticationManager
+from auth_login.database import AuthenticationManager, get_login_journal_stats, get_daily_login_counter_stats
+from auth_login.hashing import get_hasher
+from auth_login.export import (
+    export_table, export_filename, export_command, EXPORT_QUERIES, EXPORT_FORMATS, PANEL_EXPORT_MAX_MB
+)
 
 
 class UserActivityTab:
@@ -131,9 +137,18 @@ class UserActivityTab:
                 index=1,  # Default to 10
                 key="top_users_filter"
             )
+        with col_filter2:
+            period_options = {"All time": None, "Last 30 days": 30, "Last 90 days": 90}
+            period = st.selectbox(
+                "Period:",
+                options=list(period_options.keys()),
+                key="top_users_period"
+            )
         
-        # Fetch top users data
-        top_users = self.auth.get_top_users_by_login_count(limit=top_n)
+        # Fetch top users data; a bounded period only reads the matching login partitions
+        period_days = period_options[period]
+        since = datetime.now() - timedelta(days=period_days) if period_days else None
+        top_users = self.auth.get_top_users_by_login_count(limit=top_n, since=since)
         
         if top_users:
             # Prepare data for bar chart
@@ -172,3 +187,138 @@ class UserActivityTab:
             st.plotly_chart(fig_top_users, use_container_width=True)
         else:
             st.info("No login data available yet.")
+        
+        st.markdown("<br>", unsafe_allow_html=True)
+        
+        # ==================== PASSWORD HASHING ====================
+        self._render_password_hashing()
+        
+        st.markdown("<br>", unsafe_allow_html=True)
+        
+        # ==================== LOGIN WRITE PATH ====================
+        self._render_login_write_path()
+        
+        st.markdown("<br>", unsafe_allow_html=True)
+        
+        # ==================== AUDIT EXPORT ====================
+        self._render_audit_export()
+    
+    def _render_password_hashing(self):
+        """Render bcrypt calibration and stored hash cost distribution"""
+        st.subheader("🔒 Password Hashing")
+        
+        hasher_stats = get_hasher().get_stats()
+        calibration = hasher_stats['calibration']
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric(label="Target Cost", value=hasher_stats['rounds'])
+        with col2:
+            measured = calibration.get('measured_ms')
+            st.metric(label="Hash Time", value=f"{measured} ms" if measured is not None else "Fixed")
+        with col3:
+            st.metric(label="Rehashed on Login", value=hasher_stats['rehashed'])
+        with col4:
+            st.metric(label="Rejected (Busy)", value=hasher_stats['rejected'])
+        
+        hash_costs = self.auth.get_password_hash_costs()
+        if hash_costs:
+            df_costs = pd.DataFrame(hash_costs)
+            df_costs['cost'] = df_costs['cost'].astype(str)
+            fig_costs = px.bar(
+                df_costs,
+                x='cost',
+                y='user_count',
+                title='Stored Password Hashes by bcrypt Cost',
+                labels={
+                    'cost': 'Cost Factor',
+                    'user_count': 'Users'
+                }
+            )
+            fig_costs.update_layout(
+                showlegend=False,
+                height=350,
+                margin=dict(l=50, r=50, t=80, b=50)
+            )
+            st.plotly_chart(fig_costs, use_container_width=True)
+        else:
+            st.info("No password hashes found.")
+    
+    def _render_login_write_path(self):
+        """Render write-behind login journal and daily counter metrics"""
+        st.subheader("📝 Login Write Path")
+        
+        journals = get_login_journal_stats()
+        counters = get_daily_login_counter_stats()
+        
+        if not journals and not counters:
+            st.info("No logins recorded by this server process yet.")
+            return
+        
+        journal = journals[0] if journals else {}
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric(label="Journal Queue Depth", value=journal.get('queue_depth', 0),
+                      help=f"Peak {journal.get('max_depth', 0)} of {journal.get('max_pending', 0)}")
+        with col2:
+            st.metric(label="Avg Flush", value=f"{journal.get('avg_flush_ms', 0.0):.1f} ms",
+                      help=f"Last {journal.get('last_flush_ms', 0.0):.1f} ms, max {journal.get('max_flush_ms', 0.0):.1f} ms")
+        with col3:
+            st.metric(label="Sync Fallbacks", value=journal.get('sync_fallbacks', 0))
+        with col4:
+            st.metric(label="Unflushed Daily Counts", value=sum(c['pending_logins'] for c in counters))
+        
+        if journal:
+            st.caption(f"Journaled {journal['appended']} · written {journal['flushed']} in "
+                       f"{journal['flush_batches']} batches · {journal['flush_failures']} failed flushes · "
+                       f"{journal['replayed']} replayed after restart · {journal['segments']} spill segments")
+    
+    def _render_audit_export(self):
+        """Render the audit export form (streamed to a temp file, then downloaded if small enough)"""
+        st.subheader("📤 Audit Export")
+        st.caption(f"Downloads here are limited to {PANEL_EXPORT_MAX_MB} MB; "
+                   f"larger exports are given as a command to run on the server.")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            table = st.selectbox("Data", options=sorted(EXPORT_QUERIES), key="export_table")
+        with col2:
+            fmt = st.selectbox("Format", options=EXPORT_FORMATS, key="export_format")
+        with col3:
+            since = st.date_input("From", value=datetime.now().date() - timedelta(days=30),
+                                  key="export_since", disabled=table != 'user_logins')
+        with col4:
+            until = st.date_input("To (inclusive)", value=datetime.now().date(),
+                                  key="export_until", disabled=table != 'user_logins')
+        
+        if st.button("Prepare Export", key="export_prepare_btn", type="primary"):
+            since_ts = datetime.combine(since, datetime.min.time()) if table == 'user_logins' else None
+            until_ts = datetime.combine(until + timedelta(days=1), datetime.min.time()) if table == 'user_logins' else None
+            
+            tmp = tempfile.NamedTemporaryFile(suffix=f".{fmt}", delete=False)
+            try:
+                with st.spinner("Exporting..."):
+                    with tmp:
+                        export_table(self.auth, table, tmp, fmt, since_ts, until_ts)
+                
+                size = os.path.getsize(tmp.name)
+                if size > PANEL_EXPORT_MAX_MB * 1024 * 1024:
+                    # st.download_button keeps the whole file in server memory
+                    st.warning(f"⚠️ The export is {size / (1024 * 1024):.0f} MB, over the "
+                               f"{PANEL_EXPORT_MAX_MB} MB panel limit. Run it from the command line:")
+                    st.code(export_command(table, fmt, since_ts, until_ts), language="bash")
+                else:
+                    with open(tmp.name, 'rb') as export_file:
+                        st.download_button(
+                            "⬇️ Download",
+                            data=export_file,
+                            file_name=export_filename(table, fmt),
+                            mime="application/octet-stream",
+                            key="export_download_btn"
+                        )
+            except ImportError as e:
+                st.error(f"❌ {str(e)}")
+            except Exception as e:
+                st.error(f"❌ Error exporting {table}: {str(e)}")
+            finally:
+                os.unlink(tmp.name)
@@ -5,19 +5,26 @@ Handles user CRUD operations and role assignments
 
 import streamlit as st
 from auth_login.database import AuthenticationManager
+from auth_login.loader import RequestLoader
+from auth_login.bulk_import import import_users, IMPORT_FIELDS
 
 
 class UserManagementTab:
     """User Management Tab - Manage users, roles, and permissions"""
     
-    def __init__(self, auth_manager: AuthenticationManager):
+    # Users rendered per directory page
+    PAGE_SIZE = 25
+    
+    def __init__(self, auth_manager: AuthenticationManager, loader: RequestLoader = None):
         """
         Initialize User Management tab
         
         Args:
             auth_manager: AuthenticationManager instance for database operations
+            loader: Per-rerun batching loader (created if not provided)
         """
         self.auth = auth_manager
+        self.loader = loader or RequestLoader(auth_manager)
     
     def render(self):
         """Render the User Management tab"""
@@ -26,6 +33,9 @@ class UserManagementTab:
         # Add User Form
         self._render_add_user_form()
         
+        # Bulk Import
+        self._render_bulk_import()
+        
         st.markdown("---")
         
         # Display existing users
@@ -123,97 +133,163 @@ class UserManagementTab:
                         except Exception as e:
                             st.error(f"❌ Error creating user: {str(e)}")
     
+    def _render_bulk_import(self):
+        """Render the bulk user import uploader"""
+        col_form_left, col_form_center, col_form_right = st.columns([0.01, 0.98, 0.01])
+        
+        with col_form_center:
+            with st.expander("📥 Bulk Import Users", expanded=False):
+                st.caption(
+                    f"Upload a CSV (with header row) or JSON list. Columns: {', '.join(IMPORT_FIELDS)}. "
+                    "Separate multiple roles with ';'."
+                )
+                uploaded_file = st.file_uploader(
+                    "Import file",
+                    type=["csv", "json"],
+                    key="bulk_import_file",
+                    label_visibility="collapsed"
+                )
+                
+                col_btn1, col_btn2, col_btn3 = st.columns([1, 1, 1])
+                with col_btn2:
+                    import_clicked = st.button(
+                        "Import Users",
+                        type="primary",
+                        key="bulk_import_btn",
+                        disabled=uploaded_file is None,
+                        use_container_width=True
+                    )
+                
+                if import_clicked and uploaded_file is not None:
+                    fmt = "json" if uploaded_file.name.lower().endswith(".json") else "csv"
+                    try:
+                        with st.spinner("Importing users..."):
+                            report = import_users(
+                                self.auth,
+                                uploaded_file.getvalue(),
+                                fmt,
+                                created_by=st.session_state.get('user_id')
+                            )
+                        
+                        st.success(
+                            f"✅ Created {report['created']} user(s) in {report['elapsed_seconds']:.1f}s "
+                            f"({report['users_per_sec']:.1f} users/sec)"
+                        )
+                        if report['skipped']:
+                            st.warning(
+                                f"Skipped {len(report['skipped'])}: "
+                                + ", ".join(f"{s['username']} ({s['reason']})" for s in report['skipped'][:20])
+                            )
+                        if report['unknown_roles']:
+                            st.warning(f"Unknown roles ignored: {', '.join(report['unknown_roles'])}")
+                        for error in report['errors'][:20]:
+                            st.error(f"❌ {error}")
+                    except ValueError as e:
+                        st.error(f"❌ {str(e)}")
+                    except Exception as e:
+                        st.error(f"❌ Error importing users: {str(e)}")
+    
     def _render_existing_users(self):
-        """Render existing users grouped by roles"""
+        """Render role membership controls and the paginated user directory"""
         try:
-            users = self.auth.get_all_users()
             all_roles = self.auth.get_all_roles()
             
-            if users:
-                # Create a mapping of role_id -> list of users
-                users_by_role = {}
-                users_without_roles = []
-                
-                # Get roles for each user and organize them
-                for user in users:
-                    user_roles = self.auth.get_user_roles(user['id'])
+            # Wrap in same column structure as Add New User form
+            col_users_left, col_users_center, col_users_right = st.columns([0.01, 0.98, 0.01])
+            
+            with col_users_center:
+                if all_roles:
+                    st.markdown("#### 🧩 Roles")
                     
-                    if user_roles:
-                        # User has roles - add to each role group
-                        for role in user_roles:
-                            role_name = role['name']
-                            if role_name not in users_by_role:
-                                users_by_role[role_name] = []
-                            users_by_role[role_name].append(user)
-                    else:
-                        # User has no roles
-                        users_without_roles.append(user)
-                
-                # Display users grouped by role
-                # Wrap in same column structure as Add New User form
-                col_users_left, col_users_center, col_users_right = st.columns([0.01, 0.98, 0.01])
-                
-                with col_users_center:
                     for role in all_roles:
-                        role_name = role['name']
-                        if role_name in users_by_role:
-                            # Create two columns: role heading on left, Manage Users button on right
-                            col_role_title, col_manage_btn = st.columns([3, 1])
-                            
-                            with col_role_title:
-                                st.markdown(f"#### 🧩 {role_name}")
-                            
-                            with col_manage_btn:
-                                manage_btn_key = f"manage_Users_{role['id']}"
-                                if st.button("Manage Users", key=manage_btn_key, type="secondary"):
-                                    self._render_manage_Users_drawer(role['id'], role_name)
-                            
-                            # Add spacing between Manage Users button and user cards
-                            # st.markdown("<br>", unsafe_allow_html=True)
-                            
-                            for user in users_by_role[role_name]:
-                                self._render_user_card(user, suffix="role")
-                            
-                            st.markdown("<br>", unsafe_allow_html=True)
-                    
-                    # Display roles without users
-                    roles_without_users = [role for role in all_roles if role['name'] not in users_by_role]
-                    
-                    if roles_without_users:
-                        st.markdown("#### 🛠 Roles Without Users")
-                        # st.markdown("<br>", unsafe_allow_html=True)
+                        # Create two columns: role heading on left, Manage Users button on right
+                        col_role_title, col_manage_btn = st.columns([3, 1])
                         
-                        for role in roles_without_users:
-                            # Create two columns: role heading on left, Manage Users button on right
-                            col_role_title, col_manage_btn = st.columns([3, 1])
-                            
-                            with col_role_title:
-                                st.markdown(f"<p style='font-size: 1.2rem; margin: 0;'>🧩 {role['name']}</p>", unsafe_allow_html=True)
-                                st.markdown("_No users assigned_")
-                            
-                            with col_manage_btn:
-                                manage_btn_key = f"manage_Users_empty_{role['id']}"
-                                if st.button("Manage Users", key=manage_btn_key, type="secondary"):
-                                    self._render_manage_Users_drawer(role['id'], role['name'])
-                            
-                            st.markdown("<br>", unsafe_allow_html=True)
-                
-                # Display users without roles
-                if users_without_roles:
-                    # Wrap in same column structure as Add New User form
-                    col_norole_left, col_norole_center, col_norole_right = st.columns([0.01, 0.98, 0.01])
-                    
-                    with col_norole_center:
-                        st.markdown("#### 👥 No Role Assigned")
+                        with col_role_title:
+                            st.markdown(f"<p style='font-size: 1.2rem; margin: 0;'>🧩 {role['name']}</p>", unsafe_allow_html=True)
                         
-                        for user in users_without_roles:
-                            self._render_user_card(user, suffix="norole")
-            
-            else:
-                st.info("No users found")
+                        with col_manage_btn:
+                            manage_btn_key = f"manage_Users_{role['id']}"
+                            if st.button("Manage Users", key=manage_btn_key, type="secondary"):
+                                self._render_manage_Users_drawer(role['id'], role['name'])
+                    
+                    st.markdown("<br>", unsafe_allow_html=True)
+                
+                st.markdown("#### 👥 User Directory")
+                self._render_user_directory(all_roles)
         except Exception as e:
             st.error(f"Error: {str(e)}")
     
+    def _render_user_directory(self, all_roles):
+        """
+        Render a searchable, page-by-page list of users
+        
+        Args:
+            all_roles: Active roles, used for the role filter
+        """
+        col_search, col_role = st.columns([2, 1])
+        
+        with col_search:
+            search_query = st.text_input(
+                "🔍 Search users...",
+                placeholder="Search by username, name or email",
+                key="user_directory_search",
+                label_visibility="collapsed"
+            )
+        
+        with col_role:
+            role_options = {"All roles": None}
+            role_options.update({role['name']: role['id'] for role in all_roles})
+            selected_role = st.selectbox(
+                "Filter by role",
+                options=list(role_options.keys()),
+                key="user_directory_role",
+                label_visibility="collapsed"
+            )
+        
+        # Keyset cursors: the after_id that starts each visited page.
+        # Reset to the first page whenever the filters change.
+        filters = (search_query.strip(), role_options[selected_role])
+        if st.session_state.get('user_directory_filters') != filters:
+            st.session_state['user_directory_filters'] = filters
+            st.session_state['user_directory_cursors'] = [None]
+        cursors = st.session_state['user_directory_cursors']
+        
+        page = self.auth.list_users(
+            after_id=cursors[-1],
+            limit=self.PAGE_SIZE,
+            query=filters[0] or None,
+            role_id=filters[1]
+        )
+        users = page['users']
+        
+        if users:
+            # Get roles for the whole page in one batch
+            self.loader.user_roles.prime(user['id'] for user in users)
+            
+            for user in users:
+                self._render_user_card(user, suffix="dir")
+        else:
+            st.info("No users found")
+        
+        # Page navigation
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        
+        with col_prev:
+            if st.button("← Previous", key="user_directory_prev", disabled=len(cursors) == 1,
+                         use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        
+        with col_page:
+            st.markdown(f"<p style='text-align: center; margin: 0;'>Page {len(cursors)}</p>", unsafe_allow_html=True)
+        
+        with col_next:
+            if st.button("Next →", key="user_directory_next", disabled=page['next_after_id'] is None,
+                         use_container_width=True):
+                cursors.append(page['next_after_id'])
+                st.rerun()
+    
     def _render_user_card(self, user, suffix=""):
         """
         Render a user card with details and actions
@@ -222,7 +298,7 @@ class UserManagementTab:
             user: User dictionary
             suffix: Suffix for unique keys (e.g., "role" or "norole")
         """
-        user_roles = self.auth.get_user_roles(user['id'])
+        user_roles = self.loader.user_roles.load(user['id'])
         role_names = ", ".join([r['name'] for r in user_roles]) if user_roles else "None"
         
         # Expandable user card
@@ -518,19 +594,15 @@ class UserManagementTab:
             if st.button("Save Changes", key="save_drawer", type="primary", use_container_width=True):
                 try:
                     current_user_id = st.session_state.get('user_id')
-                    changes_made = False
-                    
-                    # Remove users
-                    if st.session_state.get('Users_to_remove'):
-                        for user_id in st.session_state['Users_to_remove']:
-                            if self.auth.remove_user_role(user_id, role_id):
-                                changes_made = True
                     
-                    # Add users
-                    if st.session_state.get('Users_to_add'):
-                        for user_id in st.session_state['Users_to_add']:
-                            if self.auth.assign_role_to_user(user_id, role_id, current_user_id):
-                                changes_made = True
+                    # Apply all pending additions and removals in one transaction
+                    result = self.auth.set_role_members(
+                        role_id,
+                        add_ids=st.session_state.get('Users_to_add', set()),
+                        remove_ids=st.session_state.get('Users_to_remove', set()),
+                        actor=current_user_id
+                    )
+                    changes_made = result['added'] > 0 or result['removed'] > 0
                     
                     if changes_made:
                         st.success(f"✅ Successfully updated Users for '{role_name}'!")
@@ -0,0 +1,188 @@
+"""
+Login History Archive
+Retention for the monthly user_logins partitions: old months are written to
+compressed files, detached and dropped; archives can be restored and
+re-attached for audits.
+"""
+
+import os
+import gzip
+import logging
+from datetime import datetime
+from typing import Dict
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from auth_login.database import AuthenticationManager, login_partition_month, add_months, month_start
+from auth_login.export import export_query, parquet_schema, pq, PARQUET_BATCH_ROWS
+
+# Months of login history kept attached to user_logins
+LOGIN_RETENTION_MONTHS = int(os.getenv('LOGIN_RETENTION_MONTHS', '12'))
+
+# Where detached months are written
+LOGIN_ARCHIVE_DIR = os.getenv('LOGIN_ARCHIVE_DIR', os.path.join('archive', 'user_logins'))
+
+ARCHIVE_FORMATS = ['csv.gz', 'parquet']
+
+ARCHIVE_COLUMNS = ['id', 'user_id', 'login_time', 'login_status']
+
+
+def _count_rows(auth: AuthenticationManager, name: str) -> int:
+    with auth.get_cursor() as cur:
+        cur.execute(sql.SQL("SELECT COUNT(*) AS row_count FROM {}").format(sql.Identifier(name)))
+        return cur.fetchone()['row_count']
+
+
+def _archive_query(auth: AuthenticationManager, name: str) -> str:
+    query = sql.SQL("SELECT {} FROM {} ORDER BY id").format(
+        sql.SQL(', ').join(map(sql.Identifier, ARCHIVE_COLUMNS)), sql.Identifier(name)
+    )
+    with auth.get_cursor() as cur:
+        return query.as_string(cur)
+
+
+def _archived_rows(path: str, fmt: str) -> int:
+    if fmt == 'parquet':
+        return pq.ParquetFile(path).metadata.num_rows
+    with gzip.open(path, 'rt', newline='') as f:
+        return sum(1 for _ in f) - 1  # header row
+
+
+def archive_login_partition(auth: AuthenticationManager, name: str, directory: str = None,
+                            fmt: str = 'csv.gz', keep_table: bool = False) -> Dict:
+    """
+    Write one monthly partition to a compressed file, detach it and drop it.
+
+    The file is written while the partition is still attached, so a failed
+    export leaves user_logins untouched and the next run retries it. The
+    table is only dropped after its row count matches the file's; if that
+    check fails it is re-attached.
+
+    Args:
+        auth: AuthenticationManager instance for database operations
+        name: Partition name, e.g. user_logins_p202401
+        directory: Archive directory (default: LOGIN_ARCHIVE_DIR)
+        fmt: One of ARCHIVE_FORMATS
+        keep_table: Leave the detached table in the database
+
+    Returns:
+        Dictionary with partition, path and rows
+    """
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unsupported archive format: {fmt}")
+    if login_partition_month(name) is None:
+        raise ValueError(f"Not a monthly login partition: {name}")
+
+    directory = directory or LOGIN_ARCHIVE_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.{fmt}")
+
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as out:
+            export_query(auth, _archive_query(auth, name), out, fmt, schema='user_logins')
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    if not auth.detach_login_partition(name):
+        raise RuntimeError(f"Could not detach {name} (see auth_errors.log)")
+
+    try:
+        # Counted once detached, so no row can arrive after the check
+        rows = _count_rows(auth, name)
+        if _archived_rows(path, fmt) != rows:
+            raise RuntimeError(f"Archive {path} does not match {name}; the partition was re-attached")
+    except Exception:
+        if not auth.attach_login_partition(name):
+            logging.error(f"Could not re-attach {name}; it is still in the database, attach it to user_logins by hand")
+        raise
+
+    if not keep_table:
+        with auth.get_cursor() as cur:
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+
+    logging.info(f"Archived {rows} logins from {name} to {path}")
+    return {'partition': name, 'path': path, 'rows': rows}
+
+
+def maintain_login_partitions(auth: AuthenticationManager, retention_months: int = None,
+                              directory: str = None, fmt: str = 'csv.gz',
+                              months_ahead: int = None) -> Dict:
+    """
+    Create upcoming monthly partitions and archive those past retention.
+
+    Args:
+        auth: AuthenticationManager instance for database operations
+        retention_months: Whole months kept attached before the current one
+            (default: LOGIN_RETENTION_MONTHS)
+        directory: Archive directory (default: LOGIN_ARCHIVE_DIR)
+        fmt: One of ARCHIVE_FORMATS
+        months_ahead: Future partitions to keep ready (default: LOGIN_PARTITION_MONTHS_AHEAD)
+
+    Returns:
+        Dictionary with 'created' (partition names), 'archived' (archive
+        reports) and 'default_months' (months still in the DEFAULT partition)
+    """
+    retention_months = LOGIN_RETENTION_MONTHS if retention_months is None else retention_months
+    created = auth.ensure_login_partitions(months_ahead)
+
+    cutoff = add_months(month_start(datetime.now()), -retention_months)
+    archived = []
+    for partition in auth.list_login_partitions():
+        if partition['range_end'] is not None and partition['range_end'] <= cutoff:
+            archived.append(archive_login_partition(auth, partition['name'], directory, fmt))
+
+    return {'created': created, 'archived': archived,
+            'default_months': auth.get_default_login_partition_months()}
+
+
+def restore_login_archive(auth: AuthenticationManager, path: str, attach: bool = True) -> Dict:
+    """
+    Load an archive file back into a table and re-attach it to user_logins.
+
+    Args:
+        auth: AuthenticationManager instance for database operations
+        path: File written by archive_login_partition
+        attach: Attach the restored table (otherwise it stays standalone for ad-hoc queries)
+
+    Returns:
+        Dictionary with partition, rows and attached
+    """
+    filename = os.path.basename(path)
+    fmt = next((f for f in ARCHIVE_FORMATS if filename.endswith('.' + f)), None)
+    name = filename[:-len(fmt) - 1] if fmt else filename
+    if fmt is None or login_partition_month(name) is None:
+        raise ValueError(f"Not a login archive file: {path}")
+
+    table = sql.Identifier(name)
+    columns = sql.SQL(', ').join(map(sql.Identifier, ARCHIVE_COLUMNS))
+
+    with auth.get_cursor() as cur:
+        cur.execute(sql.SQL(
+            "CREATE TABLE {} (LIKE user_logins INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ).format(table))
+
+        if fmt == 'csv.gz':
+            copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, HEADER)").format(table, columns)
+            with gzip.open(path, 'rb') as f:
+                cur.copy_expert(copy_sql.as_string(cur), f)
+        else:
+            parquet_schema('user_logins')  # raises if pyarrow is missing
+            insert_sql = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(table, columns).as_string(cur)
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=PARQUET_BATCH_ROWS, columns=ARCHIVE_COLUMNS):
+                rows = [tuple(row[c] for c in ARCHIVE_COLUMNS) for row in batch.to_pylist()]
+                execute_values(cur, insert_sql, rows, page_size=1000)
+
+    rows = _count_rows(auth, name)
+    attached = attach and auth.attach_login_partition(name)
+    if attach and not attached:
+        raise RuntimeError(f"Restored {name} but could not attach it (see auth_errors.log)")
+
+    logging.info(f"Restored {rows} logins from {path} into {name}")
+    return {'partition': name, 'rows': rows, 'attached': attached}
@@ -0,0 +1,95 @@
+"""
+Bulk User Import
+Parses CSV/JSON user lists for AuthenticationManager.bulk_create_users
+"""
+
+import io
+import csv
+import json
+from typing import Dict, List, Tuple
+
+from auth_login.database import AuthenticationManager
+
+# Columns accepted in import files; username and password are required
+IMPORT_FIELDS = ['username', 'password', 'email', 'full_name', 'phone_number', 'is_admin', 'extra', 'roles']
+
+_TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+def _parse_roles(value) -> List[str]:
+    """Roles may be a list or a ';'-separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(';')
+    return [name.strip() for name in value if name and name.strip()]
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in _TRUE_VALUES
+
+
+def parse_user_records(content, fmt: str) -> Tuple[List[Dict], List[str]]:
+    """
+    Parse an import file into user records.
+
+    Args:
+        content: File content (str or bytes)
+        fmt: 'csv' (header row required) or 'json' (list of objects)
+
+    Returns:
+        Tuple of (valid records, error messages for rejected rows)
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+
+    if fmt == 'csv':
+        rows = list(csv.DictReader(io.StringIO(content)))
+    elif fmt == 'json':
+        rows = json.loads(content)
+        if not isinstance(rows, list):
+            raise ValueError("JSON import must be a list of user objects")
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+    records, errors = [], []
+    for line, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append(f"Row {line}: expected an object")
+            continue
+
+        username = (row.get('username') or '').strip()
+        password = row.get('password') or ''
+        if not username or not password:
+            errors.append(f"Row {line}: username and password are required")
+            continue
+
+        records.append({
+            'username': username,
+            'password': password,
+            'email': row.get('email') or None,
+            'full_name': row.get('full_name') or None,
+            'phone_number': row.get('phone_number') or None,
+            'is_admin': _parse_bool(row.get('is_admin')),
+            'extra': row.get('extra') or None,
+            'roles': _parse_roles(row.get('roles')),
+        })
+
+    return records, errors
+
+
+def import_users(auth: AuthenticationManager, content, fmt: str, created_by: int = None) -> Dict:
+    """
+    Parse and import a user file in one transaction.
+
+    Returns:
+        The bulk_create_users report plus 'errors' for rows rejected while parsing
+    """
+    records, errors = parse_user_records(content, fmt)
+    report = auth.bulk_create_users(records, created_by=created_by) if records else {
+        'created': 0, 'skipped': [], 'unknown_roles': [], 'elapsed_seconds': 0.0, 'users_per_sec': 0.0
+    }
+    report['errors'] = errors
+    return report
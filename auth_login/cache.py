@@ -0,0 +1,142 @@
+"""
+In-Process Caches
+Thread-safe LRU + TTL cache shared by every manager in the process
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire after a fixed TTL.
+
+    Loads that race with an invalidation are not stored, so an entry read
+    from the database before a write can never outlive that write.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0):
+        """
+        Initialize the cache
+
+        Args:
+            max_size: Maximum number of entries before least-recently-used eviction
+            ttl: Seconds an entry stays valid
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped by every invalidation; callers memoizing entries compare it"""
+        return self._generation
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self._expirations += 1
+            self._misses += 1
+            generation = self._generation
+
+        value = loader()
+
+        with self._lock:
+            if generation == self._generation:
+                self._store(key, value)
+        return value
+
+    def set(self, key, value):
+        """Store a value"""
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def invalidate(self, key):
+        """Drop one entry"""
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+
+    def invalidate_where(self, predicate):
+        """Drop every entry for which predicate(key, value) is true"""
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._generation += 1
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        """Get hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }
+
+
+class VersionRegistry:
+    """
+    Named change counters for cached, derived views of a table.
+
+    Writers bump a name after changing the table; caches put the current
+    version in their keys, so entries built from older data are simply never
+    hit again and age out of the LRU.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> int:
+        """Current version of name (0 until first bumped)"""
+        with self._lock:
+            return self._versions.get(name, 0)
+
+    def bump(self, name: str) -> int:
+        """Record a change to name and return the new version"""
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            return self._versions[name]
+
+    def snapshot(self) -> Dict[str, int]:
+        """Get every version"""
+        with self._lock:
+            return dict(self._versions)
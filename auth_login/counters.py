@@ -0,0 +1,156 @@
+"""
+Write-Behind Login Counters
+Sharded in-process accumulation of the user_daily_login counters
+"""
+
+import time
+import logging
+import itertools
+import threading
+from datetime import date
+from typing import Callable, Dict, List, Tuple
+
+# Deltas handed to the flush callback: {date_stamp: [success_count, failed_count]}
+Deltas = Dict[date, List[int]]
+
+
+class DailyLoginCounters:
+    """
+    Per-day success/failed login counters accumulated in memory.
+
+    Every login used to UPSERT the one user_daily_login row for today, so
+    concurrent logins queued on that row's lock. Here each thread adds to
+    one of several shards (each with its own lock), and a background thread
+    drains all shards and hands the summed deltas to flush_fn, which writes
+    them with one additive UPSERT. Failed flushes are merged back and
+    retried on the next interval.
+
+    Crash guarantees: deltas live only in this process until flushed. A
+    clean shutdown flushes at exit; a hard crash (SIGKILL, OOM, power loss)
+    loses at most the counts recorded since the last successful flush,
+    i.e. about flush_interval seconds of logins, or longer if the database
+    was unreachable. user_logins still holds every attempt, so lost counts
+    can be recomputed with AuthenticationManager.rebuild_daily_login_counts().
+    """
+
+    def __init__(self, flush_fn: Callable[[Deltas], None], flush_interval: float = 5.0, shards: int = 16):
+        """
+        Initialize the counters
+
+        Args:
+            flush_fn: Callable persisting {date: [success, failed]} deltas; raises on failure
+            flush_interval: Seconds between background flushes
+            shards: Number of independently locked shards
+        """
+        self._flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self._shards: List[Tuple[threading.Lock, Deltas]] = [(threading.Lock(), {}) for _ in range(shards)]
+        # Each thread gets the next shard round-robin on first use (thread
+        # idents are aligned addresses, so ident % shards would pick one shard)
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._in_flight: Deltas = {}  # drained, being written by flush()
+        self._flushes = 0
+        self._flush_failures = 0
+        self._flushed_logins = 0
+        self._last_flush_ms = 0.0
+
+    def add(self, login_status: str, day: date = None):
+        """Count one login attempt ('success' or anything else for failed)"""
+        self._ensure_started()
+        day = day or date.today()
+        column = 0 if login_status == 'success' else 1
+        lock, counts = self._shards[self._shard_index()]
+        with lock:
+            row = counts.get(day)
+            if row is None:
+                row = counts[day] = [0, 0]
+            row[column] += 1
+
+    def _shard_index(self) -> int:
+        index = getattr(self._local, 'shard', None)
+        if index is None:
+            index = self._local.shard = next(self._next_shard) % len(self._shards)
+        return index
+
+    def _merge(self, into: Deltas, deltas: Deltas):
+        for day, (success, failed) in deltas.items():
+            row = into.setdefault(day, [0, 0])
+            row[0] += success
+            row[1] += failed
+
+    def pending(self) -> Deltas:
+        """Unflushed deltas (including a flush in progress), without draining them"""
+        total: Deltas = {}
+        self._merge(total, self._in_flight)
+        for lock, counts in self._shards:
+            with lock:
+                self._merge(total, counts)
+        return total
+
+    def _drain(self) -> Deltas:
+        total: Deltas = {}
+        for lock, counts in self._shards:
+            with lock:
+                self._merge(total, counts)
+                counts.clear()
+        return total
+
+    def flush(self) -> bool:
+        """Write every unflushed delta now; False if the write failed (deltas are kept)"""
+        with self._flush_lock:
+            deltas = self._drain()
+            if not deltas:
+                return True
+            self._in_flight = deltas
+            start = time.perf_counter()
+            try:
+                self._flush_fn(deltas)
+            except Exception as e:
+                logging.error(f"Error flushing daily login counters: {e}")
+                self._flush_failures += 1
+                # Put the deltas back so the next flush retries them
+                lock, counts = self._shards[0]
+                with lock:
+                    self._merge(counts, deltas)
+                return False
+            finally:
+                self._in_flight = {}
+            self._flushes += 1
+            self._flushed_logins += sum(success + failed for success, failed in deltas.values())
+            self._last_flush_ms = (time.perf_counter() - start) * 1000
+            return True
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="daily-login-flusher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the background flusher and flush what is left (process shutdown)"""
+        self._stop.set()
+        self.flush()
+
+    def get_stats(self) -> Dict:
+        """Get pending and flush counters"""
+        pending = self.pending()
+        return {
+            'pending_logins': sum(success + failed for success, failed in pending.values()),
+            'flush_interval': self.flush_interval,
+            'shards': len(self._shards),
+            'flushes': self._flushes,
+            'flush_failures': self._flush_failures,
+            'flushed_logins': self._flushed_logins,
+            'last_flush_ms': self._last_flush_ms,
+        }
@@ -1,12 +1,26 @@
 import os
+import time
+import hashlib
+import uuid
+import atexit
+import threading
 from dotenv import load_dotenv
 import psycopg2
-from psycopg2.pool import SimpleConnectionPool
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, execute_values
+from collections import Counter
 from contextlib import contextmanager
-import bcrypt
+from datetime import date, datetime, timedelta
 import logging
 from typing import Dict, List, Optional
+from auth_login.hashing import get_hasher, hash_passwords_parallel, ServerBusyError
+from auth_login.cache import TTLCache, VersionRegistry
+from auth_login.counters import DailyLoginCounters
+from auth_login.journal import LoginJournal, event_login_time
+from auth_login.notify import RBACListener, RBAC_CHANNEL
+from auth_login.rbac import RBACSnapshot, PermissionMatrix, role_closure, is_wildcard
 
 # Load environment variables from .env file
 load_dotenv()
@@ -19,6 +33,398 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Connection pool sizing (shared by every manager in the process)
+POOL_MIN_CONN = int(os.getenv('DB_POOL_MIN_CONN', '1'))
+POOL_MAX_CONN = int(os.getenv('DB_POOL_MAX_CONN', '10'))
+
+# Rows fetched per round trip by the streaming iter_* readers
+STREAM_ITERSIZE = int(os.getenv('DB_STREAM_ITERSIZE', '2000'))
+
+# Monthly user_logins partitions kept ready ahead of the current month
+LOGIN_PARTITION_MONTHS_AHEAD = int(os.getenv('LOGIN_PARTITION_MONTHS_AHEAD', '3'))
+
+# ==================== SHARED CONNECTION POOLS ====================
+
+# One pool per DSN for the whole process. Streamlit re-runs the script on every
+# interaction, so managers are short-lived; the pools they use must not be.
+_pools: Dict[str, ThreadedConnectionPool] = {}
+_pool_refcounts: Dict[str, int] = {}
+_pools_lock = threading.Lock()
+
+
+def acquire_pool(connection_string: str) -> ThreadedConnectionPool:
+    """Get the shared pool for a DSN, creating it on first use"""
+    with _pools_lock:
+        pool = _pools.get(connection_string)
+        if pool is None or pool.closed:
+            pool = ThreadedConnectionPool(POOL_MIN_CONN, POOL_MAX_CONN, connection_string)
+            _pools[connection_string] = pool
+            _pool_refcounts[connection_string] = 0
+        _pool_refcounts[connection_string] += 1
+        return pool
+
+
+def release_pool(connection_string: str):
+    """
+    Drop one reference to the shared pool for a DSN.
+    
+    The pool stays open when the count reaches zero so the next rerun can
+    reuse its connections; use close_all_pools() to actually tear down.
+    """
+    with _pools_lock:
+        if _pool_refcounts.get(connection_string, 0) > 0:
+            _pool_refcounts[connection_string] -= 1
+
+
+def close_all_pools():
+    """Close every shared pool (process shutdown)"""
+    with _pools_lock:
+        for dsn, pool in list(_pools.items()):
+            try:
+                pool.closeall()
+            except Exception as e:
+                logging.error(f"Error closing connection pool: {e}")
+        _pools.clear()
+        _pool_refcounts.clear()
+
+
+def get_pool_stats() -> List[Dict]:
+    """Get reference counts and connection usage for each shared pool"""
+    with _pools_lock:
+        return [
+            {
+                'refcount': _pool_refcounts.get(dsn, 0),
+                'in_use': len(pool._used),
+                'idle': len(pool._pool),
+                'max_connections': pool.maxconn,
+            }
+            for dsn, pool in _pools.items()
+        ]
+
+
+atexit.register(close_all_pools)
+
+# ==================== DAILY LOGIN COUNTERS ====================
+
+# Seconds between flushes of the in-process user_daily_login deltas
+DAILY_LOGIN_FLUSH_INTERVAL = float(os.getenv('DAILY_LOGIN_FLUSH_INTERVAL', '5'))
+DAILY_LOGIN_COUNTER_SHARDS = int(os.getenv('DAILY_LOGIN_COUNTER_SHARDS', '16'))
+
+# One set of counters per DSN, flushed by a background thread and at exit
+_daily_counters: Dict[str, DailyLoginCounters] = {}
+_daily_counters_lock = threading.Lock()
+
+
+def get_daily_login_counters(connection_string: str) -> DailyLoginCounters:
+    """Get the process-wide daily login counters for a DSN"""
+    with _daily_counters_lock:
+        counters = _daily_counters.get(connection_string)
+        if counters is None:
+            counters = DailyLoginCounters(
+                flush_fn=lambda deltas: _flush_daily_login_deltas(connection_string, deltas),
+                flush_interval=DAILY_LOGIN_FLUSH_INTERVAL,
+                shards=DAILY_LOGIN_COUNTER_SHARDS
+            )
+            _daily_counters[connection_string] = counters
+        return counters
+
+
+def _flush_daily_login_deltas(connection_string: str, deltas):
+    auth = AuthenticationManager(connection_string)
+    try:
+        auth.apply_daily_login_deltas(deltas)
+    finally:
+        auth.close_pool()
+
+
+def get_daily_login_counter_stats() -> List[Dict]:
+    """Get pending and flush metrics of every DSN's daily login counters"""
+    with _daily_counters_lock:
+        counters = list(_daily_counters.values())
+    return [c.get_stats() for c in counters]
+
+
+def flush_daily_login_counters():
+    """Flush every DSN's daily login counters (process shutdown)"""
+    with _daily_counters_lock:
+        counters = list(_daily_counters.values())
+    for c in counters:
+        c.close()
+
+
+# Registered after close_all_pools, so it runs first at exit
+atexit.register(flush_daily_login_counters)
+
+# ==================== LOGIN JOURNAL ====================
+
+# Write-behind journal for user_logins (set LOGIN_JOURNAL_ENABLED=0 to insert synchronously)
+LOGIN_JOURNAL_ENABLED = os.getenv('LOGIN_JOURNAL_ENABLED', '1') != '0'
+LOGIN_JOURNAL_DIR = os.getenv('LOGIN_JOURNAL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'journal'))
+LOGIN_JOURNAL_MAX_PENDING = int(os.getenv('LOGIN_JOURNAL_MAX_PENDING', '10000'))
+LOGIN_JOURNAL_BATCH_SIZE = int(os.getenv('LOGIN_JOURNAL_BATCH_SIZE', '1000'))
+LOGIN_JOURNAL_FLUSH_INTERVAL = float(os.getenv('LOGIN_JOURNAL_FLUSH_INTERVAL', '0.5'))
+LOGIN_JOURNAL_FSYNC = os.getenv('LOGIN_JOURNAL_FSYNC', '0') == '1'
+
+# One journal per DSN, each with its own spill directory
+_login_journals: Dict[str, LoginJournal] = {}
+_login_journals_lock = threading.Lock()
+
+
+def get_login_journal(connection_string: str) -> Optional[LoginJournal]:
+    """Get the process-wide login journal for a DSN (None when disabled)"""
+    if not LOGIN_JOURNAL_ENABLED:
+        return None
+    with _login_journals_lock:
+        journal = _login_journals.get(connection_string)
+        if journal is None:
+            dsn_key = hashlib.sha1(connection_string.encode('utf-8')).hexdigest()[:12]
+            try:
+                journal = LoginJournal(
+                    directory=os.path.join(LOGIN_JOURNAL_DIR, dsn_key),
+                    flush_fn=lambda events: _write_login_events(connection_string, events),
+                    replay_fn=lambda events: _write_login_events(connection_string, events, skip_existing=True),
+                    max_pending=LOGIN_JOURNAL_MAX_PENDING,
+                    batch_size=LOGIN_JOURNAL_BATCH_SIZE,
+                    flush_interval=LOGIN_JOURNAL_FLUSH_INTERVAL,
+                    fsync=LOGIN_JOURNAL_FSYNC,
+                    # Rows the database rejects (e.g. user deleted meanwhile) never write
+                    permanent_errors=(psycopg2.IntegrityError, psycopg2.DataError)
+                )
+            except OSError as e:
+                # No usable spill directory: record logins synchronously instead
+                logging.error(f"Login journal unavailable, writing logins synchronously: {e}")
+                return None
+            _login_journals[connection_string] = journal
+        return journal
+
+
+def _write_login_events(connection_string: str, events, skip_existing: bool = False):
+    auth = AuthenticationManager(connection_string)
+    try:
+        written = auth.write_login_events(events, skip_existing=skip_existing)
+    finally:
+        auth.close_pool()
+    
+    # Daily counters only count attempts that are in user_logins. Keys compare
+    # by instant; the returned times are in the database's zone, which dates them
+    db_times = {key: key[1] for key in written}
+    counters = get_daily_login_counters(connection_string)
+    for e in events:
+        key = (e['user_id'], event_login_time(e), e['login_status'])
+        if e.get('count_daily') and written[key] > 0:
+            written[key] -= 1
+            counters.add(e['login_status'], day=db_times[key].date())
+
+
+def get_login_journal_stats() -> List[Dict]:
+    """Get queue depth and flush latency metrics of every login journal"""
+    with _login_journals_lock:
+        journals = list(_login_journals.values())
+    return [journal.get_stats() for journal in journals]
+
+
+def close_login_journals():
+    """Flush and close every login journal (process shutdown)"""
+    with _login_journals_lock:
+        journals = list(_login_journals.values())
+    for journal in journals:
+        journal.close()
+
+
+# Registered last, so journals are written before counters flush and pools close
+atexit.register(close_login_journals)
+
+# ==================== LOGIN PARTITIONS ====================
+
+def month_start(value) -> date:
+    """First day of the month of a date or datetime"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    """Shift a month start by a number of months"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def login_partition_name(month: date) -> str:
+    """Name of the user_logins partition holding a month, e.g. user_logins_p202501"""
+    return f"user_logins_p{month:%Y%m}"
+
+
+def login_partition_month(name: str) -> Optional[date]:
+    """First day of the month a partition (or archive) name covers, or None"""
+    prefix = 'user_logins_p'
+    stamp = name[len(prefix):len(prefix) + 6]
+    if not name.startswith(prefix) or len(stamp) != 6 or not stamp.isdigit():
+        return None
+    if not 1 <= int(stamp[4:]) <= 12:
+        return None
+    return date(int(stamp[:4]), int(stamp[4:]), 1)
+
+
+# ==================== PERMISSION CACHE ====================
+
+# Authorization context per user: {'is_admin', 'is_active', 'role_ids'}, or
+# None for unknown users. User mutators below invalidate the users they touch.
+_permission_cache = TTLCache(
+    max_size=int(os.getenv('PERMISSION_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('PERMISSION_CACHE_TTL', '60'))
+)
+
+# Compiled permission bitsets per role, shared by the whole process. Role
+# permission changes mark just that role for reloading; the whole snapshot is
+# recompiled once it is older than the permission cache TTL, which bounds how
+# long a change made by another process can go unseen.
+_rbac_snapshot = RBACSnapshot(max_age=_permission_cache.ttl)
+_rbac_snapshot_lock = threading.Lock()
+
+
+# Change versions of tables behind cached views ('permissions', ...). Writers
+# bump a version after committing; caches keyed on it never serve older data.
+_data_versions = VersionRegistry()
+
+# Permission matrix pages keyed by (permissions version, filters, page). The
+# TTL only bounds staleness from writes made by other processes.
+_permission_matrix_cache = TTLCache(
+    max_size=int(os.getenv('PERMISSION_MATRIX_CACHE_SIZE', '64')),
+    ttl=float(os.getenv('PERMISSION_MATRIX_CACHE_TTL', '300'))
+)
+
+
+def get_permission_cache() -> TTLCache:
+    """Get the process-wide user authorization cache"""
+    return _permission_cache
+
+
+def get_rbac_snapshot() -> RBACSnapshot:
+    """Get the process-wide compiled RBAC snapshot"""
+    return _rbac_snapshot
+
+
+def get_data_versions() -> VersionRegistry:
+    """Get the process-wide table change versions"""
+    return _data_versions
+
+
+def get_permission_matrix_cache() -> TTLCache:
+    """Get the process-wide permission matrix cache"""
+    return _permission_matrix_cache
+
+
+def _invalidate_user_permissions(user_id: int):
+    _permission_cache.invalidate(user_id)
+
+
+def _invalidate_role_permissions(role_id: int):
+    _rbac_snapshot.mark_role_stale(role_id)
+
+
+def _invalidate_role_hierarchy():
+    # Cached entries list inherited roles; an edge change can touch any of them
+    _permission_cache.clear()
+
+
+# ==================== CROSS-PROCESS INVALIDATION ====================
+
+# Listen for the RBAC triggers' NOTIFYs (see ensure_rbac_notify_triggers)
+RBAC_LISTEN_ENABLED = os.getenv('RBAC_LISTEN_ENABLED', '1') != '0'
+
+# Cache TTLs (and RBAC snapshot max age) while a listener is connected and
+# the triggers are installed; the configured (short) TTLs apply otherwise
+RBAC_LISTENING_CACHE_TTL = float(os.getenv('RBAC_LISTENING_CACHE_TTL', '3600'))
+_default_cache_ttls = {
+    'permission': _permission_cache.ttl,
+    'matrix': _permission_matrix_cache.ttl,
+}
+
+# Tables whose changes are announced on RBAC_CHANNEL
+RBAC_NOTIFY_TABLES = ['users', 'roles', 'user_roles', 'role_inheritance', 'permission_roles', 'permissions']
+
+_rbac_listeners: Dict[str, RBACListener] = {}
+_rbac_listeners_lock = threading.Lock()
+
+
+def _apply_rbac_change(kind: str, ids: Optional[List[int]]):
+    """Evict what one RBAC change notification affects (ids None: every row)"""
+    if kind == 'user':
+        if ids is None:
+            _permission_cache.clear()
+        else:
+            for user_id in ids:
+                _permission_cache.invalidate(user_id)
+    elif kind in ('role', 'role_permissions'):
+        if kind == 'role':
+            # Activation and inheritance change which roles cached user entries list
+            _permission_cache.clear()
+        if ids is None:
+            _rbac_snapshot.invalidate()
+        else:
+            for role_id in ids:
+                _rbac_snapshot.mark_role_stale(role_id)
+    elif kind == 'permission':
+        _data_versions.bump('permissions')
+        _rbac_snapshot.invalidate()
+
+
+def _reset_rbac_caches(connection_string: str, listening: bool):
+    """
+    Drop every cached RBAC entry; notifications may have been missed.
+    
+    Long TTLs are only used while listening with the triggers installed;
+    otherwise the configured short TTLs (and snapshot max age) are forced
+    and the reason is logged.
+    """
+    long_ttl = False
+    if listening:
+        auth = AuthenticationManager(connection_string)
+        try:
+            long_ttl = auth.rbac_notify_triggers_installed()
+        finally:
+            auth.close_pool()
+        if not long_ttl:
+            logging.warning(
+                "RBAC notify triggers are not installed (run: python -m auth_login.maintenance "
+                f"install-rbac-notify); keeping {_default_cache_ttls['permission']}s permission cache "
+                "and snapshot expiry"
+            )
+    else:
+        logging.warning(
+            f"RBAC listener disconnected; permission cache and snapshot expire after "
+            f"{_default_cache_ttls['permission']}s until it reconnects"
+        )
+    
+    _permission_cache.ttl = RBAC_LISTENING_CACHE_TTL if long_ttl else _default_cache_ttls['permission']
+    _permission_matrix_cache.ttl = RBAC_LISTENING_CACHE_TTL if long_ttl else _default_cache_ttls['matrix']
+    _rbac_snapshot.max_age = RBAC_LISTENING_CACHE_TTL if long_ttl else _default_cache_ttls['permission']
+    _permission_cache.clear()
+    _permission_matrix_cache.clear()
+    _rbac_snapshot.invalidate()
+
+
+def ensure_rbac_listener(connection_string: str):
+    """Start the process-wide RBAC change listener for a DSN, once"""
+    if not RBAC_LISTEN_ENABLED:
+        return
+    with _rbac_listeners_lock:
+        if connection_string in _rbac_listeners:
+            return
+        listener = RBACListener(
+            connection_string,
+            on_change=_apply_rbac_change,
+            on_reset=lambda listening: _reset_rbac_caches(connection_string, listening)
+        )
+        _rbac_listeners[connection_string] = listener
+    listener.start()
+
+
+def get_rbac_listener_stats() -> List[Dict]:
+    """Get connection state and notification counters of every RBAC listener"""
+    with _rbac_listeners_lock:
+        listeners = list(_rbac_listeners.values())
+    return [listener.get_stats() for listener in listeners]
+
+
 class AuthenticationManager:
     """Authentication manager for user login with role-based access control"""
     
@@ -29,11 +435,21 @@ class AuthenticationManager:
         if not self.connection_string:
             raise ValueError("DATABASE_URL not found in environment variables")
         
+        # Database round trips (cursor checkouts) made through this manager
+        self.query_count = 0
+        
+        # Authorization contexts memoized for this manager's lifetime (a rerun)
+        self._authorization_contexts: Dict[int, Optional[Dict]] = {}
+        self._authorization_generation = None
+        
         try:
-            self.pool = SimpleConnectionPool(1, 10, self.connection_string)
+            self.pool = acquire_pool(self.connection_string)
+            self._pool_released = False
         except Exception as e:
             logging.error(f"Failed to initialize connection pool: {e}")
             raise Exception("Failed to initialize connection pool")
+        
+        ensure_rbac_listener(self.connection_string)
     
     @contextmanager
     def get_connection(self):
@@ -47,6 +463,7 @@ class AuthenticationManager:
     @contextmanager
     def get_cursor(self):
         """Get a cursor for executing queries"""
+        self.query_count += 1
         with self.get_connection() as conn:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
             try:
@@ -59,25 +476,56 @@ class AuthenticationManager:
             finally:
                 cursor.close()
     
+    def iter_query(self, query: str, params=None, itersize: int = None):
+        """
+        Stream query results through a named server-side cursor.
+        
+        Rows are fetched itersize at a time and yielded as-is (RealDictRow),
+        so memory stays flat however large the result is. The connection is
+        held until the generator is exhausted or closed.
+        """
+        self.query_count += 1
+        with self.get_connection() as conn:
+            cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}", cursor_factory=RealDictCursor)
+            cursor.itersize = itersize or STREAM_ITERSIZE
+            completed = False
+            try:
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield row
+                completed = True
+            except Exception as e:
+                logging.error(f"Database stream error: {e}")
+                raise
+            finally:
+                if completed:
+                    cursor.close()
+                    conn.commit()
+                else:
+                    conn.rollback()
+                    try:
+                        cursor.close()
+                    except Exception:
+                        pass
+    
     # ==================== PASSWORD SECURITY ====================
     
     def hash_password(self, password: str) -> str:
-        """Hash a password using bcrypt with salt"""
+        """Hash a password using bcrypt with salt (on the hashing worker pool)"""
         try:
-            salt = bcrypt.gensalt()
-            hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-            return hashed.decode('utf-8')
+            return get_hasher().hash(password)
+        except ServerBusyError:
+            raise
         except Exception as e:
             logging.error(f"Error hashing password: {e}")
             raise
     
     def verify_password(self, password: str, hashed_password: str) -> bool:
-        """Verify a password against its hash"""
+        """Verify a password against its hash (on the hashing worker pool)"""
         try:
-            return bcrypt.checkpw(
-                password.encode('utf-8'), 
-                hashed_password.encode('utf-8')
-            )
+            return get_hasher().verify(password, hashed_password)
+        except ServerBusyError:
+            raise
         except Exception as e:
             logging.error(f"Error verifying password: {e}")
             return False
@@ -115,6 +563,114 @@ class AuthenticationManager:
             logging.error(f"Error creating user: {e}")
             raise
     
+    def bulk_create_users(self, records: List[Dict], created_by: int = None) -> Dict:
+        """
+        Create many users (and their role assignments) in one transaction.
+        
+        Existing usernames are found with one query and skipped, passwords are
+        hashed across a process pool before any transaction is opened, then
+        rows are inserted with multi-row INSERTs and roles are assigned with
+        one set-based INSERT in one short transaction.
+        
+        Args:
+            records: Dictionaries with username, password and optionally email,
+                     full_name, phone_number, is_admin, extra and roles (names)
+            created_by: The ID of the user running the import
+        
+        Returns:
+            Dictionary with created, skipped, unknown_roles, elapsed_seconds
+            and users_per_sec
+        """
+        start = time.perf_counter()
+        skipped = []
+        
+        # Drop duplicates within the batch itself (first occurrence wins)
+        unique_records = {}
+        for record in records:
+            if record['username'] in unique_records:
+                skipped.append({'username': record['username'], 'reason': 'duplicate in import'})
+            else:
+                unique_records[record['username']] = record
+        
+        insert_query = """
+            INSERT INTO users (username, password_hash, email, full_name, phone_number, 
+                              is_admin, is_active, created_by, extra)
+            VALUES %s
+            ON CONFLICT DO NOTHING
+            RETURNING id, username
+        """
+        role_query = """
+            INSERT INTO user_roles (role_id, user_id, assigned_by)
+            SELECT a.role_id, a.user_id, %s
+            FROM unnest(%s::int[], %s::int[]) AS a(role_id, user_id)
+            ON CONFLICT (role_id, user_id) DO NOTHING
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute("SELECT username FROM users WHERE username = ANY(%s)", (list(unique_records),))
+                for row in cur.fetchall():
+                    unique_records.pop(row['username'], None)
+                    skipped.append({'username': row['username'], 'reason': 'already exists'})
+            
+            # bcrypt takes minutes for large imports; no connection is held meanwhile
+            new_records = list(unique_records.values())
+            hashes = hash_passwords_parallel([r['password'] for r in new_records], get_hasher().rounds)
+            
+            with self.get_cursor() as cur:
+                rows = [
+                    (r['username'], password_hash, r.get('email'), r.get('full_name'),
+                     r.get('phone_number'), bool(r.get('is_admin')), created_by, r.get('extra'))
+                    for r, password_hash in zip(new_records, hashes)
+                ]
+                created = execute_values(
+                    cur, insert_query, rows,
+                    template="(%s, %s, %s, %s, %s, %s, TRUE, %s, %s)",
+                    page_size=1000, fetch=True
+                )
+                user_ids = {row['username']: row['id'] for row in created}
+                
+                # Created by someone else while the passwords were hashing
+                for r in new_records:
+                    if r['username'] not in user_ids:
+                        skipped.append({'username': r['username'], 'reason': 'already exists'})
+                new_records = [r for r in new_records if r['username'] in user_ids]
+                
+                # Resolve every referenced role name with one query
+                role_names = {name for r in new_records for name in r.get('roles') or []}
+                role_ids = {}
+                if role_names:
+                    cur.execute(
+                        "SELECT id, name FROM roles WHERE name = ANY(%s) AND is_active = TRUE",
+                        (list(role_names),)
+                    )
+                    role_ids = {row['name']: row['id'] for row in cur.fetchall()}
+                
+                assignments = [
+                    (role_ids[name], user_ids[r['username']])
+                    for r in new_records for name in r.get('roles') or []
+                    if name in role_ids
+                ]
+                if assignments:
+                    cur.execute(role_query, (created_by,
+                                             [role_id for role_id, _ in assignments],
+                                             [user_id for _, user_id in assignments]))
+        except Exception as e:
+            logging.error(f"Error bulk creating users: {e}")
+            raise
+        
+        for user_id in user_ids.values():
+            _invalidate_user_permissions(user_id)
+        
+        elapsed = time.perf_counter() - start
+        return {
+            'created': len(user_ids),
+            'skipped': skipped,
+            'unknown_roles': sorted(role_names - set(role_ids)),
+            'elapsed_seconds': elapsed,
+            'users_per_sec': len(user_ids) / elapsed if elapsed > 0 else 0.0,
+        }
+    
     def get_user_by_username(self, username: str) -> Optional[Dict]:
         """Get user by username"""
         query = """
@@ -137,6 +693,7 @@ class AuthenticationManager:
         """
         Authenticate user with username and password.
         Returns user data if successful, None if failed.
+        Raises ServerBusyError when the password hashing queue is full.
         """
         user = self.get_user_by_username(username)
         
@@ -146,20 +703,21 @@ class AuthenticationManager:
         
         if not self.verify_password(password, user['password_hash']):
             logging.warning(f"Failed login attempt for user: {username}")
-            # Record failed login attempt
-            self.record_login_attempt(user['id'], 'failed')
-            # Increment daily failed count
-            self.increment_daily_login_count('failed')
+            # Record failed attempt and daily failed count
+            self.record_login_outcome(user['id'], 'failed')
             return None
         
-        # Update last login
-        self.update_last_login(user['id'])
-        
-        # Record successful login attempt
-        self.record_login_attempt(user['id'], 'success')
+        # Update last login, record attempt and daily success count
+        self.record_login_outcome(user['id'], 'success')
         
-        # Increment daily success count
-        self.increment_daily_login_count('success')
+        # Upgrade hashes created at a different cost factor, off the login path
+        hasher = get_hasher()
+        if hasher.needs_rehash(user['password_hash']):
+            user_id, old_hash = user['id'], user['password_hash']
+            hasher.rehash_in_background(
+                password,
+                lambda new_hash: self.replace_password_hash(user_id, old_hash, new_hash)
+            )
         
         # Remove password hash from response
         user_data = dict(user)
@@ -168,6 +726,62 @@ class AuthenticationManager:
         logging.info(f"User {username} logged in successfully")
         return user_data
     
+    def record_login_outcome(self, user_id: int, login_status: str = 'success') -> bool:
+        """
+        Record all login bookkeeping without waiting on the database.
+        
+        The attempt (and, on success, the last_login update) goes to the
+        write-behind login journal and is written in a batch by its flusher;
+        when the journal is disabled or full, update_last_login and
+        record_login_attempt run synchronously as one data-modifying CTE.
+        The user_daily_login counters are accumulated in process and flushed in
+        the background (see DailyLoginCounters), so logins no longer queue on
+        today's counter row; journaled attempts are counted only once they
+        are written.
+        
+        Args:
+            user_id: The ID of the user attempting to login
+            login_status: Status of the login attempt ('success' or 'failed')
+        
+        Returns:
+            bool: True if recorded successfully, False otherwise
+        """
+        journal = get_login_journal(self.connection_string)
+        if journal is not None and journal.append(user_id, login_status, touch_last_login=login_status == 'success',
+                                                  count_daily=True):
+            # Counted by the flusher once the attempt is written
+            return True
+        
+        recorded = self._record_login_outcome_now(user_id, login_status)
+        if recorded:
+            get_daily_login_counters(self.connection_string).add(login_status)
+        return recorded
+    
+    def _record_login_outcome_now(self, user_id: int, login_status: str) -> bool:
+        """Synchronous record_login_outcome (journal disabled, full or closed)"""
+        query = """
+            WITH touched AS (
+                UPDATE users
+                SET last_login = CURRENT_TIMESTAMP
+                WHERE id = %(user_id)s AND %(status)s = 'success'
+                RETURNING id
+            ), attempt AS (
+                INSERT INTO user_logins (user_id, login_time, login_status)
+                VALUES (%(user_id)s, CURRENT_TIMESTAMP, %(status)s)
+                RETURNING id
+            )
+            SELECT (SELECT id FROM attempt) AS login_id
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, {'user_id': user_id, 'status': login_status})
+                result = cur.fetchone()
+                return result is not None and result['login_id'] is not None
+        except Exception as e:
+            logging.error(f"Error recording login outcome: {e}")
+            return False
+    
     def update_last_login(self, user_id: int) -> bool:
         """Update user's last login timestamp"""
         query = """
@@ -188,6 +802,9 @@ class AuthenticationManager:
         """
         Record a login attempt in the user_logins table.
         
+        Goes through the write-behind login journal when it is enabled and
+        has room; otherwise inserts synchronously.
+        
         Args:
             user_id: The ID of the user attempting to login
             login_status: Status of the login attempt ('success' or 'failed')
@@ -195,6 +812,10 @@ class AuthenticationManager:
         Returns:
             bool: True if recorded successfully, False otherwise
         """
+        journal = get_login_journal(self.connection_string)
+        if journal is not None and journal.append(user_id, login_status):
+            return True
+        
         query = """
             INSERT INTO user_logins (user_id, login_time, login_status)
             VALUES (%s, CURRENT_TIMESTAMP, %s)
@@ -209,46 +830,146 @@ class AuthenticationManager:
             logging.error(f"Error recording login attempt: {e}")
             return False
     
+    def write_login_events(self, events: List[Dict], skip_existing: bool = False) -> Counter:
+        """
+        Write a batch of journaled login events in one transaction.
+        
+        Inserts every attempt with one multi-row INSERT and moves last_login
+        forward for the users with a successful attempt in the batch. The
+        events' UTC stamps are stored in the session time zone, like
+        CURRENT_TIMESTAMP on the synchronous path.
+        
+        Args:
+            events: Journal events (user_id, login_time, login_status, touch_last_login)
+            skip_existing: Skip attempts already in user_logins (replaying a
+                spill segment that may have been partly written)
+        
+        Returns:
+            Counter of the (user_id, login_time, login_status) rows inserted,
+            login_time timezone-aware
+        
+        Raises:
+            Exception: If the write fails (the journal keeps the events)
+        """
+        rows = [(e['user_id'], event_login_time(e), e['login_status']) for e in events]
+        
+        last_logins = {}
+        for e in events:
+            if e.get('touch_last_login'):
+                login_time = event_login_time(e)
+                if e['user_id'] not in last_logins or login_time > last_logins[e['user_id']]:
+                    last_logins[e['user_id']] = login_time
+        
+        if skip_existing:
+            insert = """
+                INSERT INTO user_logins (user_id, login_time, login_status)
+                SELECT v.user_id, v.login_time::timestamp, v.login_status
+                FROM (VALUES %s) AS v(user_id, login_time, login_status)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM user_logins ul
+                    WHERE ul.user_id = v.user_id
+                      AND ul.login_time = v.login_time::timestamp
+                      AND ul.login_status = v.login_status
+                )
+                RETURNING user_id, login_time::timestamptz AS login_time, login_status
+            """
+        else:
+            insert = """
+                INSERT INTO user_logins (user_id, login_time, login_status)
+                SELECT v.user_id, v.login_time::timestamp, v.login_status
+                FROM (VALUES %s) AS v(user_id, login_time, login_status)
+                RETURNING user_id, login_time::timestamptz AS login_time, login_status
+            """
+        
+        with self.get_cursor() as cur:
+            inserted = execute_values(cur, insert, rows, page_size=len(rows), fetch=True)
+            if last_logins:
+                execute_values(cur, """
+                    UPDATE users u
+                    SET last_login = GREATEST(u.last_login, v.login_time::timestamp)
+                    FROM (VALUES %s) AS v(user_id, login_time)
+                    WHERE u.id = v.user_id
+                """, sorted(last_logins.items()))
+        return Counter((row['user_id'], row['login_time'], row['login_status']) for row in inserted)
+    
     def increment_daily_login_count(self, login_status: str = 'success') -> bool:
         """
         Increment the daily login count for today's date.
-        Uses PostgreSQL's UPSERT to either create a new record or increment existing count.
+        
+        The increment is accumulated in process and written by the next
+        additive flush of the daily counters (see DailyLoginCounters for the
+        crash-time guarantees).
         
         Args:
             login_status: Status of the login ('success' or 'failed')
         
         Returns:
-            bool: True if updated successfully, False otherwise
+            bool: Always True; the write happens on the next flush
+        """
+        get_daily_login_counters(self.connection_string).add(login_status)
+        return True
+    
+    def apply_daily_login_deltas(self, deltas: Dict) -> None:
+        """
+        Add counter deltas to user_daily_login with one additive UPSERT.
+        
+        Args:
+            deltas: {date_stamp: [success_count, failed_count]}
+        
+        Raises:
+            Exception: If the write fails (the caller keeps the deltas)
+        """
+        query = """
+            INSERT INTO user_daily_login (date_stamp, success_count, failed_count)
+            VALUES %s
+            ON CONFLICT (date_stamp)
+            DO UPDATE SET success_count = user_daily_login.success_count + EXCLUDED.success_count,
+                          failed_count = user_daily_login.failed_count + EXCLUDED.failed_count
+        """
+        rows = [(day, success, failed) for day, (success, failed) in sorted(deltas.items())]
+        
+        with self.get_cursor() as cur:
+            execute_values(cur, query, rows)
+    
+    def rebuild_daily_login_counts(self, days: int = 30) -> int:
+        """
+        Recompute user_daily_login for the last N days from user_logins.
+        
+        Repairs counts lost when a process died before flushing. Counts still
+        pending in running processes are added on top when they flush, so run
+        this while the app is stopped or quiet.
+        
+        Returns:
+            Number of days rewritten, or -1 on error
+        """
+        query = """
+            INSERT INTO user_daily_login (date_stamp, success_count, failed_count)
+            SELECT login_time::date,
+                   COUNT(*) FILTER (WHERE login_status = 'success'),
+                   COUNT(*) FILTER (WHERE login_status <> 'success')
+            FROM user_logins
+            WHERE login_time >= CURRENT_DATE - %s
+            GROUP BY login_time::date
+            ON CONFLICT (date_stamp)
+            DO UPDATE SET success_count = EXCLUDED.success_count,
+                          failed_count = EXCLUDED.failed_count
         """
-        if login_status == 'success':
-            query = """
-                INSERT INTO user_daily_login (date_stamp, success_count, failed_count)
-                VALUES (CURRENT_DATE, 1, 0)
-                ON CONFLICT (date_stamp)
-                DO UPDATE SET success_count = user_daily_login.success_count + 1
-                RETURNING id
-            """
-        else:  # failed
-            query = """
-                INSERT INTO user_daily_login (date_stamp, success_count, failed_count)
-                VALUES (CURRENT_DATE, 0, 1)
-                ON CONFLICT (date_stamp)
-                DO UPDATE SET failed_count = user_daily_login.failed_count + 1
-                RETURNING id
-            """
         
         try:
             with self.get_cursor() as cur:
-                cur.execute(query)
-                return cur.fetchone() is not None
+                cur.execute(query, (days,))
+                return cur.rowcount
         except Exception as e:
-            logging.error(f"Error incrementing daily login count: {e}")
-            return False
+            logging.error(f"Error rebuilding daily login counts: {e}")
+            return -1
     
     def get_daily_login_stats(self, days: int = 30) -> List[Dict]:
         """
         Get daily login statistics for the last N days.
         
+        Persisted counts are combined with this process's unflushed deltas, so
+        today's numbers are live.
+        
         Args:
             days: Number of days to retrieve (default: 30)
         
@@ -266,40 +987,157 @@ class AuthenticationManager:
             with self.get_cursor() as cur:
                 cur.execute(query, (days,))
                 rows = cur.fetchall()
-                return [dict(row) for row in rows]
+                stats = {row['date_stamp']: dict(row) for row in rows}
         except Exception as e:
             logging.error(f"Error fetching daily login stats: {e}")
             return []
+        
+        first_day = date.today() - timedelta(days=days)
+        pending = get_daily_login_counters(self.connection_string).pending()
+        for day, (success, failed) in pending.items():
+            if day < first_day:
+                continue
+            row = stats.setdefault(day, {'date_stamp': day, 'success_count': 0, 'failed_count': 0})
+            row['success_count'] += success
+            row['failed_count'] += failed
+        
+        return sorted(stats.values(), key=lambda row: row['date_stamp'], reverse=True)
     
-    def get_top_users_by_login_count(self, limit: int = 10) -> List[Dict]:
+    def get_top_users_by_login_count(self, limit: int = 10, since: datetime = None) -> List[Dict]:
         """
         Get top users by their total login count.
         
+        Without since, reads the trigger-maintained user_login_counts rollup,
+        so the cost is an index scan of the top rows rather than a count over
+        all of user_logins; falls back to counting the raw log until the
+        rollup is installed (see ensure_login_count_rollup). With since, counts
+        the log for that window only, which touches just the partitions it covers.
+        
         Args:
             limit: Number of top users to retrieve (default: 10)
+            since: Only count logins at or after this timestamp
         
         Returns:
             List of dictionaries containing user_id, username, and login_count
         """
+        if since is not None:
+            return self._count_top_users_from_log(limit, since)
+        
         query = """
+            SELECT u.id as user_id, u.username, c.success_count as login_count
+            FROM user_login_counts c
+            INNER JOIN users u ON u.id = c.user_id
+            WHERE c.success_count > 0 AND u.is_active = TRUE
+            ORDER BY c.success_count DESC, c.user_id
+            LIMIT %s
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (limit,))
+                rows = cur.fetchall()
+                return [dict(row) for row in rows]
+        except psycopg2.errors.UndefinedTable:
+            logging.warning("user_login_counts is not installed; counting user_logins instead")
+            return self._count_top_users_from_log(limit)
+        except Exception as e:
+            logging.error(f"Error fetching top users by login count: {e}")
+            return []
+    
+    def _count_top_users_from_log(self, limit: int, since: datetime = None) -> List[Dict]:
+        conditions = ["ul.login_status = 'success'", "u.is_active = TRUE"]
+        params = []
+        
+        # A plain bound on login_time lets the planner skip older partitions
+        if since is not None:
+            conditions.append("ul.login_time >= %s")
+            params.append(since)
+        
+        query = f"""
             SELECT u.id as user_id, u.username, COUNT(ul.id) as login_count
             FROM users u
             INNER JOIN user_logins ul ON u.id = ul.user_id
-            WHERE ul.login_status = 'success' AND u.is_active = TRUE
+            WHERE {' AND '.join(conditions)}
             GROUP BY u.id, u.username
             ORDER BY login_count DESC
             LIMIT %s
         """
+        params.append(limit)
         
         try:
             with self.get_cursor() as cur:
-                cur.execute(query, (limit,))
+                cur.execute(query, params)
                 rows = cur.fetchall()
                 return [dict(row) for row in rows]
         except Exception as e:
             logging.error(f"Error fetching top users by login count: {e}")
             return []
     
+    def backfill_login_counts(self) -> int:
+        """
+        Rebuild user_login_counts from the raw user_logins log.
+        
+        Runs in one transaction holding a SHARE lock on user_logins, so no
+        login can be inserted (and counted by the trigger) halfway through.
+        
+        Returns:
+            Number of users with a rollup row afterwards, or -1 on error
+        """
+        try:
+            with self.get_cursor() as cur:
+                cur.execute("LOCK TABLE user_logins IN SHARE MODE")
+                cur.execute("TRUNCATE user_login_counts")
+                cur.execute("""
+                    INSERT INTO user_login_counts (user_id, success_count, failed_count, last_success_at)
+                    SELECT user_id,
+                           COUNT(*) FILTER (WHERE login_status = 'success'),
+                           COUNT(*) FILTER (WHERE login_status <> 'success'),
+                           MAX(login_time) FILTER (WHERE login_status = 'success')
+                    FROM user_logins
+                    WHERE user_id IS NOT NULL
+                    GROUP BY user_id
+                """)
+                return cur.rowcount
+        except Exception as e:
+            logging.error(f"Error backfilling login counts: {e}")
+            return -1
+    
+    def check_login_counts(self) -> List[Dict]:
+        """
+        Compare user_login_counts against the raw user_logins log.
+        
+        Both sides are read by one statement, so they come from the same
+        snapshot and concurrent logins cannot cause false mismatches.
+        
+        Returns:
+            One dictionary per mismatching user with user_id, expected_success,
+            actual_success, expected_failed and actual_failed (empty when consistent)
+        """
+        query = """
+            WITH expected AS (
+                SELECT user_id,
+                       COUNT(*) FILTER (WHERE login_status = 'success') AS success_count,
+                       COUNT(*) FILTER (WHERE login_status <> 'success') AS failed_count
+                FROM user_logins
+                WHERE user_id IS NOT NULL
+                GROUP BY user_id
+            )
+            SELECT COALESCE(e.user_id, c.user_id) AS user_id,
+                   COALESCE(e.success_count, 0) AS expected_success,
+                   COALESCE(c.success_count, 0) AS actual_success,
+                   COALESCE(e.failed_count, 0) AS expected_failed,
+                   COALESCE(c.failed_count, 0) AS actual_failed
+            FROM expected e
+            FULL OUTER JOIN user_login_counts c ON c.user_id = e.user_id
+            WHERE COALESCE(e.success_count, 0) <> COALESCE(c.success_count, 0)
+               OR COALESCE(e.failed_count, 0) <> COALESCE(c.failed_count, 0)
+            ORDER BY 1
+        """
+        
+        with self.get_cursor() as cur:
+            cur.execute(query)
+            return [dict(row) for row in cur.fetchall()]
+    
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Get user by ID"""
         query = """
@@ -318,12 +1156,37 @@ class AuthenticationManager:
             logging.error(f"Error fetching user by ID: {e}")
             return None
     
-    def update_user_password(self, user_id: int, new_password: str) -> bool:
-        """Update user password"""
-        if not new_password:
-            raise ValueError("New password is required")
+    def get_users_by_ids(self, user_ids: List[int]) -> Dict[int, Dict]:
+        """
+        Get many active users by ID in one query.
         
-        password_hash = self.hash_password(new_password)
+        Args:
+            user_ids: IDs of the users
+        
+        Returns:
+            Dictionary mapping user_id to user data
+        """
+        query = """
+            SELECT id, username, email, full_name, phone_number, 
+                   is_admin, is_active, last_login, created_by, extra
+            FROM users
+            WHERE id = ANY(%s) AND is_active = TRUE
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (list(user_ids),))
+                return {row['id']: dict(row) for row in cur.fetchall()}
+        except Exception as e:
+            logging.error(f"Error fetching users by IDs: {e}")
+            return {}
+    
+    def update_user_password(self, user_id: int, new_password: str) -> bool:
+        """Update user password"""
+        if not new_password:
+            raise ValueError("New password is required")
+        
+        password_hash = self.hash_password(new_password)
         
         query = """
             UPDATE users
@@ -340,6 +1203,52 @@ class AuthenticationManager:
             logging.error(f"Error updating password: {e}")
             return False
     
+    def replace_password_hash(self, user_id: int, old_hash: str, new_hash: str) -> bool:
+        """
+        Swap a user's password hash for a re-hashed equivalent.
+        
+        Only applies if the stored hash is still old_hash, so a password
+        changed in the meantime is never overwritten.
+        """
+        query = """
+            UPDATE users
+            SET password_hash = %s
+            WHERE id = %s AND password_hash = %s
+            RETURNING id
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (new_hash, user_id, old_hash))
+                return cur.fetchone() is not None
+        except Exception as e:
+            logging.error(f"Error replacing password hash: {e}")
+            return False
+    
+    def get_password_hash_costs(self) -> List[Dict]:
+        """
+        Get the distribution of bcrypt cost factors in users.password_hash.
+        
+        Returns:
+            List of dictionaries containing cost and user_count
+        """
+        query = """
+            SELECT split_part(password_hash, '$', 3)::int AS cost, COUNT(*) AS user_count
+            FROM users
+            WHERE password_hash LIKE '$2_$__$%'
+            GROUP BY cost
+            ORDER BY cost
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query)
+                rows = cur.fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logging.error(f"Error fetching password hash costs: {e}")
+            return []
+    
     # ==================== ROLE MANAGEMENT ====================
     
     def assign_role_to_user(self, user_id: int, role_id: int, assigned_by: int = None) -> bool:
@@ -358,6 +1267,53 @@ class AuthenticationManager:
         except Exception as e:
             logging.error(f"Error assigning role to user: {e}")
             return False
+        finally:
+            _invalidate_user_permissions(user_id)
+    
+    def set_role_members(self, role_id: int, add_ids: List[int] = None, remove_ids: List[int] = None,
+                         actor: int = None) -> Dict:
+        """
+        Apply a membership diff to a role in one transaction.
+        
+        Args:
+            role_id: The ID of the role
+            add_ids: IDs of users to assign to the role
+            remove_ids: IDs of users to remove from the role
+            actor: The ID of the user making the change
+        
+        Returns:
+            Dictionary with the number of users added and removed
+        """
+        add_ids = list(set(add_ids or []))
+        remove_ids = list(set(remove_ids or []))
+        
+        delete_query = """
+            DELETE FROM user_roles
+            WHERE role_id = %s AND user_id = ANY(%s)
+        """
+        insert_query = """
+            INSERT INTO user_roles (role_id, user_id, assigned_by)
+            SELECT %s, user_id, %s
+            FROM unnest(%s::int[]) AS user_id
+            ON CONFLICT (role_id, user_id) DO NOTHING
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                removed = added = 0
+                if remove_ids:
+                    cur.execute(delete_query, (role_id, remove_ids))
+                    removed = cur.rowcount
+                if add_ids:
+                    cur.execute(insert_query, (role_id, actor, add_ids))
+                    added = cur.rowcount
+                return {'added': added, 'removed': removed}
+        except Exception as e:
+            logging.error(f"Error setting role members: {e}")
+            raise
+        finally:
+            for user_id in add_ids + remove_ids:
+                _invalidate_user_permissions(user_id)
     
     def get_user_roles(self, user_id: int) -> List[Dict]:
         """Get all roles assigned to a user"""
@@ -421,6 +1377,36 @@ class AuthenticationManager:
             return []
     
 
+    def get_roles_for_users(self, user_ids: List[int]) -> Dict[int, List[Dict]]:
+        """
+        Get active roles for many users in one query.
+        
+        Args:
+            user_ids: IDs of the users
+        
+        Returns:
+            Dictionary mapping user_id to its list of roles
+        """
+        query = """
+            SELECT ur.user_id, r.id, r.name, r.description, r.is_active
+            FROM roles r
+            JOIN user_roles ur ON r.id = ur.role_id
+            WHERE ur.user_id = ANY(%s) AND r.is_active = TRUE
+            ORDER BY r.name
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (list(user_ids),))
+                roles_by_user = {}
+                for row in cur.fetchall():
+                    role = dict(row)
+                    roles_by_user.setdefault(role.pop('user_id'), []).append(role)
+                return roles_by_user
+        except Exception as e:
+            logging.error(f"Error fetching roles for users: {e}")
+            return {}
+    
     def create_role(self, name: str, description: str = None, created_by: int = None) -> Optional[Dict]:
         """Create a new role"""
         if not name:
@@ -473,6 +1459,50 @@ class AuthenticationManager:
             logging.error(f"Error fetching roles: {e}")
             return []
     
+    def get_roles_with_permission_summary(self) -> List[Dict]:
+        """
+        Get all active roles with their permissions grouped by module, in one query.
+        
+        Returns:
+            List of role dictionaries, each with permission_count and
+            permissions_by_module ({module: [permission, ...]}, modules sorted)
+        """
+        query = """
+            WITH per_module AS (
+                SELECT pr.role_id,
+                       COALESCE(p.module, 'General') AS module,
+                       json_agg(json_build_object(
+                           'id', p.id, 'name', p.name, 'description', p.description,
+                           'module', p.module, 'action', p.action
+                       ) ORDER BY p.action) AS permissions,
+                       COUNT(*) AS permission_count
+                FROM permission_roles pr
+                JOIN permissions p ON p.id = pr.permission_id
+                GROUP BY pr.role_id, COALESCE(p.module, 'General')
+            )
+            SELECT r.id, r.name, r.description, r.is_active, r.created_by,
+                   COALESCE(SUM(pm.permission_count), 0)::int AS permission_count,
+                   COALESCE(
+                       json_object_agg(pm.module, pm.permissions ORDER BY pm.module)
+                           FILTER (WHERE pm.module IS NOT NULL),
+                       '{}'::json
+                   ) AS permissions_by_module
+            FROM roles r
+            LEFT JOIN per_module pm ON pm.role_id = r.id
+            WHERE r.is_active = TRUE
+            GROUP BY r.id, r.name, r.description, r.is_active, r.created_by
+            ORDER BY r.name
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query)
+                rows = cur.fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logging.error(f"Error fetching role permission summary: {e}")
+            return []
+    
     def get_role_by_name(self, role_name: str) -> Optional[Dict]:
         """Get role by name"""
         query = """
@@ -490,170 +1520,772 @@ class AuthenticationManager:
             logging.error(f"Error fetching role: {e}")
             return None
     
-    # ==================== PERMISSIONS ====================
+    # ==================== ROLE HIERARCHY ====================
     
-    def get_user_permissions(self, user_id: int) -> List[Dict]:
-        """Get all permissions for a user through their roles"""
+    def get_role_inheritance(self) -> List[Dict]:
+        """Get every inheritance edge with both role names"""
         query = """
-            SELECT DISTINCT p.id, p.name, p.description, p.module, p.action
-            FROM permissions p
-            JOIN permission_roles pr ON p.id = pr.permission_id
-            JOIN roles r ON pr.role_id = r.id
-            JOIN user_roles ur ON r.id = ur.role_id
-            WHERE ur.user_id = %s AND r.is_active = TRUE
+            SELECT ri.role_id, r.name AS role_name,
+                   ri.inherited_role_id, i.name AS inherited_role_name
+            FROM role_inheritance ri
+            JOIN roles r ON r.id = ri.role_id
+            JOIN roles i ON i.id = ri.inherited_role_id
+            ORDER BY r.name, i.name
         """
         
         try:
             with self.get_cursor() as cur:
-                cur.execute(query, (user_id,))
-                rows = cur.fetchall()
-                return [dict(row) for row in rows]
+                cur.execute(query)
+                return [dict(row) for row in cur.fetchall()]
         except Exception as e:
-            logging.error(f"Error fetching user permissions: {e}")
+            logging.error(f"Error fetching role inheritance: {e}")
             return []
     
-    def has_permission(self, user_id: int, permission_name: str) -> bool:
-        """Check if user has a specific permission"""
-        # Admin users have all permissions
-        user = self.get_user_by_id(user_id)
-        if user and user['is_admin']:
-            return True
-        
+    def get_inherited_roles(self, role_id: int) -> List[Dict]:
+        """Get every role a role includes, directly (depth 1) or transitively"""
         query = """
-            SELECT EXISTS (
-                SELECT 1 FROM permissions p
-                JOIN permission_roles pr ON p.id = pr.permission_id
-                JOIN roles r ON pr.role_id = r.id
-                JOIN user_roles ur ON r.id = ur.role_id
-                WHERE ur.user_id = %s AND p.name = %s AND r.is_active = TRUE
-            )
+            SELECT r.id, r.name, r.is_active, rc.depth
+            FROM role_closure rc
+            JOIN roles r ON r.id = rc.descendant_id
+            WHERE rc.ancestor_id = %s
+            ORDER BY rc.depth, r.name
         """
         
         try:
             with self.get_cursor() as cur:
-                cur.execute(query, (user_id, permission_name))
-                result = cur.fetchone()
-                return result[0] if result else False
+                cur.execute(query, (role_id,))
+                return [dict(row) for row in cur.fetchall()]
         except Exception as e:
-            logging.error(f"Error checking permission: {e}")
-            return False
+            logging.error(f"Error fetching inherited roles: {e}")
+            return []
     
-    def get_all_permissions(self) -> List[Dict]:
-        """Get all available permissions"""
-        query = """
-            SELECT id, name, description, module, action
-            FROM permissions
-            ORDER BY module, action
+    def add_role_inheritance(self, role_id: int, inherited_role_id: int, created_by: int = None) -> bool:
+        """
+        Make a role include every permission of another role.
+        
+        Raises:
+            ValueError: If the edge would create a cycle
+        
+        Returns:
+            True if the edge was added, False if it already existed
+        """
+        if role_id == inherited_role_id:
+            raise ValueError("A role cannot inherit from itself")
+        
+        cycle_query = """
+            SELECT 1 FROM role_closure
+            WHERE ancestor_id = %s AND descendant_id = %s
+        """
+        insert_query = """
+            INSERT INTO role_inheritance (role_id, inherited_role_id, created_by)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (role_id, inherited_role_id) DO NOTHING
         """
         
         try:
             with self.get_cursor() as cur:
-                cur.execute(query)
-                rows = cur.fetchall()
-                return [dict(row) for row in rows]
+                # One hierarchy writer at a time, so the cycle check stays valid
+                cur.execute("LOCK TABLE role_inheritance IN SHARE ROW EXCLUSIVE MODE")
+                cur.execute(cycle_query, (inherited_role_id, role_id))
+                if cur.fetchone():
+                    raise ValueError("This inheritance would create a cycle")
+                cur.execute(insert_query, (role_id, inherited_role_id, created_by))
+                added = cur.rowcount > 0
+                if added:
+                    self._sync_role_closure(cur)
+                return added
+        except ValueError:
+            raise
         except Exception as e:
-            logging.error(f"Error fetching permissions: {e}")
-            return []
+            logging.error(f"Error adding role inheritance: {e}")
+            raise
+        finally:
+            _invalidate_role_hierarchy()
     
-    def create_permission(self, name: str, description: str = None, 
-                         module: str = None, action: str = None) -> Optional[Dict]:
-        """Create a new permission"""
-        if not name:
-            raise ValueError("Permission name is required")
+    def set_role_inheritance(self, role_id: int, inherited_ids: List[int], created_by: int = None) -> Dict:
+        """
+        Replace the roles a role inherits from in one transaction.
+        
+        The whole resulting edge set is validated with role_closure() before
+        anything is written, and role_closure is synced once.
+        
+        Args:
+            role_id: The ID of the role
+            inherited_ids: IDs of every role it should inherit from
+            created_by: The ID of the user making the change
+        
+        Raises:
+            ValueError: If the edges would create a cycle
+        
+        Returns:
+            Dictionary with the number of edges added and removed
+        """
+        wanted = set(inherited_ids)
+        if role_id in wanted:
+            raise ValueError("A role cannot inherit from itself")
+        
+        delete_query = """
+            DELETE FROM role_inheritance
+            WHERE role_id = %s AND inherited_role_id = ANY(%s)
+        """
+        insert_query = """
+            INSERT INTO role_inheritance (role_id, inherited_role_id, created_by)
+            SELECT %s, inherited_role_id, %s
+            FROM unnest(%s::int[]) AS inherited_role_id
+        """
         
-        # Check if permission already exists
-        query_check = "SELECT id FROM permissions WHERE name = %s"
         try:
             with self.get_cursor() as cur:
-                cur.execute(query_check, (name,))
-                if cur.fetchone():
-                    raise ValueError(f"Permission '{name}' already exists")
+                cur.execute("LOCK TABLE role_inheritance IN SHARE ROW EXCLUSIVE MODE")
+                cur.execute("SELECT role_id, inherited_role_id FROM role_inheritance")
+                edges = {(row['role_id'], row['inherited_role_id']) for row in cur.fetchall()}
+                current = {inherited for role, inherited in edges if role == role_id}
+                
+                # Raises ValueError on a cycle, before anything is written
+                role_closure({edge for edge in edges if edge[0] != role_id} | {(role_id, i) for i in wanted})
+                
+                removed = sorted(current - wanted)
+                added = sorted(wanted - current)
+                if removed:
+                    cur.execute(delete_query, (role_id, removed))
+                if added:
+                    cur.execute(insert_query, (role_id, created_by, added))
+                if removed or added:
+                    self._sync_role_closure(cur)
+                return {'added': len(added), 'removed': len(removed)}
         except ValueError:
             raise
         except Exception as e:
-            logging.error(f"Error checking permission: {e}")
+            logging.error(f"Error setting role inheritance: {e}")
             raise
-        
+        finally:
+            _invalidate_role_hierarchy()
+    
+    def remove_role_inheritance(self, role_id: int, inherited_role_id: int) -> bool:
+        """Stop a role including another role's permissions"""
         query = """
-            INSERT INTO permissions (name, description, module, action)
-            VALUES (%s, %s, %s, %s)
-            RETURNING id, name, description, module, action
+            DELETE FROM role_inheritance
+            WHERE role_id = %s AND inherited_role_id = %s
         """
         
         try:
             with self.get_cursor() as cur:
-                cur.execute(query, (name, description, module, action))
-                result = cur.fetchone()
-                return dict(result) if result else None
+                cur.execute("LOCK TABLE role_inheritance IN SHARE ROW EXCLUSIVE MODE")
+                cur.execute(query, (role_id, inherited_role_id))
+                removed = cur.rowcount > 0
+                if removed:
+                    self._sync_role_closure(cur)
+                return removed
         except Exception as e:
-            logging.error(f"Error creating permission: {e}")
-            raise
+            logging.error(f"Error removing role inheritance: {e}")
+            return False
+        finally:
+            _invalidate_role_hierarchy()
     
-
+    def _sync_role_closure(self, cur) -> int:
+        """
+        Rewrite role_closure to match role_inheritance, touching only changed pairs.
+        
+        Only the pairs that differ are deleted or inserted, so the
+        user_effective_permissions triggers refresh just the affected users.
+        
+        Returns:
+            Number of closure rows written or removed
+        """
+        cur.execute("SELECT role_id, inherited_role_id FROM role_inheritance")
+        wanted = role_closure((row['role_id'], row['inherited_role_id']) for row in cur.fetchall())
+        cur.execute("SELECT ancestor_id, descendant_id, depth FROM role_closure")
+        current = {(row['ancestor_id'], row['descendant_id']): row['depth'] for row in cur.fetchall()}
+        
+        removed = [pair for pair in current if pair not in wanted]
+        changed = [(a, d, depth) for (a, d), depth in wanted.items() if current.get((a, d)) != depth]
+        
+        if removed:
+            execute_values(cur, """
+                DELETE FROM role_closure rc
+                USING (VALUES %s) AS gone (ancestor_id, descendant_id)
+                WHERE rc.ancestor_id = gone.ancestor_id AND rc.descendant_id = gone.descendant_id
+            """, removed)
+        if changed:
+            execute_values(cur, """
+                INSERT INTO role_closure (ancestor_id, descendant_id, depth)
+                VALUES %s
+                ON CONFLICT (ancestor_id, descendant_id) DO UPDATE SET depth = EXCLUDED.depth
+            """, changed)
+        return len(removed) + len(changed)
     
-    def get_role_permissions(self, role_id: int) -> List[Dict]:
-        """Get all permissions assigned to a role"""
+    def rebuild_role_closure(self) -> int:
+        """
+        Recompute role_closure from role_inheritance (e.g. after roles were deleted).
+        
+        Returns:
+            Number of closure rows changed, or -1 on error
+        """
+        try:
+            with self.get_cursor() as cur:
+                cur.execute("LOCK TABLE role_inheritance IN SHARE ROW EXCLUSIVE MODE")
+                return self._sync_role_closure(cur)
+        except Exception as e:
+            logging.error(f"Error rebuilding role closure: {e}")
+            return -1
+        finally:
+            _invalidate_role_hierarchy()
+    
+    # ==================== PERMISSIONS ====================
+    
+    def get_user_permissions(self, user_id: int) -> List[Dict]:
+        """
+        Get all permissions for a user through their roles.
+        
+        Reads the trigger-maintained user_effective_permissions table; falls
+        back to the user -> role -> permission join until it is installed
+        (see ensure_user_effective_permissions).
+        """
         query = """
             SELECT p.id, p.name, p.description, p.module, p.action
-            FROM permissions p
-            INNER JOIN permission_roles pr ON p.id = pr.permission_id
-            WHERE pr.role_id = %s
-            ORDER BY p.module, p.action
+            FROM user_effective_permissions uep
+            JOIN permissions p ON p.id = uep.permission_id
+            WHERE uep.user_id = %s
         """
         
         try:
             with self.get_cursor() as cur:
-                cur.execute(query, (role_id,))
+                cur.execute(query, (user_id,))
                 rows = cur.fetchall()
                 return [dict(row) for row in rows]
+        except psycopg2.errors.UndefinedTable:
+            return self._get_user_permissions_from_roles(user_id)
         except Exception as e:
-            logging.error(f"Error fetching role permissions: {e}")
+            logging.error(f"Error fetching user permissions: {e}")
             return []
     
-    def get_available_permissions_for_role(self, role_id: int) -> List[Dict]:
-        """
-        Get all permissions that are NOT yet assigned to a specific role.
-        
-        Args:
-            role_id: The ID of the role
-        
-        Returns:
-            List of dictionaries containing permissions not assigned to the role
-        """
+    def _get_user_permissions_from_roles(self, user_id: int) -> List[Dict]:
         query = """
-            SELECT p.id, p.name, p.description, p.module, p.action
+            SELECT DISTINCT p.id, p.name, p.description, p.module, p.action
             FROM permissions p
-            WHERE p.id NOT IN (
-                SELECT permission_id 
-                FROM permission_roles 
-                WHERE role_id = %s
-            )
-            ORDER BY p.module, p.action
+            JOIN permission_roles pr ON p.id = pr.permission_id
+            JOIN roles r ON pr.role_id = r.id
+            JOIN user_roles ur ON r.id = ur.role_id
+            WHERE ur.user_id = %s AND r.is_active = TRUE
         """
         
         try:
             with self.get_cursor() as cur:
-                cur.execute(query, (role_id,))
+                cur.execute(query, (user_id,))
                 rows = cur.fetchall()
                 return [dict(row) for row in rows]
         except Exception as e:
-            logging.error(f"Error fetching available permissions for role: {e}")
+            logging.error(f"Error fetching user permissions: {e}")
             return []
     
-    def assign_permission_to_role(self, role_id: int, permission_id: int, created_by: int = None) -> bool:
+    def has_permission_direct(self, user_id: int, permission_name: str) -> bool:
         """
-        Assign a permission to a role.
-        
-        Args:
-            role_id: The ID of the role
-            permission_id: The ID of the permission to assign
-            created_by: The ID of the user making the assignment
+        Check one permission against the database, bypassing process caches.
         
-        Returns:
-            bool: True if assigned successfully, False otherwise
+        One primary-key probe of user_effective_permissions; is_admin and
+        is_active are read from users at query time, so they never go stale.
         """
-        # First check if the assignment already exists
-        check_query = """
+        query = """
+            SELECT u.is_admin OR EXISTS (
+                       SELECT 1
+                       FROM permissions p
+                       JOIN user_effective_permissions uep
+                         ON uep.user_id = u.id AND uep.permission_id = p.id
+                       WHERE p.name = %s
+                   ) AS granted
+            FROM users u
+            WHERE u.id = %s AND u.is_active = TRUE
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (permission_name, user_id))
+                result = cur.fetchone()
+                return bool(result and result['granted'])
+        except Exception as e:
+            logging.error(f"Error checking permission: {e}")
+            return False
+    
+    def _load_authorization_context(self, user_id: int) -> Optional[Dict]:
+        """
+        Load a user's admin flag, active flag and active role IDs in one query.
+        
+        One primary-key lookup on users plus the user_roles index; inherited
+        roles are expanded through role_closure here, so permission checks
+        stay a flat OR of role masks whatever the hierarchy depth.
+        """
+        query = """
+            SELECT u.is_admin, u.is_active,
+                   COALESCE(array_agg(er.role_id) FILTER (WHERE er.role_id IS NOT NULL), '{}') AS role_ids
+            FROM users u
+            LEFT JOIN user_effective_roles er ON er.user_id = u.id AND u.is_active
+            WHERE u.id = %s
+            GROUP BY u.id, u.is_admin, u.is_active
+        """
+        flat_query = """
+            SELECT u.is_admin, u.is_active,
+                   COALESCE(array_agg(r.id) FILTER (WHERE r.id IS NOT NULL), '{}') AS role_ids
+            FROM users u
+            LEFT JOIN user_roles ur ON ur.user_id = u.id AND u.is_active
+            LEFT JOIN roles r ON r.id = ur.role_id AND r.is_active = TRUE
+            WHERE u.id = %s
+            GROUP BY u.id, u.is_admin, u.is_active
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (user_id,))
+                result = cur.fetchone()
+        except psycopg2.errors.UndefinedTable:
+            # Role hierarchy not installed yet: direct roles only
+            with self.get_cursor() as cur:
+                cur.execute(flat_query, (user_id,))
+                result = cur.fetchone()
+        
+        if not result:
+            return None
+        return {
+            'is_admin': result['is_admin'],
+            'is_active': result['is_active'],
+            'role_ids': frozenset(result['role_ids']),
+        }
+    
+    def get_authorization_context(self, user_id: int) -> Optional[Dict]:
+        """
+        Get what every authorization check needs about a user.
+        
+        Memoized on this manager (one per Streamlit rerun) on top of the
+        process-wide permission cache, so a guarded page render costs at most
+        one query however many checks it makes. The memo is dropped whenever
+        the process cache is invalidated.
+        
+        Returns:
+            Dictionary with is_admin, is_active and role_ids (active roles,
+            inherited included; empty for inactive users), or None if the
+            user does not exist
+        """
+        generation = _permission_cache.generation
+        if generation != self._authorization_generation:
+            self._authorization_contexts.clear()
+            self._authorization_generation = generation
+        
+        if user_id not in self._authorization_contexts:
+            self._authorization_contexts[user_id] = _permission_cache.get_or_load(
+                user_id, lambda: self._load_authorization_context(user_id)
+            )
+        return self._authorization_contexts[user_id]
+    
+    def get_effective_permissions(self, user_id: int) -> Optional[Dict]:
+        """
+        Get a user's admin flag and active role IDs.
+        
+        Returns:
+            Dictionary with is_admin and role_ids (set),
+            or None if the user does not exist or is inactive
+        """
+        context = self.get_authorization_context(user_id)
+        if context is None or not context['is_active']:
+            return None
+        return context
+    
+    def _load_rbac_snapshot(self):
+        """Compile every permission and active role into the shared snapshot"""
+        permissions_query = "SELECT id, name, module, action FROM permissions ORDER BY id"
+        roles_query = """
+            SELECT r.id AS role_id,
+                   COALESCE(array_agg(pr.permission_id) FILTER (WHERE pr.permission_id IS NOT NULL), '{}') AS permission_ids
+            FROM roles r
+            LEFT JOIN permission_roles pr ON pr.role_id = r.id
+            WHERE r.is_active = TRUE
+            GROUP BY r.id
+        """
+        
+        generation = _rbac_snapshot.generation
+        with self.get_cursor() as cur:
+            cur.execute(permissions_query)
+            permissions = cur.fetchall()
+            cur.execute(roles_query)
+            role_permissions = {row['role_id']: row['permission_ids'] for row in cur.fetchall()}
+        _rbac_snapshot.load(permissions, role_permissions, generation)
+    
+    def _refresh_role_mask(self, role_id: int):
+        """Recompile a single role's permission mask"""
+        query = """
+            SELECT r.is_active, p.id, p.name, p.module, p.action
+            FROM roles r
+            LEFT JOIN permission_roles pr ON pr.role_id = r.id
+            LEFT JOIN permissions p ON p.id = pr.permission_id
+            WHERE r.id = %s
+        """
+        
+        with self.get_cursor() as cur:
+            cur.execute(query, (role_id,))
+            rows = cur.fetchall()
+        is_active = bool(rows) and rows[0]['is_active']
+        permissions = [row for row in rows if row['id'] is not None]
+        _rbac_snapshot.set_role(role_id, permissions, is_active)
+    
+    def _get_compiled_snapshot(self, role_ids) -> RBACSnapshot:
+        """Get the shared snapshot with the given roles' masks up to date"""
+        if not _rbac_snapshot.is_fresh():
+            with _rbac_snapshot_lock:
+                if not _rbac_snapshot.is_fresh():
+                    self._load_rbac_snapshot()
+        for role_id in _rbac_snapshot.take_stale_roles(role_ids):
+            try:
+                self._refresh_role_mask(role_id)
+            except Exception:
+                _rbac_snapshot.mark_role_stale(role_id)
+                raise
+        return _rbac_snapshot
+    
+    def has_all_permissions(self, user_id: int, permission_names: List[str]) -> bool:
+        """Check if user has ALL permissions in the list (one bitmask AND)"""
+        try:
+            effective = self.get_effective_permissions(user_id)
+            if effective is None:
+                return False
+            
+            # Admin users have all permissions
+            if effective['is_admin']:
+                return True
+            
+            snapshot = self._get_compiled_snapshot(effective['role_ids'])
+            return snapshot.has_all(effective['role_ids'], permission_names)
+        except Exception as e:
+            logging.error(f"Error checking permissions: {e}")
+            return False
+    
+    def has_any_permission(self, user_id: int, permission_names: List[str]) -> bool:
+        """Check if user has ANY permission in the list (one bitmask AND)"""
+        try:
+            effective = self.get_effective_permissions(user_id)
+            if effective is None:
+                return False
+            
+            # Admin users have all permissions
+            if effective['is_admin']:
+                return bool(permission_names)
+            
+            snapshot = self._get_compiled_snapshot(effective['role_ids'])
+            return snapshot.has_any(effective['role_ids'], permission_names)
+        except Exception as e:
+            logging.error(f"Error checking permissions: {e}")
+            return False
+    
+    def has_permission(self, user_id: int, permission_name: str) -> bool:
+        """Check if user has a specific permission"""
+        return self.has_all_permissions(user_id, [permission_name])
+    
+    def has_permissions_bulk(self, user_ids: List[int], permission_names: List[str]) -> PermissionMatrix:
+        """
+        Check many (user, permission) pairs in one set-based query.
+        
+        Admin users are short-circuited in SQL to hold every requested
+        permission; unknown or inactive users hold none.
+        
+        Args:
+            user_ids: IDs of the users to check
+            permission_names: Names of the permissions to check
+        
+        Returns:
+            PermissionMatrix answering every pair
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        permission_names = list(dict.fromkeys(permission_names))
+        if not user_ids or not permission_names:
+            return PermissionMatrix(user_ids, permission_names, {})
+        
+        # One user_effective_permissions primary-key probe per (user, permission)
+        query = """
+            SELECT u.id AS user_id,
+                   CASE WHEN u.is_admin THEN %(names)s::text[]
+                        ELSE COALESCE(array_agg(p.name) FILTER (WHERE uep.user_id IS NOT NULL), '{}')
+                   END AS granted
+            FROM users u
+            LEFT JOIN permissions p ON p.name = ANY(%(names)s) AND NOT u.is_admin
+            LEFT JOIN user_effective_permissions uep ON uep.user_id = u.id AND uep.permission_id = p.id
+            WHERE u.id = ANY(%(user_ids)s) AND u.is_active = TRUE
+            GROUP BY u.id, u.is_admin
+        """
+        fallback_query = """
+            SELECT u.id AS user_id,
+                   CASE WHEN u.is_admin THEN %(names)s::text[]
+                        ELSE COALESCE(array_agg(DISTINCT p.name) FILTER (WHERE p.name IS NOT NULL), '{}')
+                   END AS granted
+            FROM users u
+            LEFT JOIN user_roles ur ON ur.user_id = u.id AND NOT u.is_admin
+            LEFT JOIN roles r ON r.id = ur.role_id AND r.is_active = TRUE
+            LEFT JOIN permission_roles pr ON pr.role_id = r.id
+            LEFT JOIN permissions p ON p.id = pr.permission_id AND p.name = ANY(%(names)s)
+            WHERE u.id = ANY(%(user_ids)s) AND u.is_active = TRUE
+            GROUP BY u.id, u.is_admin
+        """
+        params = {'user_ids': user_ids, 'names': permission_names}
+        
+        try:
+            try:
+                with self.get_cursor() as cur:
+                    cur.execute(query, params)
+                    rows = cur.fetchall()
+            except psycopg2.errors.UndefinedTable:
+                # user_effective_permissions not installed yet
+                with self.get_cursor() as cur:
+                    cur.execute(fallback_query, params)
+                    rows = cur.fetchall()
+            grants = {row['user_id']: row['granted'] for row in rows}
+            return PermissionMatrix.from_grants(user_ids, permission_names, grants)
+        except Exception as e:
+            logging.error(f"Error checking permissions in bulk: {e}")
+            return PermissionMatrix(user_ids, permission_names, {})
+    
+    def get_all_permissions(self) -> List[Dict]:
+        """Get all available permissions"""
+        query = """
+            SELECT id, name, description, module, action
+            FROM permissions
+            ORDER BY module, action
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query)
+                rows = cur.fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logging.error(f"Error fetching permissions: {e}")
+            return []
+    
+    def get_permission_matrix(self, module: str = None, action: str = None,
+                              after_module: str = None, limit: int = 50) -> Dict:
+        """
+        Get one page of the module x action permission matrix, built in SQL.
+        
+        Pages are cached per permissions-table version, so reruns with
+        unchanged permissions and filters do not query the database.
+        
+        Args:
+            module: Substring filter on the module name
+            action: Substring filter on the action name
+            after_module: Last module of the previous page (None for the first page)
+            limit: Maximum number of modules (matrix rows) per page
+        
+        Returns:
+            Dictionary with 'actions' (matrix columns across all matching modules),
+            'rows' ([{'module', 'cells': {action: permission name}, 'permission_count'}]),
+            'next_after_module' (None on the last page), 'total_permissions' and
+            'total_modules'
+        """
+        key = (_data_versions.get('permissions'), module or None, action or None, after_module, limit)
+        return _permission_matrix_cache.get_or_load(
+            key, lambda: self._load_permission_matrix(module, action, after_module, limit)
+        )
+    
+    def _load_permission_matrix(self, module: str, action: str, after_module: str, limit: int) -> Dict:
+        conditions = ["TRUE"]
+        params = {'after_module': after_module, 'limit': limit + 1}
+        
+        # Escape LIKE wildcards so the filters are plain substring matches
+        if module:
+            escaped = module.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append("COALESCE(module, 'General') ILIKE %(module)s")
+            params['module'] = f"%{escaped}%"
+        if action:
+            escaped = action.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append("COALESCE(action, 'N/A') ILIKE %(action)s")
+            params['action'] = f"%{escaped}%"
+        
+        sql = f"""
+            WITH filtered AS (
+                SELECT name,
+                       COALESCE(module, 'General') AS module,
+                       COALESCE(action, 'N/A') AS action
+                FROM permissions
+                WHERE {' AND '.join(conditions)}
+            ),
+            page AS (
+                SELECT module,
+                       json_object_agg(action, name ORDER BY action) AS cells,
+                       COUNT(*) AS permission_count
+                FROM filtered
+                WHERE %(after_module)s::text IS NULL OR module > %(after_module)s::text
+                GROUP BY module
+                ORDER BY module
+                LIMIT %(limit)s
+            )
+            SELECT p.module, p.cells, p.permission_count,
+                   (SELECT array_agg(DISTINCT action ORDER BY action) FROM filtered) AS actions,
+                   (SELECT COUNT(*) FROM filtered) AS total_permissions,
+                   (SELECT COUNT(DISTINCT module) FROM filtered) AS total_modules
+            FROM page p
+            ORDER BY p.module
+        """
+        
+        empty = {'actions': [], 'rows': [], 'next_after_module': None,
+                 'total_permissions': 0, 'total_modules': 0}
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+        except Exception as e:
+            logging.error(f"Error building permission matrix: {e}")
+            return empty
+        
+        if not rows:
+            return empty
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'actions': rows[0]['actions'] or [],
+            'rows': [
+                {'module': row['module'], 'cells': row['cells'], 'permission_count': row['permission_count']}
+                for row in rows
+            ],
+            'next_after_module': rows[-1]['module'] if has_more else None,
+            'total_permissions': rows[0]['total_permissions'],
+            'total_modules': rows[0]['total_modules'],
+        }
+    
+    def create_permission(self, name: str, description: str = None, 
+                         module: str = None, action: str = None) -> Optional[Dict]:
+        """
+        Create a new permission.
+        
+        A module or action of '*' makes a wildcard grant (e.g. pipelines:* or
+        *:read) covering every permission it matches, including later ones.
+        """
+        if not name:
+            raise ValueError("Permission name is required")
+        if is_wildcard(module, action) and not (module and action):
+            raise ValueError("Wildcard permissions need both a module and an action")
+        
+        # Check if permission already exists
+        query_check = "SELECT id FROM permissions WHERE name = %s"
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query_check, (name,))
+                if cur.fetchone():
+                    raise ValueError(f"Permission '{name}' already exists")
+        except ValueError:
+            raise
+        except Exception as e:
+            logging.error(f"Error checking permission: {e}")
+            raise
+        
+        query = """
+            INSERT INTO permissions (name, description, module, action)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id, name, description, module, action
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (name, description, module, action))
+                result = cur.fetchone()
+            if result:
+                _rbac_snapshot.add_permission(result['id'], result['name'], result['module'], result['action'])
+                _data_versions.bump('permissions')
+            return dict(result) if result else None
+        except Exception as e:
+            logging.error(f"Error creating permission: {e}")
+            raise
+    
+
+    
+    def get_role_permissions(self, role_id: int) -> List[Dict]:
+        """Get all permissions assigned to a role"""
+        query = """
+            SELECT p.id, p.name, p.description, p.module, p.action
+            FROM permissions p
+            INNER JOIN permission_roles pr ON p.id = pr.permission_id
+            WHERE pr.role_id = %s
+            ORDER BY p.module, p.action
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (role_id,))
+                rows = cur.fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logging.error(f"Error fetching role permissions: {e}")
+            return []
+    
+    def get_permissions_for_roles(self, role_ids: List[int]) -> Dict[int, List[Dict]]:
+        """
+        Get permissions for many roles in one query.
+        
+        Args:
+            role_ids: IDs of the roles
+        
+        Returns:
+            Dictionary mapping role_id to its list of permissions
+        """
+        query = """
+            SELECT pr.role_id, p.id, p.name, p.description, p.module, p.action
+            FROM permissions p
+            INNER JOIN permission_roles pr ON p.id = pr.permission_id
+            WHERE pr.role_id = ANY(%s)
+            ORDER BY p.module, p.action
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (list(role_ids),))
+                permissions_by_role = {}
+                for row in cur.fetchall():
+                    perm = dict(row)
+                    permissions_by_role.setdefault(perm.pop('role_id'), []).append(perm)
+                return permissions_by_role
+        except Exception as e:
+            logging.error(f"Error fetching permissions for roles: {e}")
+            return {}
+    
+    def get_available_permissions_for_role(self, role_id: int) -> List[Dict]:
+        """
+        Get all permissions that are NOT yet assigned to a specific role.
+        
+        Args:
+            role_id: The ID of the role
+        
+        Returns:
+            List of dictionaries containing permissions not assigned to the role
+        """
+        query = """
+            SELECT p.id, p.name, p.description, p.module, p.action
+            FROM permissions p
+            WHERE p.id NOT IN (
+                SELECT permission_id 
+                FROM permission_roles 
+                WHERE role_id = %s
+            )
+            ORDER BY p.module, p.action
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (role_id,))
+                rows = cur.fetchall()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logging.error(f"Error fetching available permissions for role: {e}")
+            return []
+    
+    def assign_permission_to_role(self, role_id: int, permission_id: int, created_by: int = None) -> bool:
+        """
+        Assign a permission to a role.
+        
+        Args:
+            role_id: The ID of the role
+            permission_id: The ID of the permission to assign
+            created_by: The ID of the user making the assignment
+        
+        Returns:
+            bool: True if assigned successfully, False otherwise
+        """
+        # First check if the assignment already exists
+        check_query = """
             SELECT id FROM permission_roles
             WHERE permission_id = %s AND role_id = %s
         """
@@ -678,6 +2310,8 @@ class AuthenticationManager:
         except Exception as e:
             logging.error(f"Error assigning permission to role: {e}")
             return False
+        finally:
+            _invalidate_role_permissions(role_id)
     
     def remove_permission_from_role(self, role_id: int, permission_id: int) -> bool:
         """
@@ -703,6 +2337,55 @@ class AuthenticationManager:
         except Exception as e:
             logging.error(f"Error removing permission from role: {e}")
             return False
+        finally:
+            _invalidate_role_permissions(role_id)
+    
+    def set_role_permissions(self, role_id: int, grant_ids: List[int] = None,
+                             revoke_ids: List[int] = None, actor: int = None) -> Dict:
+        """
+        Grant and revoke many permissions on a role in one transaction.
+        
+        Args:
+            role_id: The ID of the role
+            grant_ids: IDs of permissions to assign to the role
+            revoke_ids: IDs of permissions to remove from the role
+            actor: The ID of the user making the change
+        
+        Returns:
+            Dictionary with the number of permissions granted and revoked
+        """
+        grant_ids = list(set(grant_ids or []))
+        revoke_ids = list(set(revoke_ids or []))
+        
+        delete_query = """
+            DELETE FROM permission_roles
+            WHERE role_id = %s AND permission_id = ANY(%s)
+        """
+        insert_query = """
+            INSERT INTO permission_roles (permission_id, role_id, created_by)
+            SELECT g.permission_id, %(role_id)s, %(actor)s
+            FROM unnest(%(grant_ids)s::int[]) AS g(permission_id)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM permission_roles pr
+                WHERE pr.role_id = %(role_id)s AND pr.permission_id = g.permission_id
+            )
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                granted = revoked = 0
+                if revoke_ids:
+                    cur.execute(delete_query, (role_id, revoke_ids))
+                    revoked = cur.rowcount
+                if grant_ids:
+                    cur.execute(insert_query, {'role_id': role_id, 'actor': actor, 'grant_ids': grant_ids})
+                    granted = cur.rowcount
+                return {'granted': granted, 'revoked': revoked}
+        except Exception as e:
+            logging.error(f"Error setting role permissions: {e}")
+            raise
+        finally:
+            _invalidate_role_permissions(role_id)
     
     # ==================== USER MANAGEMENT ====================
     
@@ -725,6 +2408,115 @@ class AuthenticationManager:
             logging.error(f"Error fetching users: {e}")
             return []
     
+    def list_users(self, after_id: int = None, limit: int = 25, query: str = None,
+                   role_id: int = None) -> Dict:
+        """
+        Get one page of active users, newest first, using keyset pagination.
+        
+        Args:
+            after_id: Last user ID of the previous page (None for the first page)
+            limit: Maximum number of users per page
+            query: Substring to match against username, full name or email
+            role_id: Only return users assigned to this role
+        
+        Returns:
+            Dictionary with 'users' (list) and 'next_after_id' (None on the last page)
+        """
+        conditions = ["u.is_active = TRUE"]
+        params = {'limit': limit + 1}
+        
+        if after_id is not None:
+            conditions.append("u.id < %(after_id)s")
+            params['after_id'] = after_id
+        
+        if query:
+            # Escape LIKE wildcards so the search is a plain substring match
+            escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append(
+                "(u.username ILIKE %(pattern)s OR u.full_name ILIKE %(pattern)s OR u.email ILIKE %(pattern)s)"
+            )
+            params['pattern'] = f"%{escaped}%"
+        
+        if role_id is not None:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM user_roles ur WHERE ur.user_id = u.id AND ur.role_id = %(role_id)s)"
+            )
+            params['role_id'] = role_id
+        
+        sql = f"""
+            SELECT u.id, u.username, u.email, u.full_name, u.phone_number, 
+                   u.is_admin, u.is_active, u.last_login, u.created_by
+            FROM users u
+            WHERE {' AND '.join(conditions)}
+            ORDER BY u.id DESC
+            LIMIT %(limit)s
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(sql, params)
+                users = [dict(row) for row in cur.fetchall()]
+            has_more = len(users) > limit
+            users = users[:limit]
+            return {
+                'users': users,
+                'next_after_id': users[-1]['id'] if has_more else None,
+            }
+        except Exception as e:
+            logging.error(f"Error listing users: {e}")
+            return {'users': [], 'next_after_id': None}
+    
+    def iter_users(self, itersize: int = None):
+        """
+        Stream all active users without materializing the table.
+        
+        Args:
+            itersize: Rows fetched per round trip (default: DB_STREAM_ITERSIZE)
+        
+        Yields:
+            One row per user (dict-like)
+        """
+        query = """
+            SELECT id, username, email, full_name, phone_number, 
+                   is_admin, is_active, last_login, created_by
+            FROM users
+            WHERE is_active = TRUE
+            ORDER BY id
+        """
+        return self.iter_query(query, itersize=itersize)
+    
+    def iter_user_logins(self, since=None, until=None, itersize: int = None):
+        """
+        Stream login attempts from user_logins without materializing them.
+        
+        Args:
+            since: Only attempts at or after this timestamp
+            until: Only attempts before this timestamp
+            itersize: Rows fetched per round trip (default: DB_STREAM_ITERSIZE)
+        
+        Yields:
+            One row per login attempt (dict-like)
+        """
+        conditions = []
+        params = []
+        
+        if since is not None:
+            conditions.append("login_time >= %s")
+            params.append(since)
+        
+        if until is not None:
+            conditions.append("login_time < %s")
+            params.append(until)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT id, user_id, login_time, login_status
+            FROM user_logins
+            {where}
+            ORDER BY id
+        """
+        return self.iter_query(query, params, itersize=itersize)
+    
     def update_user_admin_status(self, user_id: int, is_admin: bool) -> bool:
         """Update user admin status"""
         query = """
@@ -741,6 +2533,8 @@ class AuthenticationManager:
         except Exception as e:
             logging.error(f"Error updating user admin status: {e}")
             return False
+        finally:
+            _invalidate_user_permissions(user_id)
     
     def update_user_info(self, user_id: int, email: str = None, full_name: str = None, 
                         phone_number: str = None) -> bool:
@@ -827,6 +2621,9 @@ class AuthenticationManager:
         except Exception as e:
             logging.error(f"Error updating user: {e}")
             raise
+        finally:
+            if is_admin is not None or is_active is not None:
+                _invalidate_user_permissions(user_id)
     
     def deactivate_user(self, user_id: int) -> bool:
         """Deactivate a user"""
@@ -844,6 +2641,8 @@ class AuthenticationManager:
         except Exception as e:
             logging.error(f"Error deactivating user: {e}")
             return False
+        finally:
+            _invalidate_user_permissions(user_id)
     
     def remove_user_role(self, user_id: int, role_id: int) -> bool:
         """Remove a role from a user"""
@@ -860,16 +2659,895 @@ class AuthenticationManager:
         except Exception as e:
             logging.error(f"Error removing user role: {e}")
             return False
+        finally:
+            _invalidate_user_permissions(user_id)
     
     # ==================== DATABASE INITIALIZATION ====================
     
-    def close_pool(self):
-        """Close all connections in the pool"""
+    def ensure_user_directory_indexes(self) -> bool:
+        """
+        Create the indexes behind list_users (idempotent).
+        
+        Trigram GIN indexes let substring searches on username, full name and
+        email use an index instead of scanning every user.
+        """
+        statements = [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            "CREATE INDEX IF NOT EXISTS idx_users_active_id ON users (id DESC) WHERE is_active",
+            "CREATE INDEX IF NOT EXISTS idx_users_username_trgm ON users USING gin (username gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS idx_users_full_name_trgm ON users USING gin (full_name gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS idx_users_email_trgm ON users USING gin (email gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS idx_user_roles_role_user ON user_roles (role_id, user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_user_roles_user ON user_roles (user_id)",
+        ]
+        
+        try:
+            with self.get_cursor() as cur:
+                for statement in statements:
+                    cur.execute(statement)
+            return True
+        except Exception as e:
+            logging.error(f"Error creating user directory indexes: {e}")
+            return False
+    
+    def ensure_login_count_rollup(self) -> bool:
+        """
+        Create the user_login_counts rollup and the triggers that maintain it (idempotent).
+        
+        Statement-level triggers with transition tables fold each INSERT or
+        DELETE on user_logins into the per-user counters with one grouped
+        upsert, whatever writes the log. Run backfill_login_counts() once
+        after installing on a table that already has history.
+        """
+        statements = [
+            """
+            CREATE TABLE IF NOT EXISTS user_login_counts (
+                user_id INTEGER PRIMARY KEY,
+                success_count BIGINT NOT NULL DEFAULT 0,
+                failed_count BIGINT NOT NULL DEFAULT 0,
+                last_success_at TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_user_login_counts_success "
+            "ON user_login_counts (success_count DESC, user_id)",
+            """
+            CREATE OR REPLACE FUNCTION user_login_counts_add() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                INSERT INTO user_login_counts (user_id, success_count, failed_count, last_success_at)
+                SELECT user_id,
+                       COUNT(*) FILTER (WHERE login_status = 'success'),
+                       COUNT(*) FILTER (WHERE login_status <> 'success'),
+                       MAX(login_time) FILTER (WHERE login_status = 'success')
+                FROM new_logins
+                WHERE user_id IS NOT NULL
+                GROUP BY user_id
+                ORDER BY user_id
+                ON CONFLICT (user_id) DO UPDATE
+                SET success_count = user_login_counts.success_count + EXCLUDED.success_count,
+                    failed_count = user_login_counts.failed_count + EXCLUDED.failed_count,
+                    last_success_at = GREATEST(user_login_counts.last_success_at, EXCLUDED.last_success_at);
+                RETURN NULL;
+            END
+            $$
+            """,
+            """
+            CREATE OR REPLACE FUNCTION user_login_counts_subtract() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                UPDATE user_login_counts c
+                SET success_count = c.success_count - d.success_count,
+                    failed_count = c.failed_count - d.failed_count
+                FROM (
+                    SELECT user_id,
+                           COUNT(*) FILTER (WHERE login_status = 'success') AS success_count,
+                           COUNT(*) FILTER (WHERE login_status <> 'success') AS failed_count
+                    FROM old_logins
+                    WHERE user_id IS NOT NULL
+                    GROUP BY user_id
+                ) d
+                WHERE c.user_id = d.user_id;
+                RETURN NULL;
+            END
+            $$
+            """,
+        ]
+        
+        try:
+            with self.get_cursor() as cur:
+                for statement in statements:
+                    cur.execute(statement)
+                self._create_login_count_triggers(cur)
+            return True
+        except Exception as e:
+            logging.error(f"Error creating login count rollup: {e}")
+            return False
+    
+    def _create_login_count_triggers(self, cur):
+        """(Re)create the user_login_counts triggers on the current user_logins table"""
+        statements = [
+            "DROP TRIGGER IF EXISTS trg_user_logins_count_insert ON user_logins",
+            """
+            CREATE TRIGGER trg_user_logins_count_insert
+            AFTER INSERT ON user_logins
+            REFERENCING NEW TABLE AS new_logins
+            FOR EACH STATEMENT EXECUTE FUNCTION user_login_counts_add()
+            """,
+            "DROP TRIGGER IF EXISTS trg_user_logins_count_delete ON user_logins",
+            """
+            CREATE TRIGGER trg_user_logins_count_delete
+            AFTER DELETE ON user_logins
+            REFERENCING OLD TABLE AS old_logins
+            FOR EACH STATEMENT EXECUTE FUNCTION user_login_counts_subtract()
+            """,
+        ]
+        for statement in statements:
+            cur.execute(statement)
+    
+    def partition_user_logins(self, months_ahead: int = None) -> bool:
+        """
+        Convert user_logins into a table range-partitioned by month on login_time (idempotent).
+        
+        Runs in one transaction under an ACCESS EXCLUSIVE lock: the old table
+        is renamed, its rows are copied into monthly partitions (plus a DEFAULT
+        partition for anything outside them), the id sequence is handed over
+        and the old table is dropped. The login-count triggers are recreated
+        on the new table after the copy, so existing rows are not recounted.
+        
+        Args:
+            months_ahead: Future monthly partitions to create (default: LOGIN_PARTITION_MONTHS_AHEAD)
+        
+        Returns:
+            bool: True if user_logins is partitioned afterwards
+        """
+        months_ahead = LOGIN_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute("LOCK TABLE user_logins IN ACCESS EXCLUSIVE MODE")
+                cur.execute("SELECT relkind FROM pg_class WHERE oid = 'user_logins'::regclass")
+                if cur.fetchone()['relkind'] == 'p':
+                    return True
+                
+                cur.execute("""
+                    SELECT pg_get_serial_sequence('user_logins', 'id') AS id_sequence,
+                           (SELECT MIN(login_time) FROM user_logins) AS first_login,
+                           to_regclass('user_login_counts') IS NOT NULL AS has_rollup
+                """)
+                info = cur.fetchone()
+                cur.execute("""
+                    SELECT conname, contype, pg_get_constraintdef(oid) AS definition
+                    FROM pg_constraint
+                    WHERE conrelid = 'user_logins'::regclass AND contype IN ('p', 'f')
+                """)
+                constraints = cur.fetchall()
+                
+                # Free the primary key's index name before the new table claims it
+                cur.execute("ALTER TABLE user_logins RENAME TO user_logins_unpartitioned")
+                for con in constraints:
+                    if con['contype'] == 'p':
+                        cur.execute(sql.SQL("ALTER TABLE user_logins_unpartitioned RENAME CONSTRAINT {} TO {}").format(
+                            sql.Identifier(con['conname']), sql.Identifier(f"{con['conname']}_unpartitioned")
+                        ))
+                
+                # The partition key must be part of the primary key
+                cur.execute("""
+                    CREATE TABLE user_logins (
+                        LIKE user_logins_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+                        PRIMARY KEY (id, login_time)
+                    ) PARTITION BY RANGE (login_time)
+                """)
+                for con in constraints:
+                    if con['contype'] == 'f':
+                        cur.execute(sql.SQL("ALTER TABLE user_logins ADD CONSTRAINT {} " + con['definition']).format(
+                            sql.Identifier(con['conname'])
+                        ))
+                cur.execute("CREATE TABLE user_logins_default PARTITION OF user_logins DEFAULT")
+                
+                first_month = month_start(info['first_login'] or datetime.now())
+                last_month = add_months(month_start(datetime.now()), months_ahead)
+                month = first_month
+                while month <= last_month:
+                    self._create_login_partition(cur, month)
+                    month = add_months(month, 1)
+                
+                cur.execute("INSERT INTO user_logins SELECT * FROM user_logins_unpartitioned")
+                if info['id_sequence']:
+                    cur.execute(f"ALTER SEQUENCE {info['id_sequence']} OWNED BY user_logins.id")
+                cur.execute("DROP TABLE user_logins_unpartitioned")
+                
+                # Partitioned indexes cascade to every current and future partition
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_user_logins_login_time ON user_logins (login_time)")
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_user_logins_user_time ON user_logins (user_id, login_time)")
+                
+                if info['has_rollup']:
+                    self._create_login_count_triggers(cur)
+            return True
+        except Exception as e:
+            logging.error(f"Error partitioning user_logins: {e}")
+            return False
+    
+    def _create_login_partition(self, cur, month: date) -> bool:
+        """
+        Create the partition for one month if it does not exist; True if created.
+        
+        Rows of the month already in the DEFAULT partition (the schedule did
+        not run in time) would make CREATE fail, so DEFAULT is detached, the
+        partition created, the rows moved into it and DEFAULT re-attached, all
+        in the caller's transaction.
+        """
+        name = login_partition_name(month)
+        next_month = add_months(month, 1)
+        cur.execute("""
+            SELECT to_regclass(%s) IS NOT NULL AS present,
+                   to_regclass('user_logins_default') IS NOT NULL AS has_default
+        """, (name,))
+        info = cur.fetchone()
+        if info['present']:
+            return False
+        
+        stranded = False
+        if info['has_default']:
+            cur.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM user_logins_default WHERE login_time >= %s AND login_time < %s
+                ) AS stranded
+            """, (month, next_month))
+            stranded = cur.fetchone()['stranded']
+        
+        if stranded:
+            cur.execute("LOCK TABLE user_logins IN ACCESS EXCLUSIVE MODE")
+            cur.execute("ALTER TABLE user_logins DETACH PARTITION user_logins_default")
+        cur.execute(
+            sql.SQL("CREATE TABLE {} PARTITION OF user_logins FOR VALUES FROM (%s) TO (%s)").format(
+                sql.Identifier(name)
+            ),
+            (month, next_month)
+        )
+        if stranded:
+            cur.execute(
+                sql.SQL("""
+                    WITH moved AS (
+                        DELETE FROM user_logins_default WHERE login_time >= %s AND login_time < %s
+                        RETURNING *
+                    )
+                    INSERT INTO {} SELECT * FROM moved
+                """).format(sql.Identifier(name)),
+                (month, next_month)
+            )
+            logging.warning(f"Moved {cur.rowcount} user_logins rows from the DEFAULT partition to {name}")
+            cur.execute("ALTER TABLE user_logins ATTACH PARTITION user_logins_default DEFAULT")
+        return True
+    
+    def ensure_login_partitions(self, months_ahead: int = None) -> List[str]:
+        """
+        Create the monthly user_logins partitions from this month up to months_ahead (idempotent).
+        
+        Meant to run on a schedule (python -m auth_login.maintenance
+        maintain-login-partitions) and at startup; rows for months without a
+        partition land in the DEFAULT partition meanwhile. Every month with
+        rows in DEFAULT also gets its partition, and those rows are moved
+        into it (see _create_login_partition).
+        
+        Args:
+            months_ahead: Future months to cover (default: LOGIN_PARTITION_MONTHS_AHEAD)
+        
+        Returns:
+            Names of the partitions created
+        """
+        months_ahead = LOGIN_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+        created = []
+        month = month_start(datetime.now())
+        months = [add_months(month, i) for i in range(months_ahead + 1)]
+        
+        try:
+            months = sorted(set(months) | set(self.get_default_login_partition_months()))
+        except Exception as e:
+            logging.error(f"Error reading the DEFAULT login partition: {e}")
+        
+        for month in months:
+            try:
+                with self.get_cursor() as cur:
+                    if self._create_login_partition(cur, month):
+                        created.append(login_partition_name(month))
+            except Exception as e:
+                logging.error(f"Error creating login partition for {month:%Y-%m}: {e}")
+        
+        return created
+    
+    def get_default_login_partition_months(self) -> List[date]:
+        """
+        Get the months with rows in the DEFAULT user_logins partition.
+        
+        DEFAULT should stay empty; rows there mean the partition schedule
+        did not run in time.
+        
+        Returns:
+            Month starts, oldest first (empty if user_logins is not partitioned)
+        """
+        with self.get_cursor() as cur:
+            cur.execute("SELECT to_regclass('user_logins_default') IS NOT NULL AS has_default")
+            if not cur.fetchone()['has_default']:
+                return []
+            cur.execute("""
+                SELECT DISTINCT date_trunc('month', login_time)::date AS month
+                FROM user_logins_default
+                ORDER BY month
+            """)
+            months = [row['month'] for row in cur.fetchall()]
+        if months:
+            logging.warning(f"DEFAULT login partition holds rows for {', '.join(f'{m:%Y-%m}' for m in months)}")
+        return months
+    
+    def list_login_partitions(self) -> List[Dict]:
+        """
+        Get the attached user_logins partitions.
+        
+        Returns:
+            List of dictionaries with name, range_start and range_end (dates,
+            None for the DEFAULT partition), is_default and estimated_rows
+        """
+        query = """
+            SELECT c.relname AS name,
+                   pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT' AS is_default,
+                   GREATEST(c.reltuples, 0)::bigint AS estimated_rows
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'user_logins'::regclass
+            ORDER BY c.relname
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query)
+                rows = [dict(row) for row in cur.fetchall()]
+        except Exception as e:
+            logging.error(f"Error listing login partitions: {e}")
+            return []
+        
+        for row in rows:
+            month = login_partition_month(row['name'])
+            row['range_start'] = month
+            row['range_end'] = add_months(month, 1) if month else None
+        return rows
+    
+    def detach_login_partition(self, name: str) -> bool:
+        """
+        Detach one monthly partition from user_logins.
+        
+        DETACH fires no DELETE triggers, so the partition's logins are taken
+        out of user_login_counts in the same transaction; the rollup keeps
+        matching the attached log.
+        """
+        try:
+            with self.get_cursor() as cur:
+                cur.execute("SELECT to_regclass('user_login_counts') IS NOT NULL AS has_rollup")
+                if cur.fetchone()['has_rollup']:
+                    cur.execute(sql.SQL("""
+                        UPDATE user_login_counts c
+                        SET success_count = c.success_count - d.success_count,
+                            failed_count = c.failed_count - d.failed_count
+                        FROM (
+                            SELECT user_id,
+                                   COUNT(*) FILTER (WHERE login_status = 'success') AS success_count,
+                                   COUNT(*) FILTER (WHERE login_status <> 'success') AS failed_count
+                            FROM {}
+                            WHERE user_id IS NOT NULL
+                            GROUP BY user_id
+                        ) d
+                        WHERE c.user_id = d.user_id
+                    """).format(sql.Identifier(name)))
+                cur.execute(sql.SQL("ALTER TABLE user_logins DETACH PARTITION {}").format(sql.Identifier(name)))
+            return True
+        except Exception as e:
+            logging.error(f"Error detaching login partition {name}: {e}")
+            return False
+    
+    def attach_login_partition(self, name: str) -> bool:
+        """
+        Attach a standalone monthly table (e.g. a restored archive) to user_logins.
+        
+        The month comes from the table name; its logins are added back to
+        user_login_counts in the same transaction.
+        """
+        month = login_partition_month(name)
+        if month is None:
+            raise ValueError(f"Not a monthly login partition name: {name}")
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(
+                    sql.SQL("ALTER TABLE user_logins ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)").format(
+                        sql.Identifier(name)
+                    ),
+                    (month, add_months(month, 1))
+                )
+                cur.execute("SELECT to_regclass('user_login_counts') IS NOT NULL AS has_rollup")
+                if cur.fetchone()['has_rollup']:
+                    cur.execute(sql.SQL("""
+                        INSERT INTO user_login_counts (user_id, success_count, failed_count, last_success_at)
+                        SELECT user_id,
+                               COUNT(*) FILTER (WHERE login_status = 'success'),
+                               COUNT(*) FILTER (WHERE login_status <> 'success'),
+                               MAX(login_time) FILTER (WHERE login_status = 'success')
+                        FROM {}
+                        WHERE user_id IS NOT NULL
+                        GROUP BY user_id
+                        ON CONFLICT (user_id) DO UPDATE
+                        SET success_count = user_login_counts.success_count + EXCLUDED.success_count,
+                            failed_count = user_login_counts.failed_count + EXCLUDED.failed_count,
+                            last_success_at = GREATEST(user_login_counts.last_success_at, EXCLUDED.last_success_at)
+                    """).format(sql.Identifier(name)))
+            return True
+        except Exception as e:
+            logging.error(f"Error attaching login partition {name}: {e}")
+            return False
+    
+    def ensure_rbac_notify_triggers(self) -> bool:
+        """
+        Create the triggers announcing RBAC changes on RBAC_CHANNEL (idempotent).
+        
+        Payloads are 'kind:id,id,...' ('kind:*' when too long for NOTIFY) and
+        are delivered only when the writing transaction commits:
+        
+            user              users.is_admin/is_active changes, user_roles rows (user ids)
+            role              roles.is_active changes, role_inheritance rows (role ids)
+            role_permissions  permission_roles rows (role ids)
+            permission        permissions rows (permission ids)
+        
+        Row-level triggers with a WHEN clause keep last_login updates on
+        users from notifying; the link tables use one statement-level
+        notification per statement.
+        
+        Processes only lengthen their cache TTLs and snapshot max age after
+        their listener (re)connects and rbac_notify_triggers_installed()
+        confirms every table is covered; until then the short TTLs apply.
+        """
+        statements = [
+            f"""
+            CREATE OR REPLACE FUNCTION rbac_notify_rows() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            DECLARE
+                ids text;
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    EXECUTE format('SELECT string_agg(DISTINCT %1$I::text, '','') FROM new_rows', TG_ARGV[1]) INTO ids;
+                ELSIF TG_OP = 'DELETE' THEN
+                    EXECUTE format('SELECT string_agg(DISTINCT %1$I::text, '','') FROM old_rows', TG_ARGV[1]) INTO ids;
+                ELSE
+                    EXECUTE format(
+                        'SELECT string_agg(DISTINCT id::text, '','') '
+                        'FROM (SELECT %1$I AS id FROM old_rows UNION SELECT %1$I FROM new_rows) changed',
+                        TG_ARGV[1]) INTO ids;
+                END IF;
+                IF ids IS NULL THEN
+                    RETURN NULL;
+                END IF;
+                IF length(ids) > 7900 THEN
+                    ids := '*';
+                END IF;
+                PERFORM pg_notify('{RBAC_CHANNEL}', TG_ARGV[0] || ':' || ids);
+                RETURN NULL;
+            END
+            $$
+            """,
+            f"""
+            CREATE OR REPLACE FUNCTION rbac_notify_row() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM pg_notify('{RBAC_CHANNEL}', TG_ARGV[0] || ':' || OLD.id);
+                ELSE
+                    PERFORM pg_notify('{RBAC_CHANNEL}', TG_ARGV[0] || ':' || NEW.id);
+                END IF;
+                RETURN NULL;
+            END
+            $$
+            """,
+        ]
+        
+        # users and roles: only authorization columns matter
+        for table, kind, columns in [('users', 'user', ['is_admin', 'is_active']),
+                                     ('roles', 'role', ['is_active'])]:
+            changed = ' OR '.join(f"OLD.{c} IS DISTINCT FROM NEW.{c}" for c in columns)
+            statements += [
+                f"DROP TRIGGER IF EXISTS trg_rbac_notify_{table}_update ON {table}",
+                f"""
+                CREATE TRIGGER trg_rbac_notify_{table}_update
+                AFTER UPDATE ON {table}
+                FOR EACH ROW WHEN ({changed})
+                EXECUTE FUNCTION rbac_notify_row('{kind}')
+                """,
+                f"DROP TRIGGER IF EXISTS trg_rbac_notify_{table}_delete ON {table}",
+                f"""
+                CREATE TRIGGER trg_rbac_notify_{table}_delete
+                AFTER DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION rbac_notify_row('{kind}')
+                """,
+            ]
+        
+        # Link and catalog tables: one notification per statement
+        for table, kind, column in [('user_roles', 'user', 'user_id'),
+                                    ('role_inheritance', 'role', 'role_id'),
+                                    ('permission_roles', 'role_permissions', 'role_id'),
+                                    ('permissions', 'permission', 'id')]:
+            for event, referencing in [('INSERT', 'NEW TABLE AS new_rows'),
+                                       ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+                                       ('DELETE', 'OLD TABLE AS old_rows')]:
+                name = f"trg_rbac_notify_{table}_{event.lower()}"
+                statements += [
+                    f"DROP TRIGGER IF EXISTS {name} ON {table}",
+                    f"""
+                    CREATE TRIGGER {name}
+                    AFTER {event} ON {table}
+                    REFERENCING {referencing}
+                    FOR EACH STATEMENT EXECUTE FUNCTION rbac_notify_rows('{kind}', '{column}')
+                    """,
+                ]
+        
+        try:
+            with self.get_cursor() as cur:
+                self._create_role_hierarchy_tables(cur)
+                for statement in statements:
+                    cur.execute(statement)
+            return True
+        except Exception as e:
+            logging.error(f"Error creating RBAC notify triggers: {e}")
+            return False
+    
+    def rbac_notify_triggers_installed(self) -> bool:
+        """Check that every RBAC table announces its changes"""
+        query = """
+            SELECT COUNT(DISTINCT tgrelid) AS tables
+            FROM pg_trigger
+            WHERE tgname LIKE 'trg\\_rbac\\_notify\\_%%'
+              AND tgrelid = ANY(%s::regclass[])
+        """
+        
+        try:
+            with self.get_cursor() as cur:
+                cur.execute(query, (RBAC_NOTIFY_TABLES,))
+                return cur.fetchone()['tables'] == len(RBAC_NOTIFY_TABLES)
+        except Exception as e:
+            logging.error(f"Error checking RBAC notify triggers: {e}")
+            return False
+    
+    def _create_role_hierarchy_tables(self, cur):
+        """Create role_inheritance, role_closure and the user_effective_roles view (idempotent)"""
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS role_inheritance (
+                role_id INTEGER NOT NULL REFERENCES roles(id) ON DELETE CASCADE,
+                inherited_role_id INTEGER NOT NULL REFERENCES roles(id) ON DELETE CASCADE,
+                created_by INTEGER,
+                PRIMARY KEY (role_id, inherited_role_id),
+                CHECK (role_id <> inherited_role_id)
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS role_closure (
+                ancestor_id INTEGER NOT NULL REFERENCES roles(id) ON DELETE CASCADE,
+                descendant_id INTEGER NOT NULL REFERENCES roles(id) ON DELETE CASCADE,
+                depth INTEGER NOT NULL,
+                PRIMARY KEY (ancestor_id, descendant_id)
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_role_closure_descendant ON role_closure (descendant_id)")
+        # Active roles a user holds, directly or inherited. An inactive assigned
+        # role grants nothing; an inactive inherited role grants nothing itself
+        # but the roles it inherits still apply.
+        cur.execute("""
+            CREATE OR REPLACE VIEW user_effective_roles AS
+            SELECT ur.user_id, ur.role_id
+            FROM user_roles ur
+            JOIN roles r ON r.id = ur.role_id AND r.is_active = TRUE
+            UNION
+            SELECT ur.user_id, rc.descendant_id
+            FROM user_roles ur
+            JOIN roles a ON a.id = ur.role_id AND a.is_active = TRUE
+            JOIN role_closure rc ON rc.ancestor_id = ur.role_id
+            JOIN roles r ON r.id = rc.descendant_id AND r.is_active = TRUE
+        """)
+    
+    def ensure_role_hierarchy(self) -> bool:
+        """
+        Create the role inheritance tables (idempotent).
+        
+        role_inheritance holds the edges; role_closure every (ancestor,
+        descendant) pair with its shortest depth, rewritten on each edge
+        change so resolving a user's roles never recurses.
+        """
+        try:
+            with self.get_cursor() as cur:
+                self._create_role_hierarchy_tables(cur)
+            return True
+        except Exception as e:
+            logging.error(f"Error creating role hierarchy tables: {e}")
+            return False
+    
+    def ensure_user_effective_permissions(self) -> bool:
+        """
+        Create user_effective_permissions and the triggers that maintain it (idempotent).
+        
+        The table holds one (user_id, permission_id) row per permission a user
+        gets through an active role, directly or inherited (user_effective_roles),
+        with wildcard grants expanded (role_effective_permissions). is_admin and
+        is_active are not folded in; readers check them on users at query time.
+        Statement-level triggers on user_roles, permission_roles, permissions,
+        roles (is_active) and role_closure recompute just the affected users
+        with uep_refresh_users(); deleted users and permissions cascade. The
+        table is populated in the transaction that installs the triggers, so
+        it is never live and empty.
+        """
+        statements = [
+            """
+            CREATE TABLE IF NOT EXISTS user_effective_permissions (
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                permission_id INTEGER NOT NULL REFERENCES permissions(id) ON DELETE CASCADE,
+                PRIMARY KEY (user_id, permission_id)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_uep_permission ON user_effective_permissions (permission_id)",
+            # Permissions each role grants, wildcards (module or action '*')
+            # expanded to the concrete permissions they match
+            """
+            CREATE OR REPLACE VIEW role_effective_permissions AS
+            SELECT pr.role_id, pr.permission_id
+            FROM permission_roles pr
+            UNION
+            SELECT pr.role_id, p.id
+            FROM permission_roles pr
+            JOIN permissions w ON w.id = pr.permission_id AND (w.module = '*' OR w.action = '*')
+            JOIN permissions p ON (w.module = '*' OR p.module = w.module)
+                              AND (w.action = '*' OR p.action = w.action)
+            """,
+            """
+            CREATE OR REPLACE FUNCTION uep_refresh_users(target_ids int[]) RETURNS void
+            LANGUAGE plpgsql AS $$
+            DECLARE
+                bucket int;
+            BEGIN
+                -- Serialize concurrent refreshes of the same users; each later
+                -- statement then sees the other transaction's committed rows
+                FOR bucket IN SELECT DISTINCT id % 256 FROM unnest(target_ids) AS id ORDER BY 1 LOOP
+                    PERFORM pg_advisory_xact_lock(hashtext('user_effective_permissions'), bucket);
+                END LOOP;
+                
+                DELETE FROM user_effective_permissions uep
+                WHERE uep.user_id = ANY(target_ids)
+                  AND NOT EXISTS (
+                      SELECT 1
+                      FROM user_effective_roles er
+                      JOIN role_effective_permissions pr ON pr.role_id = er.role_id
+                      WHERE er.user_id = uep.user_id AND pr.permission_id = uep.permission_id
+                  );
+                
+                INSERT INTO user_effective_permissions (user_id, permission_id)
+                SELECT DISTINCT er.user_id, pr.permission_id
+                FROM user_effective_roles er
+                JOIN role_effective_permissions pr ON pr.role_id = er.role_id
+                WHERE er.user_id = ANY(target_ids)
+                ON CONFLICT DO NOTHING;
+            END
+            $$
+            """,
+            """
+            CREATE OR REPLACE FUNCTION uep_user_roles_changed() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            DECLARE
+                ids int[];
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    SELECT array_agg(DISTINCT user_id) INTO ids FROM new_rows;
+                ELSIF TG_OP = 'DELETE' THEN
+                    SELECT array_agg(DISTINCT user_id) INTO ids FROM old_rows;
+                ELSE
+                    SELECT array_agg(DISTINCT user_id) INTO ids
+                    FROM (SELECT user_id FROM old_rows UNION SELECT user_id FROM new_rows) changed;
+                END IF;
+                IF ids IS NOT NULL THEN
+                    PERFORM uep_refresh_users(ids);
+                END IF;
+                RETURN NULL;
+            END
+            $$
+            """,
+            """
+            CREATE OR REPLACE FUNCTION uep_roles_changed() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            DECLARE
+                role_ids int[];
+                ids int[];
+            BEGIN
+                IF TG_TABLE_NAME = 'permission_roles' THEN
+                    IF TG_OP = 'INSERT' THEN
+                        SELECT array_agg(DISTINCT role_id) INTO role_ids FROM new_rows;
+                    ELSIF TG_OP = 'DELETE' THEN
+                        SELECT array_agg(DISTINCT role_id) INTO role_ids FROM old_rows;
+                    ELSE
+                        SELECT array_agg(DISTINCT role_id) INTO role_ids
+                        FROM (SELECT role_id FROM old_rows UNION SELECT role_id FROM new_rows) changed;
+                    END IF;
+                ELSIF TG_TABLE_NAME = 'permissions' THEN
+                    -- Roles holding a wildcard that matches (or matched) the rows
+                    IF TG_OP = 'INSERT' THEN
+                        SELECT array_agg(DISTINCT pr.role_id) INTO role_ids
+                        FROM new_rows n
+                        JOIN permissions w ON (w.module = '*' OR w.action = '*')
+                                          AND (w.module = '*' OR w.module = n.module)
+                                          AND (w.action = '*' OR w.action = n.action)
+                        JOIN permission_roles pr ON pr.permission_id = w.id;
+                    ELSE
+                        SELECT array_agg(DISTINCT pr.role_id) INTO role_ids
+                        FROM (SELECT module, action FROM old_rows UNION SELECT module, action FROM new_rows) n
+                        JOIN permissions w ON (w.module = '*' OR w.action = '*')
+                                          AND (w.module = '*' OR w.module = n.module)
+                                          AND (w.action = '*' OR w.action = n.action)
+                        JOIN permission_roles pr ON pr.permission_id = w.id;
+                    END IF;
+                ELSIF TG_TABLE_NAME = 'role_closure' THEN
+                    -- The ancestors gained or lost inherited roles
+                    IF TG_OP = 'INSERT' THEN
+                        SELECT array_agg(DISTINCT ancestor_id) INTO role_ids FROM new_rows;
+                    ELSE
+                        SELECT array_agg(DISTINCT ancestor_id) INTO role_ids FROM old_rows;
+                    END IF;
+                ELSE
+                    -- roles: only activation changes matter
+                    SELECT array_agg(n.id) INTO role_ids
+                    FROM new_rows n JOIN old_rows o ON o.id = n.id
+                    WHERE n.is_active IS DISTINCT FROM o.is_active;
+                END IF;
+                IF role_ids IS NULL THEN
+                    RETURN NULL;
+                END IF;
+                
+                -- Holders of the roles and of every role inheriting from them
+                SELECT array_agg(DISTINCT user_id) INTO ids
+                FROM user_roles
+                WHERE role_id = ANY(role_ids)
+                   OR role_id IN (SELECT ancestor_id FROM role_closure WHERE descendant_id = ANY(role_ids));
+                IF ids IS NOT NULL THEN
+                    PERFORM uep_refresh_users(ids);
+                END IF;
+                RETURN NULL;
+            END
+            $$
+            """,
+        ]
+        
+        triggers = [
+            ('user_roles', 'INSERT', 'NEW TABLE AS new_rows', 'uep_user_roles_changed'),
+            ('user_roles', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows', 'uep_user_roles_changed'),
+            ('user_roles', 'DELETE', 'OLD TABLE AS old_rows', 'uep_user_roles_changed'),
+            ('permission_roles', 'INSERT', 'NEW TABLE AS new_rows', 'uep_roles_changed'),
+            ('permission_roles', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows', 'uep_roles_changed'),
+            ('permission_roles', 'DELETE', 'OLD TABLE AS old_rows', 'uep_roles_changed'),
+            ('roles', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows', 'uep_roles_changed'),
+            ('permissions', 'INSERT', 'NEW TABLE AS new_rows', 'uep_roles_changed'),
+            ('permissions', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows', 'uep_roles_changed'),
+            ('role_closure', 'INSERT', 'NEW TABLE AS new_rows', 'uep_roles_changed'),
+            ('role_closure', 'DELETE', 'OLD TABLE AS old_rows', 'uep_roles_changed'),
+        ]
+        for table, event, referencing, function in triggers:
+            name = f"trg_uep_{table}_{event.lower()}"
+            statements += [
+                f"DROP TRIGGER IF EXISTS {name} ON {table}",
+                f"""
+                CREATE TRIGGER {name}
+                AFTER {event} ON {table}
+                REFERENCING {referencing}
+                FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+                """,
+            ]
+        
+        try:
+            with self.get_cursor() as cur:
+                self._create_role_hierarchy_tables(cur)
+                # Writers wait until the triggers and the rows are both in place
+                cur.execute("LOCK TABLE user_roles, permission_roles, permissions, roles, role_closure "
+                            "IN SHARE ROW EXCLUSIVE MODE")
+                for statement in statements:
+                    cur.execute(statement)
+                self._populate_user_effective_permissions(cur)
+            return True
+        except Exception as e:
+            logging.error(f"Error creating user_effective_permissions: {e}")
+            return False
+    
+    def rebuild_user_effective_permissions(self) -> int:
+        """
+        Recompute user_effective_permissions from scratch.
+        
+        Holds SHARE locks on the RBAC tables so no trigger-maintained change
+        can interleave with the rebuild.
+        
+        Returns:
+            Number of rows written, or -1 on error
+        """
         try:
-            self.pool.closeall()
-            logging.info("Connection pool closed")
+            with self.get_cursor() as cur:
+                cur.execute("LOCK TABLE user_roles, permission_roles, permissions, roles, role_closure IN SHARE MODE")
+                return self._populate_user_effective_permissions(cur)
         except Exception as e:
-            logging.error(f"Error closing connection pool: {e}")
+            logging.error(f"Error rebuilding user_effective_permissions: {e}")
+            return -1
+    
+    def _populate_user_effective_permissions(self, cur) -> int:
+        """Replace user_effective_permissions with the live join; the caller holds the locks"""
+        cur.execute("TRUNCATE user_effective_permissions")
+        cur.execute("""
+            INSERT INTO user_effective_permissions (user_id, permission_id)
+            SELECT DISTINCT er.user_id, pr.permission_id
+            FROM user_effective_roles er
+            JOIN role_effective_permissions pr ON pr.role_id = er.role_id
+        """)
+        return cur.rowcount
+    
+    def verify_user_effective_permissions(self, limit: int = 100) -> Dict:
+        """
+        Diff user_effective_permissions against the live user -> role -> permission join
+        (inherited roles included).
+        
+        Returns:
+            Dictionary with 'missing' (rows the join has but the table lacks)
+            and 'extra' (rows the table has but the join does not), each a
+            list of up to limit {'user_id', 'permission_id'}
+        """
+        query = """
+            WITH live AS (
+                SELECT DISTINCT er.user_id, pr.permission_id
+                FROM user_effective_roles er
+                JOIN role_effective_permissions pr ON pr.role_id = er.role_id
+            )
+            SELECT 'missing' AS kind, user_id, permission_id
+            FROM (SELECT * FROM live EXCEPT SELECT user_id, permission_id FROM user_effective_permissions) m
+            UNION ALL
+            SELECT 'extra', user_id, permission_id
+            FROM (SELECT user_id, permission_id FROM user_effective_permissions EXCEPT SELECT * FROM live) e
+            ORDER BY 1, 2, 3
+        """
+        
+        diff = {'missing': [], 'extra': []}
+        with self.get_cursor() as cur:
+            cur.execute(query)
+            for row in cur.fetchall():
+                if len(diff[row['kind']]) < limit:
+                    diff[row['kind']].append({'user_id': row['user_id'], 'permission_id': row['permission_id']})
+        return diff
+    
+    def ensure_permission_matrix_indexes(self) -> bool:
+        """
+        Create the indexes behind get_permission_matrix (idempotent).
+        
+        The expression index serves module-ordered paging of matrix rows; the
+        trigram indexes serve the module/action substring filters.
+        """
+        statements = [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            "CREATE INDEX IF NOT EXISTS idx_permissions_module_action ON permissions "
+            "((COALESCE(module, 'General')), (COALESCE(action, 'N/A')))",
+            "CREATE INDEX IF NOT EXISTS idx_permissions_module_trgm ON permissions "
+            "USING gin ((COALESCE(module, 'General')) gin_trgm_ops)",
+            "CREATE INDEX IF NOT EXISTS idx_permissions_action_trgm ON permissions "
+            "USING gin ((COALESCE(action, 'N/A')) gin_trgm_ops)",
+        ]
+        
+        try:
+            with self.get_cursor() as cur:
+                for statement in statements:
+                    cur.execute(statement)
+            return True
+        except Exception as e:
+            logging.error(f"Error creating permission matrix indexes: {e}")
+            return False
+    
+    def close_pool(self):
+        """Release this manager's reference to the shared connection pool"""
+        if self._pool_released:
+            return
+        self._pool_released = True
+        release_pool(self.connection_string)
+        logging.info("Connection pool released")
 
 
 # Export for easy import
@@ -0,0 +1,204 @@
+"""
+Audit Export
+Streams users, role assignments and login history to CSV, gzip CSV or Parquet
+in constant memory. Usable from the admin panel or the command line:
+
+    python -m auth_login.export user_logins --format csv.gz --since 2025-01-01 -o logins.csv.gz
+"""
+
+import os
+import sys
+import gzip
+import argparse
+import logging
+from datetime import datetime
+from typing import BinaryIO
+
+from auth_login.database import AuthenticationManager
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ['csv', 'csv.gz', 'parquet']
+
+# Largest export the admin panel hands to the browser (the download is held in
+# the Streamlit server's memory); bigger exports go through the command line
+PANEL_EXPORT_MAX_MB = int(os.getenv('PANEL_EXPORT_MAX_MB', '50'))
+
+# Exportable tables; password hashes are never exported
+EXPORT_QUERIES = {
+    'users': """
+        SELECT id, username, email, full_name, phone_number,
+               is_admin, is_active, last_login, created_by, extra
+        FROM users
+        ORDER BY id
+    """,
+    'user_roles': """
+        SELECT id, role_id, user_id, assigned_by
+        FROM user_roles
+        ORDER BY id
+    """,
+    'permission_roles': """
+        SELECT id, permission_id, role_id, created_by
+        FROM permission_roles
+        ORDER BY id
+    """,
+    'user_logins': """
+        SELECT id, user_id, login_time, login_status
+        FROM user_logins
+        WHERE login_time >= COALESCE(%(since)s, '-infinity'::timestamp)
+          AND login_time < COALESCE(%(until)s, 'infinity'::timestamp)
+        ORDER BY id
+    """,
+}
+
+# Rows per Parquet row group
+PARQUET_BATCH_ROWS = 50_000
+
+
+def _parquet_schemas():
+    return {
+        'users': pa.schema([
+            ('id', pa.int64()), ('username', pa.string()), ('email', pa.string()),
+            ('full_name', pa.string()), ('phone_number', pa.string()),
+            ('is_admin', pa.bool_()), ('is_active', pa.bool_()),
+            ('last_login', pa.timestamp('us')), ('created_by', pa.int64()), ('extra', pa.string()),
+        ]),
+        'user_roles': pa.schema([
+            ('id', pa.int64()), ('role_id', pa.int64()), ('user_id', pa.int64()), ('assigned_by', pa.int64()),
+        ]),
+        'permission_roles': pa.schema([
+            ('id', pa.int64()), ('permission_id', pa.int64()), ('role_id', pa.int64()), ('created_by', pa.int64()),
+        ]),
+        'user_logins': pa.schema([
+            ('id', pa.int64()), ('user_id', pa.int64()),
+            ('login_time', pa.timestamp('us')), ('login_status', pa.string()),
+        ]),
+    }
+
+
+def export_table(auth: AuthenticationManager, table: str, out: BinaryIO, fmt: str = 'csv',
+                 since: datetime = None, until: datetime = None) -> None:
+    """
+    Stream one table to a binary file object.
+
+    CSV output is produced by COPY ... TO STDOUT straight into out; Parquet is
+    written in row groups from a server-side cursor.
+
+    Args:
+        auth: AuthenticationManager instance for database operations
+        table: One of EXPORT_QUERIES
+        out: Binary file object to write to
+        fmt: One of EXPORT_FORMATS
+        since: For user_logins, only attempts at or after this timestamp
+        until: For user_logins, only attempts before this timestamp
+    """
+    if table not in EXPORT_QUERIES:
+        raise ValueError(f"Unknown export table: {table}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    params = {'since': since, 'until': until}
+    export_query(auth, EXPORT_QUERIES[table], out, fmt, params, schema=table)
+
+
+def export_query(auth: AuthenticationManager, query: str, out: BinaryIO, fmt: str = 'csv',
+                 params=None, schema: str = None) -> None:
+    """
+    Stream the rows of a query to a binary file object.
+
+    Args:
+        auth: AuthenticationManager instance for database operations
+        query: SELECT statement to export
+        out: Binary file object to write to
+        fmt: One of EXPORT_FORMATS
+        params: Query parameters
+        schema: Parquet schema to use (a key of EXPORT_QUERIES); required for parquet
+    """
+    if fmt == 'parquet':
+        _export_parquet(auth, query, params, out, schema)
+        return
+
+    with auth.get_cursor() as cur:
+        query = cur.mogrify(query, params).decode('utf-8')
+        copy_sql = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)"
+        if fmt == 'csv.gz':
+            with gzip.GzipFile(fileobj=out, mode='wb') as gz:
+                cur.copy_expert(copy_sql, gz)
+        else:
+            cur.copy_expert(copy_sql, out)
+
+
+def _export_parquet(auth: AuthenticationManager, query: str, params, out: BinaryIO, schema: str) -> None:
+    if pa is None:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = parquet_schema(schema)
+    with pq.ParquetWriter(out, schema) as writer:
+        batch = []
+        for row in auth.iter_query(query, params):
+            batch.append(row)
+            if len(batch) >= PARQUET_BATCH_ROWS:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+
+def parquet_schema(table: str):
+    """Get the Parquet schema used for one of EXPORT_QUERIES"""
+    if pa is None:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+    return _parquet_schemas()[table]
+
+
+def export_filename(table: str, fmt: str) -> str:
+    """Suggested file name for an export"""
+    return f"{table}_{datetime.now():%Y%m%d_%H%M%S}.{fmt}"
+
+
+def export_command(table: str, fmt: str, since: datetime = None, until: datetime = None) -> str:
+    """Command line equivalent of an export, for exports too large for the panel"""
+    command = f"python -m auth_login.export {table} --format {fmt}"
+    if since:
+        command += f" --since {since.isoformat()}"
+    if until:
+        command += f" --until {until.isoformat()}"
+    return command + f" -o {export_filename(table, fmt)}"
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Export Valve 360 users, roles and login history")
+    parser.add_argument('table', choices=sorted(EXPORT_QUERIES))
+    parser.add_argument('--format', dest='fmt', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--since', type=datetime.fromisoformat, help="user_logins: from this timestamp (inclusive)")
+    parser.add_argument('--until', type=datetime.fromisoformat, help="user_logins: up to this timestamp (exclusive)")
+    parser.add_argument('-o', '--output', help="Output file (default: stdout; required for parquet)")
+    args = parser.parse_args(argv)
+
+    if args.fmt == 'parquet' and not args.output:
+        parser.error("--output is required for parquet")
+
+    auth = AuthenticationManager()
+    try:
+        if args.output:
+            with open(args.output, 'wb') as out:
+                export_table(auth, args.table, out, args.fmt, args.since, args.until)
+        else:
+            export_table(auth, args.table, sys.stdout.buffer, args.fmt, args.since, args.until)
+    except Exception as e:
+        logging.error(f"Export failed: {e}")
+        print(f"❌ Export failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        auth.close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Password Hashing Executor
+Runs bcrypt work on a bounded worker pool, off the Streamlit script thread
+"""
+
+import os
+import math
+import time
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import bcrypt
+
+# Calibration settings: pick the bcrypt cost whose hash time is closest to the
+# target on this host, never going below the security floor. Set BCRYPT_ROUNDS
+# to pin one cost for the whole deployment instead.
+BCRYPT_TARGET_MS = float(os.getenv('BCRYPT_TARGET_MS', '250'))
+BCRYPT_MIN_ROUNDS = int(os.getenv('BCRYPT_MIN_ROUNDS', '10'))
+BCRYPT_MAX_ROUNDS = 16
+_PROBE_ROUNDS = 8
+
+# Worker processes for bulk hashing; half the cores by default so interactive
+# logins on the same host keep CPU to run on
+BCRYPT_BULK_WORKERS = int(os.getenv('BCRYPT_BULK_WORKERS', '0')) or max(1, (os.cpu_count() or 2) // 2)
+
+
+class ServerBusyError(Exception):
+    """Raised when too many password hashes are already queued"""
+
+
+def _hash(password: str, rounds: int = 12) -> str:
+    """Hash a password using bcrypt with salt"""
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def hash_passwords_parallel(passwords: List[str], rounds: int, max_workers: int = None) -> List[str]:
+    """
+    Hash many passwords across a process pool (bulk imports).
+    
+    Runs outside the shared PasswordHasher so a large import cannot starve
+    interactive logins of hashing slots, and on fewer processes than there
+    are cores so it cannot starve them of CPU either.
+    
+    Args:
+        passwords: Plaintext passwords
+        rounds: bcrypt cost factor
+        max_workers: Worker processes (default: BCRYPT_BULK_WORKERS)
+    
+    Returns:
+        Hashes in the same order as passwords
+    """
+    if not passwords:
+        return []
+    max_workers = min(max_workers or BCRYPT_BULK_WORKERS, len(passwords))
+    chunksize = max(1, len(passwords) // (max_workers * 4))
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        return list(executor.map(_hash, passwords, [rounds] * len(passwords), chunksize=chunksize))
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash"""
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def hash_cost(hashed_password: str) -> Optional[int]:
+    """Get the cost factor of a bcrypt hash ($2b$<cost>$...)"""
+    try:
+        return int(hashed_password.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _time_hash(rounds: int, samples: int = 3) -> float:
+    """Median wall time in ms of one bcrypt hash at the given cost"""
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration-probe', bcrypt.gensalt(rounds=rounds))
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate_rounds(target_ms: float = BCRYPT_TARGET_MS, min_rounds: int = BCRYPT_MIN_ROUNDS) -> Dict:
+    """
+    Pick the bcrypt cost factor that best hits target_ms on this host.
+    
+    Each extra round doubles the work, so one cheap probe is enough to
+    extrapolate; the chosen cost is then measured directly.
+    
+    Args:
+        target_ms: Desired time for one hash in milliseconds
+        min_rounds: Lowest cost factor allowed regardless of hardware
+    
+    Returns:
+        Dictionary with rounds, target_ms, measured_ms and calibrated_at
+    """
+    probe_ms = max(_time_hash(_PROBE_ROUNDS), 0.01)
+    rounds = _PROBE_ROUNDS + round(math.log2(target_ms / probe_ms))
+    rounds = max(min_rounds, min(BCRYPT_MAX_ROUNDS, rounds))
+    result = {
+        'rounds': rounds,
+        'target_ms': target_ms,
+        'measured_ms': round(_time_hash(rounds, samples=1), 1),
+        'calibrated_at': datetime.now(),
+    }
+    logging.info(f"bcrypt calibrated: {result}")
+    return result
+
+
+class PasswordHasher:
+    """
+    Bounded bcrypt executor.
+
+    bcrypt releases the GIL while hashing, so a thread pool sized to the core
+    count runs hashes in parallel. Work beyond max_workers + max_pending is
+    rejected immediately with ServerBusyError instead of queueing without bound.
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = None, rounds: int = None):
+        """
+        Initialize the hasher
+
+        Args:
+            max_workers: Concurrent hashes (default: CPU core count)
+            max_pending: Hashes allowed to wait for a worker (default: 4 per worker)
+            rounds: Fixed bcrypt cost factor (default: calibrated for this host)
+        """
+        if rounds is None:
+            self.calibration = calibrate_rounds()
+        else:
+            self.calibration = {'rounds': rounds, 'target_ms': None,
+                                'measured_ms': None, 'calibrated_at': None}
+        self.rounds = self.calibration['rounds']
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending if max_pending is not None else self.max_workers * 4
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def submit(self, fn, *args):
+        """Queue hash work, failing fast when the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            logging.warning("Password hashing queue full, rejecting request")
+            raise ServerBusyError("Server busy, please try again in a moment")
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def hash(self, password: str) -> str:
+        """Hash a password on the worker pool"""
+        return self.submit(_hash, password, self.rounds).result()
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password on the worker pool"""
+        return self.submit(_verify, password, hashed_password).result()
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """
+        Check whether a stored hash is weaker than the target cost.
+        
+        Only upgrades: each process calibrates on its own hardware, so app
+        nodes may settle on neighbouring costs; rehashing down as well would
+        rewrite a user's hash back and forth as logins hit different nodes.
+        Pin BCRYPT_ROUNDS to give every node the same target.
+        """
+        cost = hash_cost(hashed_password)
+        return cost is None or cost < self.rounds
+
+    def rehash_in_background(self, password: str, on_hashed) -> bool:
+        """
+        Hash a password at the target cost without waiting for the result.
+        
+        Args:
+            password: The verified plaintext password
+            on_hashed: Callback receiving the new hash (runs on the worker thread)
+        
+        Returns:
+            bool: True if queued, False if the hasher is busy (retried next login)
+        """
+        def task():
+            new_hash = _hash(password, self.rounds)
+            on_hashed(new_hash)
+            with self._lock:
+                self._rehashed += 1
+
+        try:
+            self.submit(task)
+            return True
+        except ServerBusyError:
+            return False
+
+    def get_stats(self) -> Dict:
+        """Get queue depth and throughput counters"""
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'rehashed': self._rehashed,
+                'rounds': self.rounds,
+                'calibration': dict(self.calibration),
+            }
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        self._executor.shutdown(wait=True)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher() -> PasswordHasher:
+    """Get the process-wide password hasher, creating it on first use"""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                workers = os.getenv('BCRYPT_WORKERS')
+                pending = os.getenv('BCRYPT_MAX_PENDING')
+                rounds = os.getenv('BCRYPT_ROUNDS')
+                _hasher = PasswordHasher(
+                    max_workers=int(workers) if workers else None,
+                    max_pending=int(pending) if pending else None,
+                    rounds=int(rounds) if rounds else None
+                )
+    return _hasher
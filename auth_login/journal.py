@@ -0,0 +1,440 @@
+"""
+Write-Behind Login Journal
+Takes user_logins inserts off the login path: events are appended to a local
+spill file, queued in memory and written in batches by a background thread.
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+# One login event: {'seq', 'user_id', 'login_time', 'login_status', 'touch_last_login', 'count_daily'}
+Event = Dict
+
+
+class LoginJournal:
+    """
+    Bounded write-behind queue for login events, backed by append-only segments.
+
+    append() writes the event to the current spill segment (one O_APPEND
+    write, optionally fsynced) and queues it; a background thread writes
+    queued events with flush_fn in batches of up to batch_size. Segments are
+    rotated at segment_bytes and deleted once every event in them is in the
+    database.
+
+    Backpressure: when max_pending events are queued, append() waits up to
+    block_timeout for room, then returns False so the caller writes
+    synchronously instead; the login path slows down rather than growing
+    memory without bound.
+
+    Durability: an appended event is in the spill file before append()
+    returns, so it survives a process crash (and, with fsync=True, a power
+    loss). Segment names carry a token unique to each journal instance, and
+    the owner holds an flock on every segment until it is deleted; any
+    segment whose lock can be taken was left behind by a dead instance (even
+    one that had this process's pid) and is replayed with replay_fn, which
+    skips events already in the database, on the next start.
+
+    Clock: events are stamped when they are journaled, in UTC from this
+    host's clock (the synchronous path uses the database's clock), and
+    flush_fn stores them in the database's time zone.
+
+    Poison events: when the head batch has failed max_attempts times with one
+    of permanent_errors (e.g. a foreign key violation for a deleted user), it
+    is bisected; the parts that write go through and single events that still
+    fail are appended to dead-letter.jsonl, so they cannot block the queue.
+    """
+
+    def __init__(self, directory: str, flush_fn: Callable[[List[Event]], None],
+                 replay_fn: Callable[[List[Event]], None] = None, max_pending: int = 10000,
+                 batch_size: int = 1000, flush_interval: float = 0.5, block_timeout: float = 0.05,
+                 segment_bytes: int = 4 * 1024 * 1024, fsync: bool = False,
+                 permanent_errors: tuple = (), max_attempts: int = 5):
+        """
+        Initialize the journal
+
+        Args:
+            directory: Spill directory (one per database)
+            flush_fn: Callable writing a batch of events; raises on failure
+            replay_fn: Callable writing recovered events idempotently (default: flush_fn)
+            max_pending: Queued events before append() applies backpressure
+            batch_size: Maximum events per flush_fn call
+            flush_interval: Seconds the flusher waits for a batch to fill
+            block_timeout: Seconds append() waits for room before giving up
+            segment_bytes: Spill segment size before rotation
+            fsync: fsync each append (survive power loss, not just process crashes)
+            permanent_errors: Exception types flush_fn raises for events that will never write
+            max_attempts: Permanent failures of a batch before it is bisected
+        """
+        self.directory = directory
+        self._flush_fn = flush_fn
+        self._replay_fn = replay_fn or flush_fn
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.permanent_errors = permanent_errors
+        self.max_attempts = max_attempts
+        self.dead_letter_path = os.path.join(directory, 'dead-letter.jsonl')
+        self._permanent_failures = 0  # consecutive permanent failures of the head batch
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()   # one flusher (or final flush) at a time
+        self._closed = False
+        self._seq = 0
+        self._flushed_seq = 0
+
+        # Spill segments: closed segments wait for their last event to be flushed
+        self._token = uuid.uuid4().hex
+        self._segment_index = 0
+        self._segment_fd = None
+        self._segment_path = None
+        self._segment_size = 0
+        self._closed_segments: List[tuple] = []  # (path, last_seq, fd); fds stay open to keep the lock
+
+        self._stats = {
+            'appended': 0, 'flushed': 0, 'flush_batches': 0, 'flush_failures': 0,
+            'sync_fallbacks': 0, 'replayed': 0, 'dead_lettered': 0, 'max_depth': 0,
+            'last_flush_ms': 0.0, 'max_flush_ms': 0.0, 'total_flush_ms': 0.0,
+        }
+
+        os.makedirs(directory, exist_ok=True)
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name="login-journal-flusher", daemon=True)
+        self._thread.start()
+
+    # ==================== SPILL SEGMENTS ====================
+
+    def _open_segment(self):
+        self._segment_index += 1
+        name = f"{self._token}-{self._segment_index:06d}.jsonl"
+        # Locked under a name replay ignores, then renamed, so no replayer can
+        # take a new segment for an orphan before its owner holds the lock
+        pending_path = os.path.join(self.directory, f"pending-{name}")
+        fd = os.open(pending_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._segment_path = os.path.join(self.directory, f"segment-{name}")
+        os.rename(pending_path, self._segment_path)
+        self._segment_fd = fd
+        self._segment_size = 0
+
+    def _rotate_segment(self):
+        self._closed_segments.append((self._segment_path, self._seq, self._segment_fd))
+        self._open_segment()
+
+    @staticmethod
+    def _remove_segment(path: str, fd: int):
+        # Unlinked before the fd (and its lock) is closed, so nobody replays it
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+    def _release_segments(self):
+        """Delete closed segments whose events are all in the database"""
+        while self._closed_segments and self._closed_segments[0][1] <= self._flushed_seq:
+            path, _, fd = self._closed_segments.pop(0)
+            self._remove_segment(path, fd)
+
+    # ==================== APPEND ====================
+
+    def append(self, user_id: int, login_status: str, touch_last_login: bool = False,
+               login_time: datetime = None, count_daily: bool = False) -> bool:
+        """
+        Journal one login attempt.
+
+        touch_last_login and count_daily are carried on the event for
+        flush_fn (move users.last_login forward, count it once written).
+
+        Returns:
+            True if the event was journaled; False if the journal is full or
+            closed and the caller must write it synchronously
+        """
+        deadline = None
+        with self._cond:
+            while len(self._queue) >= self.max_pending and not self._closed:
+                if deadline is None:
+                    deadline = time.monotonic() + self.block_timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            if self._closed or len(self._queue) >= self.max_pending:
+                self._stats['sync_fallbacks'] += 1
+                return False
+
+            self._seq += 1
+            event = {
+                'seq': self._seq,
+                'user_id': user_id,
+                'login_time': (login_time or datetime.now(timezone.utc)).isoformat(),
+                'login_status': login_status,
+                'touch_last_login': touch_last_login,
+                'count_daily': count_daily,
+            }
+            line = (json.dumps(event, separators=(',', ':')) + '\n').encode('utf-8')
+            try:
+                os.write(self._segment_fd, line)
+                if self.fsync:
+                    os.fsync(self._segment_fd)
+            except OSError as e:
+                logging.error(f"Error writing login journal segment: {e}")
+                self._seq -= 1
+                self._stats['sync_fallbacks'] += 1
+                return False
+
+            self._segment_size += len(line)
+            if self._segment_size >= self.segment_bytes:
+                self._rotate_segment()
+
+            self._queue.append(event)
+            self._stats['appended'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], len(self._queue))
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    # ==================== FLUSHING ====================
+
+    def _take_batch(self, wait: bool) -> List[Event]:
+        with self._cond:
+            if wait and len(self._queue) < self.batch_size and not self._closed:
+                self._cond.wait(self.flush_interval)
+            return [self._queue[i] for i in range(min(self.batch_size, len(self._queue)))]
+
+    def _write_batch(self, batch: List[Event]) -> bool:
+        start = time.perf_counter()
+        try:
+            self._flush_fn(batch)
+        except Exception as e:
+            logging.error(f"Error flushing login journal: {e}")
+            self._stats['flush_failures'] += 1
+            if isinstance(e, self.permanent_errors):
+                self._permanent_failures += 1
+            return False
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self._permanent_failures = 0
+        self._settle(batch, batch)
+        with self._cond:
+            self._stats['flush_batches'] += 1
+            self._stats['last_flush_ms'] = elapsed
+            self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], elapsed)
+            self._stats['total_flush_ms'] += elapsed
+        return True
+
+    def _settle(self, batch: List[Event], done: List[Event]):
+        """Drop the done events (written or dead-lettered) of the head batch from the queue"""
+        done_seqs = {e['seq'] for e in done}
+        remaining = [e for e in batch if e['seq'] not in done_seqs]
+        with self._cond:
+            for _ in batch:
+                self._queue.popleft()
+            self._queue.extendleft(reversed(remaining))
+            # Segments are released up to the first event not yet in the database
+            self._flushed_seq = remaining[0]['seq'] - 1 if remaining else batch[-1]['seq']
+            self._release_segments()
+            self._stats['flushed'] += len(done)
+            self._cond.notify_all()  # wake appenders waiting for room
+
+    def _isolate(self, batch: List[Event]) -> bool:
+        """
+        Bisect a batch that keeps failing permanently.
+
+        Parts that write are written; single events that still fail with a
+        permanent error are dead-lettered. Stops at the first other error
+        (the database went away), leaving what is left queued.
+
+        Returns:
+            True if every event was written or dead-lettered
+        """
+        completed, written, dead = self._bisect(batch, self._flush_fn)
+        self._dead_letter(dead)
+        self._permanent_failures = 0
+        self._settle(batch, written + [event for event, _ in dead])
+        return completed
+
+    def _bisect(self, events: List[Event], write_fn: Callable[[List[Event]], None]):
+        """Write events in halves down to single poison events; (completed, written, dead)"""
+        written, dead = [], []
+
+        def attempt(part: List[Event]) -> bool:
+            try:
+                write_fn(part)
+            except self.permanent_errors as e:
+                if len(part) == 1:
+                    dead.append((part[0], e))
+                    return True
+                middle = len(part) // 2
+                return attempt(part[:middle]) and attempt(part[middle:])
+            except Exception as e:
+                logging.error(f"Error isolating failed login events: {e}")
+                return False
+            written.extend(part)
+            return True
+
+        return attempt(events), written, dead
+
+    def _dead_letter(self, dead: List[tuple]):
+        if not dead:
+            return
+        lines = b''.join(
+            (json.dumps({'event': event, 'error': str(error)}, separators=(',', ':')) + '\n').encode('utf-8')
+            for event, error in dead
+        )
+        fd = os.open(self.dead_letter_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, lines)
+        finally:
+            os.close(fd)
+        with self._cond:
+            self._stats['dead_lettered'] += len(dead)
+        logging.error(f"Dead-lettered {len(dead)} login events to {self.dead_letter_path}")
+
+    def flush(self) -> bool:
+        """Write everything queued now; False if a batch failed (it stays queued)"""
+        with self._write_lock:
+            while True:
+                batch = self._take_batch(wait=False)
+                if not batch:
+                    return True
+                if not self._write_batch(batch):
+                    return False
+
+    def _run(self):
+        self._replay_orphans()
+        backoff = self.flush_interval
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+            with self._write_lock:
+                batch = self._take_batch(wait=True)
+                if batch and self._permanent_failures >= self.max_attempts:
+                    ok = self._isolate(batch)
+                else:
+                    ok = self._write_batch(batch) if batch else True
+            if ok:
+                backoff = self.flush_interval
+            else:
+                # Database unavailable: events stay queued (and spilled); retry with backoff
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    # ==================== RECOVERY ====================
+
+    def _replay_orphans(self):
+        """Write events from segments of journal instances that died before flushing them"""
+        mine = f"segment-{self._token}-"
+        for name in sorted(os.listdir(self.directory)):
+            # replaying-*: left by an earlier version that claimed segments by renaming
+            if not name.startswith(('segment-', 'replaying-')) or name.startswith(mine):
+                continue
+            path = os.path.join(self.directory, name)
+            fd = self._lock_orphan(path)
+            if fd is None:
+                continue
+
+            # The lock is the claim: other instances skip the segment until it is gone
+            try:
+                events = self._read_segment(path)
+                for i in range(0, len(events), self.batch_size):
+                    self._replay_batch(events[i:i + self.batch_size])
+            except Exception as e:
+                logging.error(f"Error replaying login journal segment {name}: {e}")
+                os.close(fd)  # leave it for the next start
+                continue
+            self._remove_segment(path, fd)
+            self._stats['replayed'] += len(events)
+            logging.info(f"Replayed {len(events)} login events from {name}")
+
+    @staticmethod
+    def _lock_orphan(path: str):
+        """Lock a segment nobody holds; its fd, or None if it is live or already gone"""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # Another replayer may have removed it between our open and lock
+            if os.fstat(fd).st_ino != os.stat(path).st_ino:
+                raise FileNotFoundError(path)
+        except (BlockingIOError, FileNotFoundError):
+            os.close(fd)
+            return None
+        return fd
+
+    def _replay_batch(self, events: List[Event]):
+        """Replay one batch, dead-lettering poison events instead of failing every start"""
+        try:
+            self._replay_fn(events)
+        except self.permanent_errors as e:
+            completed, _, dead = self._bisect(events, self._replay_fn)
+            self._dead_letter(dead)
+            if not completed:
+                raise e
+
+    @staticmethod
+    def _read_segment(path: str) -> List[Event]:
+        events = []
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    break  # torn write at the crash point
+        return events
+
+    # ==================== LIFECYCLE ====================
+
+    def close(self):
+        """Stop the flusher, write what is left and remove the spill segments (process shutdown)"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=self.flush_interval * 2)
+
+        if self.flush():
+            with self._cond:
+                self._remove_segment(self._segment_path, self._segment_fd)
+                self._release_segments()
+        else:
+            # Leave the segments for the next start to replay
+            logging.error(f"{len(self._queue)} login events left in {self.directory} for replay")
+
+    def get_stats(self) -> Dict:
+        """Get queue depth, throughput and flush latency metrics"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._queue)
+            stats['max_pending'] = self.max_pending
+            stats['segments'] = len(self._closed_segments) + 1
+        batches = stats['flush_batches']
+        stats['avg_flush_ms'] = stats.pop('total_flush_ms') / batches if batches else 0.0
+        return stats
+
+    def pending(self) -> int:
+        """Events journaled but not yet written"""
+        with self._cond:
+            return len(self._queue)
+
+
+def event_login_time(event: Event) -> datetime:
+    """Parse an event's login_time (timezone-aware; older naive stamps are host local time)"""
+    login_time = datetime.fromisoformat(event['login_time'])
+    return login_time if login_time.tzinfo else login_time.astimezone()
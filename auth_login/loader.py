@@ -0,0 +1,89 @@
+"""
+Request-Scoped Loaders
+Batch and memoize per-rerun lookups over AuthenticationManager
+"""
+
+from typing import Dict, Iterable, List
+
+from auth_login.database import AuthenticationManager
+
+
+class BatchLoader:
+    """
+    Collects keys, fetches them with one batch call, and memoizes the results.
+
+    Meant to live for a single Streamlit rerun: create it with the page and
+    let it go with the page, so nothing it memoizes can outlive the rerun.
+    """
+
+    def __init__(self, batch_fn, missing=lambda: None):
+        """
+        Initialize the loader
+
+        Args:
+            batch_fn: Callable taking a list of keys and returning {key: value}
+            missing: Factory for the value of keys the batch did not return
+        """
+        self._batch_fn = batch_fn
+        self._missing = missing
+        self._cache: Dict = {}
+        self._pending: Dict = {}  # ordered set of keys waiting for the next batch
+        self.batches = 0
+
+    def prime(self, keys: Iterable):
+        """Queue keys so the next load fetches them in the same batch"""
+        for key in keys:
+            if key not in self._cache:
+                self._pending[key] = None
+
+    def _dispatch(self):
+        keys = list(self._pending)
+        self._pending.clear()
+        if not keys:
+            return
+        results = self._batch_fn(keys)
+        self.batches += 1
+        for key in keys:
+            self._cache[key] = results[key] if key in results else self._missing()
+
+    def load(self, key):
+        """Get one value, fetching it (and anything queued) if needed"""
+        if key not in self._cache:
+            self._pending[key] = None
+            self._dispatch()
+        return self._cache[key]
+
+    def load_many(self, keys: Iterable) -> List:
+        """Get many values with at most one batch call"""
+        keys = list(keys)
+        self.prime(keys)
+        self._dispatch()
+        return [self._cache[key] for key in keys]
+
+    def clear(self, key=None):
+        """Forget one memoized key, or all of them"""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+
+class RequestLoader:
+    """Per-rerun loaders for users, user roles and role permissions"""
+
+    def __init__(self, auth_manager: AuthenticationManager):
+        """
+        Initialize the loaders
+
+        Args:
+            auth_manager: AuthenticationManager instance for database operations
+        """
+        self.auth = auth_manager
+        self.users = BatchLoader(auth_manager.get_users_by_ids)
+        self.user_roles = BatchLoader(auth_manager.get_roles_for_users, missing=list)
+        self.role_permissions = BatchLoader(auth_manager.get_permissions_for_roles, missing=list)
+
+    @property
+    def query_count(self) -> int:
+        """Database round trips made through the manager so far"""
+        return self.auth.query_count
@@ -3,6 +3,7 @@ import sys
 import os
 from PIL import Image
 from auth_login.database import AuthenticationManager
+from auth_login.hashing import ServerBusyError
 
 
 class LoginManager:
@@ -21,6 +22,8 @@ class LoginManager:
                 return True, "Login successful!", user
             else:
                 return False, "Invalid username or password", None
+        except ServerBusyError as e:
+            return False, str(e), None
         except Exception as e:
             return False, f"Error: {str(e)}", None
     
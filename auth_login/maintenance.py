@@ -0,0 +1,237 @@
+"""
+Database Maintenance
+One-shot schema and rollup tasks for the auth tables, run from the command line:
+
+    python -m auth_login.maintenance ensure-indexes
+    python -m auth_login.maintenance install-login-counts --backfill
+    python -m auth_login.maintenance check-login-counts --repair
+    python -m auth_login.maintenance partition-user-logins
+    python -m auth_login.maintenance maintain-login-partitions --format parquet
+    python -m auth_login.maintenance restore-login-archive archive/user_logins/user_logins_p202401.csv.gz
+"""
+
+import sys
+import argparse
+import logging
+
+from auth_login.database import AuthenticationManager
+from auth_login.archive import maintain_login_partitions, restore_login_archive, ARCHIVE_FORMATS
+
+
+def _ensure_indexes(auth: AuthenticationManager, args) -> int:
+    ok = auth.ensure_user_directory_indexes() and auth.ensure_permission_matrix_indexes()
+    print("✅ Indexes created" if ok else "❌ Failed to create indexes (see auth_errors.log)")
+    return 0 if ok else 1
+
+
+def _install_login_counts(auth: AuthenticationManager, args) -> int:
+    if not auth.ensure_login_count_rollup():
+        print("❌ Failed to install user_login_counts (see auth_errors.log)")
+        return 1
+    print("✅ user_login_counts and its triggers installed")
+    if args.backfill:
+        return _backfill_login_counts(auth, args)
+    return 0
+
+
+def _backfill_login_counts(auth: AuthenticationManager, args) -> int:
+    users = auth.backfill_login_counts()
+    if users < 0:
+        print("❌ Backfill failed (see auth_errors.log)")
+        return 1
+    print(f"✅ Backfilled login counts for {users} users")
+    return 0
+
+
+def _check_login_counts(auth: AuthenticationManager, args) -> int:
+    mismatches = auth.check_login_counts()
+    if not mismatches:
+        print("✅ user_login_counts matches user_logins")
+        return 0
+
+    print(f"⚠️ {len(mismatches)} users differ from user_logins:")
+    for row in mismatches[:args.show]:
+        print(f"   user {row['user_id']}: success {row['actual_success']} (expected {row['expected_success']}), "
+              f"failed {row['actual_failed']} (expected {row['expected_failed']})")
+    if args.repair:
+        return _backfill_login_counts(auth, args)
+    return 1
+
+
+def _partition_user_logins(auth: AuthenticationManager, args) -> int:
+    if not auth.partition_user_logins(args.months_ahead):
+        print("❌ Failed to partition user_logins (see auth_errors.log)")
+        return 1
+    print("✅ user_logins is partitioned by month")
+    return 0
+
+
+def _list_login_partitions(auth: AuthenticationManager, args) -> int:
+    for partition in auth.list_login_partitions():
+        span = "DEFAULT" if partition['is_default'] else f"{partition['range_start']} → {partition['range_end']}"
+        print(f"   {partition['name']:<24} {span:<28} ~{partition['estimated_rows']} rows")
+    return 0
+
+
+def _maintain_login_partitions(auth: AuthenticationManager, args) -> int:
+    report = maintain_login_partitions(auth, args.retention_months, args.dir, args.fmt, args.months_ahead)
+    print(f"✅ Created {len(report['created'])} partitions: {', '.join(report['created']) or '-'}")
+    for archive in report['archived']:
+        print(f"✅ Archived {archive['rows']} logins from {archive['partition']} to {archive['path']}")
+    if report['default_months']:
+        months = ', '.join(f"{month:%Y-%m}" for month in report['default_months'])
+        print(f"⚠️  The DEFAULT partition still holds logins for {months} (see auth_errors.log)")
+        return 1
+    return 0
+
+
+def _restore_login_archive(auth: AuthenticationManager, args) -> int:
+    report = restore_login_archive(auth, args.path, attach=not args.no_attach)
+    state = "attached" if report['attached'] else "left detached"
+    print(f"✅ Restored {report['rows']} logins into {report['partition']} ({state})")
+    return 0
+
+
+def _rebuild_daily_counts(auth: AuthenticationManager, args) -> int:
+    days = auth.rebuild_daily_login_counts(args.days)
+    if days < 0:
+        print("❌ Rebuild failed (see auth_errors.log)")
+        return 1
+    print(f"✅ Recomputed user_daily_login for {days} days from user_logins")
+    return 0
+
+
+def _install_rbac_notify(auth: AuthenticationManager, args) -> int:
+    if not auth.ensure_rbac_notify_triggers():
+        print("❌ Failed to install RBAC notify triggers (see auth_errors.log)")
+        return 1
+    if not auth.rbac_notify_triggers_installed():
+        print("❌ Triggers created but not found on every RBAC table (see auth_errors.log)")
+        return 1
+    print("✅ RBAC tables now announce changes; app servers switch to long cache TTLs "
+          "when their listener next connects (restart them to apply now)")
+    return 0
+
+
+def _install_role_hierarchy(auth: AuthenticationManager, args) -> int:
+    if not auth.ensure_role_hierarchy():
+        print("❌ Failed to install the role hierarchy tables (see auth_errors.log)")
+        return 1
+    print("✅ role_inheritance and role_closure installed")
+    return 0
+
+
+def _rebuild_role_closure(auth: AuthenticationManager, args) -> int:
+    changed = auth.rebuild_role_closure()
+    if changed < 0:
+        print("❌ Rebuild failed (see auth_errors.log)")
+        return 1
+    print(f"✅ role_closure matches role_inheritance ({changed} rows changed)")
+    return 0
+
+
+def _install_effective_permissions(auth: AuthenticationManager, args) -> int:
+    if not auth.ensure_user_effective_permissions():
+        print("❌ Failed to install user_effective_permissions (see auth_errors.log)")
+        return 1
+    print("✅ user_effective_permissions installed, populated and maintained by its triggers")
+    return 0
+
+
+def _rebuild_effective_permissions(auth: AuthenticationManager, args) -> int:
+    rows = auth.rebuild_user_effective_permissions()
+    if rows < 0:
+        print("❌ Rebuild failed (see auth_errors.log)")
+        return 1
+    print(f"✅ Rebuilt user_effective_permissions ({rows} grants)")
+    return 0
+
+
+def _verify_effective_permissions(auth: AuthenticationManager, args) -> int:
+    diff = auth.verify_user_effective_permissions(args.show)
+    if not diff['missing'] and not diff['extra']:
+        print("✅ user_effective_permissions matches the role grants")
+        return 0
+
+    for kind in ('missing', 'extra'):
+        for row in diff[kind]:
+            print(f"   {kind}: user {row['user_id']} permission {row['permission_id']}")
+    if args.repair:
+        return _rebuild_effective_permissions(auth, args)
+    return 1
+
+
+COMMANDS = {
+    'ensure-indexes': _ensure_indexes,
+    'install-login-counts': _install_login_counts,
+    'backfill-login-counts': _backfill_login_counts,
+    'check-login-counts': _check_login_counts,
+    'partition-user-logins': _partition_user_logins,
+    'list-login-partitions': _list_login_partitions,
+    'maintain-login-partitions': _maintain_login_partitions,
+    'restore-login-archive': _restore_login_archive,
+    'rebuild-daily-counts': _rebuild_daily_counts,
+    'install-rbac-notify': _install_rbac_notify,
+    'install-role-hierarchy': _install_role_hierarchy,
+    'rebuild-role-closure': _rebuild_role_closure,
+    'install-effective-permissions': _install_effective_permissions,
+    'rebuild-effective-permissions': _rebuild_effective_permissions,
+    'verify-effective-permissions': _verify_effective_permissions,
+}
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Valve 360 auth database maintenance")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('ensure-indexes', help="Create the user directory and permission matrix indexes")
+    install = subparsers.add_parser('install-login-counts', help="Create user_login_counts and its triggers")
+    install.add_argument('--backfill', action='store_true', help="Backfill from user_logins afterwards")
+    subparsers.add_parser('backfill-login-counts', help="Rebuild user_login_counts from user_logins")
+    check = subparsers.add_parser('check-login-counts', help="Compare user_login_counts with user_logins")
+    check.add_argument('--repair', action='store_true', help="Backfill when mismatches are found")
+    check.add_argument('--show', type=int, default=20, help="Mismatches to print (default: 20)")
+    partition = subparsers.add_parser('partition-user-logins', help="Convert user_logins to monthly partitions")
+    partition.add_argument('--months-ahead', type=int, help="Future partitions to create")
+    subparsers.add_parser('list-login-partitions', help="Show the attached user_logins partitions")
+    maintain = subparsers.add_parser('maintain-login-partitions',
+                                     help="Create upcoming partitions and archive those past retention (run from cron)")
+    maintain.add_argument('--months-ahead', type=int, help="Future partitions to keep ready")
+    maintain.add_argument('--retention-months', type=int, help="Months kept attached before the current one")
+    maintain.add_argument('--format', dest='fmt', choices=ARCHIVE_FORMATS, default='csv.gz')
+    maintain.add_argument('--dir', help="Archive directory (default: LOGIN_ARCHIVE_DIR)")
+    restore = subparsers.add_parser('restore-login-archive', help="Load an archived month back into user_logins")
+    restore.add_argument('path')
+    restore.add_argument('--no-attach', action='store_true', help="Restore as a standalone table only")
+    rebuild = subparsers.add_parser('rebuild-daily-counts',
+                                    help="Recompute user_daily_login from user_logins (e.g. after a crash)")
+    rebuild.add_argument('--days', type=int, default=30, help="Days to recompute (default: 30)")
+    subparsers.add_parser('install-rbac-notify',
+                          help="Create the triggers that announce RBAC changes to every app process")
+    subparsers.add_parser('install-role-hierarchy', help="Create the role inheritance tables")
+    subparsers.add_parser('rebuild-role-closure', help="Recompute role_closure from role_inheritance")
+    subparsers.add_parser('install-effective-permissions',
+                          help="Create and populate user_effective_permissions and its triggers")
+    subparsers.add_parser('rebuild-effective-permissions',
+                          help="Recompute user_effective_permissions from the role grants")
+    verify_uep = subparsers.add_parser('verify-effective-permissions',
+                                       help="Compare user_effective_permissions with the role grants")
+    verify_uep.add_argument('--repair', action='store_true', help="Rebuild when differences are found")
+    verify_uep.add_argument('--show', type=int, default=20, help="Differences of each kind to print (default: 20)")
+
+    args = parser.parse_args(argv)
+
+    auth = AuthenticationManager()
+    try:
+        return COMMANDS[args.command](auth, args)
+    except Exception as e:
+        logging.error(f"Maintenance command {args.command} failed: {e}")
+        print(f"❌ {args.command} failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        auth.close_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+RBAC Change Notifications
+Listens for the NOTIFYs sent by the RBAC table triggers and hands each
+change to a callback, so every process evicts exactly what another changed.
+"""
+
+import time
+import select
+import logging
+import threading
+from typing import Callable, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+# Channel the RBAC triggers notify on
+RBAC_CHANNEL = 'valve360_rbac'
+
+
+def parse_rbac_payload(payload: str):
+    """
+    Parse a trigger payload 'kind:id,id,...' (or 'kind:*' for too many ids).
+
+    Returns:
+        Tuple of (kind, list of int ids, or None meaning every id)
+    """
+    kind, _, ids = payload.partition(':')
+    if not ids or ids == '*':
+        return kind, None
+    return kind, [int(i) for i in ids.split(',') if i]
+
+
+class RBACListener:
+    """
+    Background LISTEN loop on its own connection (outside the shared pool).
+
+    on_change(kind, ids) is called for every notification; ids is None when
+    the change touched too many rows to list. Notifications sent while the
+    connection was down are lost, so on_reset() is called on every
+    (re)connect and on disconnect; callers drop everything cached there.
+    """
+
+    def __init__(self, connection_string: str, on_change: Callable[[str, Optional[List[int]]], None],
+                 on_reset: Callable[[bool], None], channel: str = RBAC_CHANNEL, poll_timeout: float = 5.0):
+        """
+        Initialize the listener
+
+        Args:
+            connection_string: DSN to listen on
+            on_change: Callable(kind, ids) applying one change
+            on_reset: Callable(listening) run on connect (True) and disconnect (False)
+            channel: NOTIFY channel
+            poll_timeout: Seconds between liveness checks while idle
+        """
+        self.connection_string = connection_string
+        self._on_change = on_change
+        self._on_reset = on_reset
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self._stop = threading.Event()
+        self._conn = None
+        self.listening = False
+        self.notifications = 0
+        self.reconnects = 0
+        self._thread = threading.Thread(target=self._run, name="rbac-listener", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _connect(self):
+        conn = psycopg2.connect(self.connection_string)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                self._conn = self._connect()
+                self.listening = True
+                backoff = 1.0
+                self._on_reset(True)
+                self._listen()
+            except Exception as e:
+                logging.error(f"RBAC listener disconnected: {e}")
+            finally:
+                if self.listening:
+                    self.listening = False
+                    self._on_reset(False)
+                if self._conn is not None:
+                    try:
+                        self._conn.close()
+                    except Exception:
+                        pass
+                    self._conn = None
+            if not self._stop.is_set():
+                self.reconnects += 1
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    def _listen(self):
+        conn = self._conn
+        while not self._stop.is_set():
+            if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                # Idle: make sure the server is still there
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                self.notifications += 1
+                try:
+                    kind, ids = parse_rbac_payload(notify.payload)
+                    self._on_change(kind, ids)
+                except Exception as e:
+                    logging.error(f"Error applying RBAC notification {notify.payload!r}: {e}")
+
+    def get_stats(self):
+        """Get connection state and counters"""
+        return {
+            'listening': self.listening,
+            'notifications': self.notifications,
+            'reconnects': self.reconnects,
+        }
@@ -0,0 +1,426 @@
+"""
+Compiled RBAC Snapshot
+Permission bitsets for constant-time ALL/ANY permission checks
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+# Matches any module or any action in a permission's module/action
+WILDCARD = '*'
+
+
+def is_wildcard(module: Optional[str], action: Optional[str]) -> bool:
+    """Check whether a permission's module/action is a pattern (e.g. pipelines:*, *:read)"""
+    return module == WILDCARD or action == WILDCARD
+
+
+def parse_permission_name(name: str) -> Optional[Tuple[str, str]]:
+    """Split a 'module:action' permission name; None if it is not in that form"""
+    module, sep, action = name.partition(':')
+    if not sep or not module or not action:
+        return None
+    return module, action
+
+
+def matching_permissions(module: str, action: str, permissions: Iterable[Dict]) -> List[Dict]:
+    """Get the concrete permissions a (possibly wildcard) module/action covers"""
+    return [
+        perm for perm in permissions
+        if not is_wildcard(perm.get('module'), perm.get('action'))
+        and (module == WILDCARD or perm.get('module') == module)
+        and (action == WILDCARD or perm.get('action') == action)
+    ]
+
+
+class PermissionMatcher:
+    """
+    Trie of module -> action patterns, each holding a set of values (role IDs).
+
+    A pattern level is either a literal or WILDCARD, so matching a concrete
+    (module, action) visits at most four leaves whatever the number of
+    patterns.
+    """
+
+    def __init__(self):
+        self._root: Dict[str, Dict[str, Set[int]]] = {}
+
+    def add(self, module: str, action: str, value: int):
+        """Register value under the pattern (module, action)"""
+        self._root.setdefault(module, {}).setdefault(action, set()).add(value)
+
+    def discard(self, value: int):
+        """Remove value from every pattern"""
+        for module, actions in list(self._root.items()):
+            for action, values in list(actions.items()):
+                values.discard(value)
+                if not values:
+                    del actions[action]
+            if not actions:
+                del self._root[module]
+
+    def match(self, module: str, action: str) -> Set[int]:
+        """Get the values of every pattern matching (module, action)"""
+        matched: Set[int] = set()
+        for module_key in (module, WILDCARD):
+            actions = self._root.get(module_key)
+            if actions is None:
+                continue
+            for action_key in (action, WILDCARD):
+                values = actions.get(action_key)
+                if values:
+                    matched |= values
+            if module == WILDCARD:
+                break
+        return matched
+
+    def __bool__(self):
+        return bool(self._root)
+
+
+class RBACSnapshot:
+    """
+    In-memory compiled view of roles and permissions.
+
+    Every concrete permission name gets a bit index; every active role
+    becomes the bitmask of its permissions. A user's effective permissions
+    are the OR of their active roles' masks, so checking any list of
+    permissions is a single integer AND. Roles are refreshed one at a time
+    when their permission rows change, never by rebuilding the whole snapshot.
+
+    Changes made by other processes only arrive through mark_role_stale() and
+    invalidate() when something relays them (the RBAC listener), so the
+    snapshot also expires max_age seconds after it was loaded.
+
+    Wildcard permissions (module or action '*') get no bit of their own: a
+    role holding one gets the bits of every concrete permission it matches,
+    and a trie of the held patterns answers checks of 'module:action' names
+    that have no permission row.
+    """
+
+    def __init__(self, max_age: float = None):
+        """
+        Initialize an empty snapshot
+
+        Args:
+            max_age: Seconds a loaded snapshot is trusted (None: until invalidated)
+        """
+        self._lock = threading.Lock()
+        self.max_age = max_age
+        self._reset()
+        self._stale_roles: Set[int] = set()
+        self._generation = 0               # bumped by mark_role_stale() and invalidate()
+        self._invalidated_generation = 0   # generation of the last invalidate()
+        self._loaded_at = 0.0
+        self.loaded = False
+
+    def _reset(self):
+        self._bit_index: Dict[str, int] = {}      # permission name -> bit
+        self._permission_bits: Dict[int, int] = {}  # permission id -> bit
+        self._bit_keys: Dict[int, Tuple[str, str]] = {}  # bit -> (module, action)
+        self._wildcards: Dict[int, Tuple[str, str]] = {}  # wildcard permission id -> pattern
+        self._patterns = PermissionMatcher()       # pattern -> active role ids holding it
+        self._role_masks: Dict[int, int] = {}      # active role id -> mask
+        # What checks read without the lock, swapped as one reference so a
+        # check never pairs a new bit numbering with old masks; load() only
+        # publishes fully built maps here
+        self._views = (self._bit_index, self._role_masks)
+
+    @property
+    def generation(self) -> int:
+        """Change counter; pass the value read before querying to load()"""
+        return self._generation
+
+    def is_fresh(self) -> bool:
+        """Loaded, and younger than max_age"""
+        if not self.loaded:
+            return False
+        return self.max_age is None or time.monotonic() - self._loaded_at < self.max_age
+
+    # ==================== BUILDING ====================
+
+    def load(self, permissions: List[Dict], role_permissions: Dict[int, List[int]], generation: int = None):
+        """
+        Compile the snapshot from scratch
+
+        Args:
+            permissions: Rows with id, name, module and action, in stable (id) order
+            role_permissions: Active role id -> list of permission ids
+            generation: Value of generation read before the rows were queried;
+                changes that arrived since are kept pending instead of dropped
+        """
+        with self._lock:
+            # Built aside while checks keep reading the previous load
+            bit_index, permission_bits, bit_keys, wildcards = {}, {}, {}, {}
+            for perm in permissions:
+                if is_wildcard(perm.get('module'), perm.get('action')):
+                    wildcards[perm['id']] = (perm['module'], perm['action'])
+                else:
+                    self._assign_bit(bit_index, permission_bits, bit_keys,
+                                     perm['id'], perm['name'], perm.get('module'), perm.get('action'))
+            role_masks = {
+                role_id: self._mask_of_ids(permission_bits, permission_ids)
+                for role_id, permission_ids in role_permissions.items()
+            }
+
+            patterns = PermissionMatcher()
+            for role_id, permission_ids in role_permissions.items():
+                for permission_id in permission_ids:
+                    pattern = wildcards.get(permission_id)
+                    if pattern is not None:
+                        patterns.add(*pattern, role_id)
+            if patterns:
+                for bit, key in bit_keys.items():
+                    for role_id in patterns.match(*key):
+                        role_masks[role_id] |= 1 << bit
+
+            self._bit_index, self._permission_bits, self._bit_keys = bit_index, permission_bits, bit_keys
+            self._wildcards, self._patterns, self._role_masks = wildcards, patterns, role_masks
+            self._views = (bit_index, role_masks)
+
+            raced = generation is not None and generation != self._generation
+            if not raced:
+                self._stale_roles.clear()
+            # An invalidate() during the read means the rows may predate it
+            self.loaded = not (raced and self._invalidated_generation > generation)
+            self._loaded_at = time.monotonic()
+
+    def add_permission(self, permission_id: int, name: str, module: str = None, action: str = None):
+        """Give a new permission the next free bit, granted to roles whose patterns match it"""
+        with self._lock:
+            if is_wildcard(module, action):
+                self._wildcards[permission_id] = (module, action)
+                return
+            bit = self._add_permission(permission_id, name, module, action)
+            if module and action:
+                for role_id in self._patterns.match(module, action):
+                    if role_id in self._role_masks:
+                        self._role_masks[role_id] |= 1 << bit
+
+    def _add_permission(self, permission_id: int, name: str, module: str = None, action: str = None) -> int:
+        return self._assign_bit(self._bit_index, self._permission_bits, self._bit_keys,
+                                permission_id, name, module, action)
+
+    @staticmethod
+    def _assign_bit(bit_index: Dict[str, int], permission_bits: Dict[int, int],
+                    bit_keys: Dict[int, Tuple[str, str]], permission_id: int, name: str,
+                    module: str = None, action: str = None) -> int:
+        bit = bit_index.get(name)
+        if bit is None:
+            bit = len(bit_index)
+            bit_index[name] = bit
+        permission_bits[permission_id] = bit
+        if module and action:
+            bit_keys[bit] = (module, action)
+        return bit
+
+    @staticmethod
+    def _mask_of_ids(permission_bits: Dict[int, int], permission_ids: Iterable[int]) -> int:
+        mask = 0
+        for permission_id in permission_ids:
+            bit = permission_bits.get(permission_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def invalidate(self):
+        """Recompile everything on next use (e.g. permissions renamed or removed elsewhere)"""
+        with self._lock:
+            self._generation += 1
+            self._invalidated_generation = self._generation
+            self.loaded = False
+
+    def mark_role_stale(self, role_id: int):
+        """Flag a role whose permission rows changed; it is reloaded on next use"""
+        with self._lock:
+            self._generation += 1
+            self._stale_roles.add(role_id)
+
+    def take_stale_roles(self, role_ids: Iterable[int]) -> List[int]:
+        """Claim the stale roles among role_ids for reloading"""
+        with self._lock:
+            stale = [role_id for role_id in role_ids if role_id in self._stale_roles]
+            self._stale_roles.difference_update(stale)
+            return stale
+
+    def set_role(self, role_id: int, permissions: List[Dict], is_active: bool = True):
+        """
+        Replace one role's mask
+
+        Args:
+            role_id: The ID of the role
+            permissions: Rows with id, name, module and action of the role's permissions
+            is_active: Inactive roles grant nothing
+        """
+        with self._lock:
+            self._patterns.discard(role_id)
+            if not is_active:
+                self._role_masks.pop(role_id, None)
+                return
+
+            mask = 0
+            held = PermissionMatcher()
+            for perm in permissions:
+                module, action = perm.get('module'), perm.get('action')
+                if is_wildcard(module, action):
+                    self._wildcards[perm['id']] = (module, action)
+                    self._patterns.add(module, action, role_id)
+                    held.add(module, action, role_id)
+                    continue
+                bit = self._permission_bits.get(perm['id'])
+                if bit is None:
+                    bit = self._add_permission(perm['id'], perm['name'], module, action)
+                mask |= 1 << bit
+
+            if held:
+                for bit, key in self._bit_keys.items():
+                    if held.match(*key):
+                        mask |= 1 << bit
+            self._role_masks[role_id] = mask
+
+    # ==================== CHECKS ====================
+
+    def user_mask(self, role_ids: Iterable[int]) -> int:
+        """Effective permission mask for a set of active role IDs"""
+        return self._user_mask(self._views[1], role_ids)
+
+    @staticmethod
+    def _user_mask(role_masks: Dict[int, int], role_ids: Iterable[int]) -> int:
+        mask = 0
+        for role_id in role_ids:
+            mask |= role_masks.get(role_id, 0)
+        return mask
+
+    @staticmethod
+    def _compile(bit_index: Dict[str, int], permission_names: Iterable[str]) -> Tuple[int, List[str]]:
+        mask, unknown = 0, []
+        for name in permission_names:
+            bit = bit_index.get(name)
+            if bit is None:
+                unknown.append(name)
+            else:
+                mask |= 1 << bit
+        return mask, unknown
+
+    def mask_for(self, permission_names: Iterable[str]) -> Tuple[int, int]:
+        """
+        Compile a list of permission names into a mask
+
+        Returns:
+            Tuple of (mask, number of names unknown to the snapshot)
+        """
+        mask, unknown = self._compile(self._views[0], permission_names)
+        return mask, len(unknown)
+
+    def _pattern_grants(self, role_ids: Iterable[int], name: str) -> bool:
+        """Check a name without a permission row against the roles' wildcard patterns"""
+        key = parse_permission_name(name)
+        if key is None:
+            return False
+        with self._lock:
+            matched = self._patterns.match(*key)
+        return not matched.isdisjoint(role_ids)
+
+    def has_all(self, role_ids: Iterable[int], permission_names: Iterable[str]) -> bool:
+        """Check that the roles grant ALL of the permissions"""
+        bit_index, role_masks = self._views
+        required, unknown = self._compile(bit_index, permission_names)
+        if self._user_mask(role_masks, role_ids) & required != required:
+            return False
+        return all(self._pattern_grants(role_ids, name) for name in unknown)
+
+    def has_any(self, role_ids: Iterable[int], permission_names: Iterable[str]) -> bool:
+        """Check that the roles grant ANY of the permissions"""
+        bit_index, role_masks = self._views
+        wanted, unknown = self._compile(bit_index, permission_names)
+        if self._user_mask(role_masks, role_ids) & wanted != 0:
+            return True
+        return any(self._pattern_grants(role_ids, name) for name in unknown)
+
+
+def role_closure(edges: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], int]:
+    """
+    Compute the transitive closure of role inheritance edges
+
+    Args:
+        edges: (role_id, inherited_role_id) pairs; role_id includes every
+            permission of inherited_role_id
+
+    Returns:
+        {(ancestor_id, descendant_id): shortest depth} for every role
+        reachable through one or more edges
+
+    Raises:
+        ValueError: If the edges contain a cycle
+    """
+    children: Dict[int, List[int]] = {}
+    for role_id, inherited_role_id in edges:
+        children.setdefault(role_id, []).append(inherited_role_id)
+
+    closure: Dict[Tuple[int, int], int] = {}
+    for ancestor_id in children:
+        queue = deque((child, 1) for child in children[ancestor_id])
+        while queue:
+            role_id, depth = queue.popleft()
+            if role_id == ancestor_id:
+                raise ValueError(f"Role inheritance cycle through role {ancestor_id}")
+            if (ancestor_id, role_id) in closure:
+                continue
+            closure[(ancestor_id, role_id)] = depth
+            queue.extend((child, depth + 1) for child in children.get(role_id, ()))
+    return closure
+
+
+class PermissionMatrix:
+    """
+    Compact users x permissions answer of a bulk permission check.
+
+    Each user is one integer row whose bit i is set when the user holds
+    permission_names[i]. Unknown or inactive users have an empty row.
+    """
+
+    def __init__(self, user_ids: Iterable[int], permission_names: Iterable[str], rows: Dict[int, int]):
+        self.user_ids = list(user_ids)
+        self.permission_names = list(permission_names)
+        self._columns = {name: i for i, name in enumerate(self.permission_names)}
+        self._rows = rows
+
+    @classmethod
+    def from_grants(cls, user_ids: Iterable[int], permission_names: Iterable[str],
+                    grants: Dict[int, Iterable[str]]) -> 'PermissionMatrix':
+        """Build a matrix from user id -> granted permission names"""
+        matrix = cls(user_ids, permission_names, {})
+        for user_id, names in grants.items():
+            row = 0
+            for name in names:
+                column = matrix._columns.get(name)
+                if column is not None:
+                    row |= 1 << column
+            matrix._rows[user_id] = row
+        return matrix
+
+    def has(self, user_id: int, permission_name: str) -> bool:
+        """Check one (user, permission) pair"""
+        column = self._columns.get(permission_name)
+        if column is None:
+            return False
+        return (self._rows.get(user_id, 0) >> column) & 1 == 1
+
+    def users_with(self, permission_name: str) -> List[int]:
+        """Get the users holding a permission"""
+        return [user_id for user_id in self.user_ids if self.has(user_id, permission_name)]
+
+    def permissions_of(self, user_id: int) -> List[str]:
+        """Get the requested permissions a user holds"""
+        row = self._rows.get(user_id, 0)
+        return [name for i, name in enumerate(self.permission_names) if (row >> i) & 1]
+
+    def to_dict(self) -> Dict[int, Dict[str, bool]]:
+        """Expand into {user_id: {permission_name: bool}}"""
+        return {
+            user_id: {name: self.has(user_id, name) for name in self.permission_names}
+            for user_id in self.user_ids
+        }
@@ -0,0 +1,79 @@
+"""
+Connection pool benchmark
+Counts database connections opened per 1,000 simulated Streamlit reruns,
+comparing a private pool per manager (old behaviour) with the shared pool.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/bench_connection_pool.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import psycopg2
+from psycopg2.pool import SimpleConnectionPool
+from auth_login import database
+from auth_login.database import AuthenticationManager
+
+RERUNS = 1000
+MANAGERS_PER_RERUN = 4  # LoginManager, DashboardManager, AdminPanelPage, PermissionManager
+
+_opened = 0
+_real_connect = psycopg2.connect
+
+
+def _counting_connect(*args, **kwargs):
+    global _opened
+    _opened += 1
+    return _real_connect(*args, **kwargs)
+
+
+def run_private_pools(dsn: str):
+    """Old behaviour: every manager builds (and abandons) its own pool"""
+    for _ in range(RERUNS):
+        for _ in range(MANAGERS_PER_RERUN):
+            pool = SimpleConnectionPool(1, 10, dsn)
+            conn = pool.getconn()
+            conn.cursor().execute("SELECT 1")
+            pool.putconn(conn)
+            pool.closeall()
+
+
+def run_shared_pool(dsn: str):
+    """New behaviour: managers borrow from the process-wide pool"""
+    for _ in range(RERUNS):
+        for _ in range(MANAGERS_PER_RERUN):
+            auth = AuthenticationManager(dsn)
+            with auth.get_cursor() as cur:
+                cur.execute("SELECT 1")
+            auth.close_pool()
+
+
+def main():
+    global _opened
+    dsn = os.getenv('DATABASE_URL')
+    if not dsn:
+        print("DATABASE_URL is required")
+        sys.exit(1)
+
+    psycopg2.connect = _counting_connect
+    try:
+        for label, runner in [("private pool per manager", run_private_pools),
+                              ("shared process pool", run_shared_pool)]:
+            database.close_all_pools()
+            _opened = 0
+            start = time.perf_counter()
+            runner(dsn)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<26} connections opened: {_opened:>6}   "
+                  f"elapsed: {elapsed:6.2f}s   per rerun: {elapsed / RERUNS * 1000:6.2f}ms")
+    finally:
+        psycopg2.connect = _real_connect
+        database.close_all_pools()
+
+
+if __name__ == "__main__":
+    main()
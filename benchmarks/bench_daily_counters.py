@@ -0,0 +1,84 @@
+"""
+Daily counter contention benchmark
+Runs 100 parallel "logins" that each bump today's user_daily_login counters,
+first with one UPSERT of the hot row per login (old), then through the
+sharded in-process DailyLoginCounters with background flushes (new).
+
+Note: adds real counts to today's user_daily_login row.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/bench_daily_counters.py [logins_per_thread]
+"""
+
+import os
+import sys
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# One connection per thread, so the old path waits on the row lock, not the pool
+os.environ.setdefault('DB_POOL_MAX_CONN', '100')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from auth_login.database import AuthenticationManager, get_daily_login_counters
+
+THREADS = 100
+
+HOT_ROW_UPSERT = """
+    INSERT INTO user_daily_login (date_stamp, success_count, failed_count)
+    VALUES (CURRENT_DATE, 1, 0)
+    ON CONFLICT (date_stamp)
+    DO UPDATE SET success_count = user_daily_login.success_count + 1
+"""
+
+
+def hot_row_login(auth):
+    with auth.get_cursor() as cur:
+        cur.execute(HOT_ROW_UPSERT)
+
+
+def sharded_login(auth):
+    auth.increment_daily_login_count('success')
+
+
+def run(login, auth, logins_per_thread):
+    def worker(_):
+        samples = []
+        for _ in range(logins_per_thread):
+            start = time.perf_counter()
+            login(auth)
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        samples = [s for batch in executor.map(worker, range(THREADS)) for s in batch]
+    elapsed = time.perf_counter() - start
+    samples.sort()
+    return {
+        'logins_per_sec': len(samples) / elapsed,
+        'p50': statistics.median(samples),
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main():
+    logins_per_thread = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    auth = AuthenticationManager()
+    counters = get_daily_login_counters(auth.connection_string)
+
+    for label, login in [("hot-row UPSERT (old)", hot_row_login),
+                         ("sharded counters (new)", sharded_login)]:
+        result = run(login, auth, logins_per_thread)
+        print(f"{label:<24} {THREADS} threads   {result['logins_per_sec']:10.0f} logins/s   "
+              f"p50: {result['p50']:7.3f}ms   p99: {result['p99']:7.3f}ms")
+
+    flush_start = time.perf_counter()
+    counters.flush()
+    print(f"final flush: {(time.perf_counter() - flush_start) * 1000:.1f}ms   stats: {counters.get_stats()}")
+    auth.close_pool()
+
+
+if __name__ == "__main__":
+    main()
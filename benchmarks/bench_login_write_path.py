@@ -0,0 +1,76 @@
+"""
+Login write path benchmark
+Compares the per-step login bookkeeping (three transactions) with
+record_login_outcome() against a local Postgres: the synchronous single
+statement when LOGIN_JOURNAL_ENABLED=0, the write-behind journal otherwise.
+
+Note: writes real rows to user_logins and user_daily_login.
+
+Usage:
+    DATABASE_URL=postgresql://localhost/valve360 python benchmarks/bench_login_write_path.py [iterations]
+"""
+
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from auth_login.database import AuthenticationManager
+
+# What increment_daily_login_count() ran per login before the daily counters
+# moved in process
+DAILY_UPSERT = """
+    INSERT INTO user_daily_login (date_stamp, success_count, failed_count)
+    VALUES (CURRENT_DATE, 1, 0)
+    ON CONFLICT (date_stamp)
+    DO UPDATE SET success_count = user_daily_login.success_count + 1
+"""
+
+
+def old_path(auth: AuthenticationManager, user_id: int):
+    auth.update_last_login(user_id)
+    auth.record_login_attempt(user_id, 'success')
+    with auth.get_cursor() as cur:
+        cur.execute(DAILY_UPSERT)
+
+
+def new_path(auth: AuthenticationManager, user_id: int):
+    auth.record_login_outcome(user_id, 'success')
+
+
+def measure(fn, auth, user_id, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(auth, user_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50': statistics.median(samples),
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'mean': statistics.fmean(samples),
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    auth = AuthenticationManager()
+    users = auth.get_all_users()
+    if not users:
+        print("Benchmark needs at least one active user")
+        sys.exit(1)
+    user_id = users[0]['id']
+
+    for label, fn in [("3 transactions (old)", old_path), ("record_login_outcome", new_path)]:
+        measure(fn, auth, user_id, 20)  # warm-up
+        result = measure(fn, auth, user_id, iterations)
+        print(f"{label:<22} p50: {result['p50']:6.2f}ms   p99: {result['p99']:6.2f}ms   "
+              f"mean: {result['mean']:6.2f}ms")
+
+    auth.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Password hashing concurrency benchmark
+Reports p50/p99 password verification latency through the shared hasher at
+1, 8 and 64 simultaneous logins, plus how many were rejected as busy.
+
+Usage:
+    python benchmarks/bench_password_hashing.py
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import bcrypt
+from auth_login.hashing import PasswordHasher, ServerBusyError
+
+CONCURRENCY_LEVELS = [1, 8, 64]
+ROUNDS = 5  # bursts per concurrency level
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def run_burst(hasher: PasswordHasher, hashed: str, concurrency: int):
+    barrier = threading.Barrier(concurrency)
+    latencies, busy = [], []
+    lock = threading.Lock()
+
+    def login():
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            hasher.verify('correct horse', hashed)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+        except ServerBusyError:
+            with lock:
+                busy.append(1)
+
+    threads = [threading.Thread(target=login) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, len(busy)
+
+
+def main():
+    hashed = bcrypt.hashpw(b'correct horse', bcrypt.gensalt()).decode('utf-8')
+    hasher = PasswordHasher()
+    print(f"workers: {hasher.max_workers}   max pending: {hasher.max_pending}")
+
+    for concurrency in CONCURRENCY_LEVELS:
+        latencies, rejected = [], 0
+        for _ in range(ROUNDS):
+            burst, busy = run_burst(hasher, hashed, concurrency)
+            latencies.extend(burst)
+            rejected += busy
+        print(f"{concurrency:>3} simultaneous   p50: {percentile(latencies, 0.50):8.1f}ms   "
+              f"p99: {percentile(latencies, 0.99):8.1f}ms   busy: {rejected}/{concurrency * ROUNDS}")
+
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
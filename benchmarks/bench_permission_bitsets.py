@@ -0,0 +1,98 @@
+"""
+Permission bitset benchmark
+Times ALL-permission checks of 1, 10 and 100 permissions for 10k users
+through the compiled RBAC snapshot, and (when DATABASE_URL is set) through
+the previous one-query-per-permission SQL path for a sample of users.
+
+Usage:
+    python benchmarks/bench_permission_bitsets.py
+    DATABASE_URL=postgresql://... python benchmarks/bench_permission_bitsets.py
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from auth_login.rbac import RBACSnapshot
+
+USERS = 10_000
+PERMISSIONS = 300
+ROLES = 60
+CHECK_SIZES = [1, 10, 100]
+SQL_SAMPLE_USERS = 50
+
+# The per-permission query has_permission ran before the snapshot existed
+SQL_CHECK = """
+    SELECT EXISTS (
+        SELECT 1 FROM permissions p
+        JOIN permission_roles pr ON p.id = pr.permission_id
+        JOIN roles r ON pr.role_id = r.id
+        JOIN user_roles ur ON r.id = ur.role_id
+        WHERE ur.user_id = %s AND p.name = %s AND r.is_active = TRUE
+    )
+"""
+
+
+def build_snapshot(rng):
+    permissions = [{'id': i, 'name': f"module{i // 10}.action{i % 10}"} for i in range(PERMISSIONS)]
+    role_permissions = {
+        role_id: rng.sample(range(PERMISSIONS), rng.randint(5, 120))
+        for role_id in range(ROLES)
+    }
+    snapshot = RBACSnapshot()
+    snapshot.load(permissions, role_permissions)
+    users = [frozenset(rng.sample(range(ROLES), rng.randint(1, 4))) for _ in range(USERS)]
+    return snapshot, [p['name'] for p in permissions], users
+
+
+def bench_snapshot(snapshot, names, users, rng):
+    for size in CHECK_SIZES:
+        wanted = rng.sample(names, size)
+        start = time.perf_counter()
+        granted = sum(1 for role_ids in users if snapshot.has_all(role_ids, wanted))
+        elapsed = time.perf_counter() - start
+        print(f"bitset  {size:>3} perms x {USERS} users: {elapsed * 1000:9.2f}ms total   "
+              f"{elapsed / USERS * 1e6:7.2f}us/user   granted: {granted}")
+
+
+def bench_sql(rng):
+    from auth_login.database import AuthenticationManager
+
+    auth = AuthenticationManager()
+    user_ids = [u['id'] for u in auth.get_all_users()][:SQL_SAMPLE_USERS]
+    names = [p['name'] for p in auth.get_all_permissions()]
+    if not user_ids or not names:
+        print("SQL path skipped: needs users and permissions in the database")
+        return
+
+    with auth.get_cursor() as cur:
+        for size in CHECK_SIZES:
+            wanted = [rng.choice(names) for _ in range(size)]
+            start = time.perf_counter()
+            for user_id in user_ids:
+                for name in wanted:
+                    cur.execute(SQL_CHECK, (user_id, name))
+                    if not cur.fetchone()['exists']:
+                        break
+            elapsed = time.perf_counter() - start
+            per_user = elapsed / len(user_ids)
+            print(f"sql     {size:>3} perms x {len(user_ids)} users: {elapsed * 1000:9.2f}ms total   "
+                  f"{per_user * 1e6:7.2f}us/user   (~{per_user * USERS:.1f}s for {USERS} users)")
+    auth.close_pool()
+
+
+def main():
+    rng = random.Random(42)
+    snapshot, names, users = build_snapshot(rng)
+    bench_snapshot(snapshot, names, users, rng)
+    if os.getenv('DATABASE_URL'):
+        bench_sql(rng)
+    else:
+        print("Set DATABASE_URL to compare against the SQL path")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Request loader benchmark
+Counts the queries one User Management tab rerun issues for its role
+lookups, with per-user calls (old) and with the batching RequestLoader.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/bench_request_loader.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from auth_login.database import AuthenticationManager
+from auth_login.loader import RequestLoader
+
+
+def rerun_per_user_calls():
+    auth = AuthenticationManager()
+    users = auth.get_all_users()
+    auth.get_all_roles()
+    for user in users:
+        auth.get_user_roles(user['id'])   # grouping users by role
+    for user in users:
+        auth.get_user_roles(user['id'])   # each user card
+    auth.close_pool()
+    return len(users), auth.query_count
+
+
+def rerun_request_loader():
+    auth = AuthenticationManager()
+    loader = RequestLoader(auth)
+    users = auth.get_all_users()
+    auth.get_all_roles()
+    loader.user_roles.prime(user['id'] for user in users)
+    for user in users:
+        loader.user_roles.load(user['id'])
+    for user in users:
+        loader.user_roles.load(user['id'])
+    auth.close_pool()
+    return len(users), loader.query_count
+
+
+def main():
+    for label, rerun in [("per-user calls (old)", rerun_per_user_calls),
+                         ("request loader (new)", rerun_request_loader)]:
+        start = time.perf_counter()
+        user_count, queries = rerun()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{label:<22} users: {user_count:>6}   queries: {queries:>6}   elapsed: {elapsed:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Roles overview benchmark
+Seeds 10, 100 and 1,000 roles and times one Roles tab rerun with a
+get_role_permissions call per role (old) and with the single aggregated
+get_roles_with_permission_summary query. Seeded roles are removed afterwards.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/bench_roles_summary.py
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from auth_login.database import AuthenticationManager
+
+ROLE_COUNTS = [10, 100, 1000]
+ROLE_PREFIX = 'bench_summary_'
+
+
+def seed_roles(auth, count):
+    permission_ids = [perm['id'] for perm in auth.get_all_permissions()]
+    with auth.get_cursor() as cur:
+        cur.execute("""
+            INSERT INTO roles (name, description, is_active)
+            SELECT %s || n, 'Benchmark role', TRUE
+            FROM generate_series(1, %s) AS n
+            RETURNING id
+        """, (ROLE_PREFIX, count))
+        role_ids = [row['id'] for row in cur.fetchall()]
+        pairs = [(role_id, permission_id)
+                 for role_id in role_ids
+                 for permission_id in random.sample(permission_ids, min(len(permission_ids), 8))]
+        if pairs:
+            cur.execute("""
+                INSERT INTO permission_roles (role_id, permission_id)
+                SELECT * FROM unnest(%s::int[], %s::int[])
+            """, ([p[0] for p in pairs], [p[1] for p in pairs]))
+
+
+def drop_roles(auth):
+    with auth.get_cursor() as cur:
+        cur.execute("DELETE FROM permission_roles WHERE role_id IN (SELECT id FROM roles WHERE name LIKE %s)",
+                    (ROLE_PREFIX + '%',))
+        cur.execute("DELETE FROM roles WHERE name LIKE %s", (ROLE_PREFIX + '%',))
+
+
+def rerun_per_role_calls(auth):
+    roles = auth.get_all_roles()
+    for role in roles:
+        auth.get_role_permissions(role['id'])
+    return len(roles)
+
+
+def rerun_summary(auth):
+    return len(auth.get_roles_with_permission_summary())
+
+
+def main():
+    auth = AuthenticationManager()
+    try:
+        for count in ROLE_COUNTS:
+            drop_roles(auth)
+            seed_roles(auth, count)
+            print(f"--- {count} seeded roles")
+            for label, rerun in [("per-role calls (old)", rerun_per_role_calls),
+                                 ("aggregated query (new)", rerun_summary)]:
+                queries_before = auth.query_count
+                start = time.perf_counter()
+                role_count = rerun(auth)
+                elapsed = (time.perf_counter() - start) * 1000
+                queries = auth.query_count - queries_before
+                print(f"{label:<24} roles: {role_count:>6}   queries: {queries:>6}   elapsed: {elapsed:8.1f}ms")
+    finally:
+        drop_roles(auth)
+        auth.close_pool()
+
+
+if __name__ == "__main__":
+    main()
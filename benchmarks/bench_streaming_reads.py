@@ -0,0 +1,77 @@
+"""
+Streaming read benchmark
+Compares peak Python memory of reading user_logins with fetchall() plus a
+dict copy per row (the pattern every reader used) against iter_user_logins().
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmarks/bench_streaming_reads.py [--seed 1000000]
+
+--seed inserts that many synthetic success rows for the first active user
+before measuring; leave it off to measure the existing table.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from auth_login.database import AuthenticationManager
+
+
+def seed_logins(auth: AuthenticationManager, count: int):
+    users = auth.get_all_users()
+    if not users:
+        print("Seeding needs at least one active user")
+        sys.exit(1)
+    with auth.get_cursor() as cur:
+        cur.execute("""
+            INSERT INTO user_logins (user_id, login_time, login_status)
+            SELECT %s, CURRENT_TIMESTAMP - (g * INTERVAL '1 second'), 'success'
+            FROM generate_series(1, %s) AS g
+        """, (users[0]['id'], count))
+    print(f"Seeded {count} user_logins rows")
+
+
+def read_fetchall(auth: AuthenticationManager) -> int:
+    with auth.get_cursor() as cur:
+        cur.execute("SELECT id, user_id, login_time, login_status FROM user_logins ORDER BY id")
+        rows = [dict(row) for row in cur.fetchall()]
+    return len(rows)
+
+
+def read_streaming(auth: AuthenticationManager) -> int:
+    count = 0
+    for _ in auth.iter_user_logins():
+        count += 1
+    return count
+
+
+def measure(label, reader, auth):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = reader(auth)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} rows: {rows:>9}   peak memory: {peak / 1024 / 1024:8.1f} MiB   elapsed: {elapsed:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic rows to insert first")
+    args = parser.parse_args()
+
+    auth = AuthenticationManager()
+    if args.seed:
+        seed_logins(auth, args.seed)
+
+    measure("fetchall + dict copy", read_fetchall, auth)
+    measure("iter_user_logins", read_streaming, auth)
+    auth.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,8 @@ from typing import Dict, List, Optional
 # Add parent directory to path for imports
 # sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'auth_login'))
 
-from ..auth_login.database import AuthenticationManager
+from ..auth_login.database import AuthenticationManager, get_permission_cache
+from ..auth_login.rbac import PermissionMatrix
 
 class PermissionManager:
     """Permission manager for role-based access control"""
@@ -17,22 +18,26 @@ class PermissionManager:
     # ==================== PERMISSION CHECKS ====================
     
     def check_permission(self, user_id: int, permission_name: str) -> bool:
-        """Check if user has a specific permission"""
+        """
+        Check if user has a specific permission.
+        
+        Wildcard grants (pipelines:*, *:read) are matched in memory by the
+        compiled RBAC snapshot, including 'module:action' names with no
+        permission row of their own.
+        """
         return self.auth_manager.has_permission(user_id, permission_name)
     
     def check_permissions(self, user_id: int, permissions: List[str]) -> bool:
         """Check if user has ALL permissions in the list"""
-        for permission in permissions:
-            if not self.check_permission(user_id, permission):
-                return False
-        return True
+        return self.auth_manager.has_all_permissions(user_id, permissions)
     
     def check_any_permission(self, user_id: int, permissions: List[str]) -> bool:
         """Check if user has ANY permission in the list"""
-        for permission in permissions:
-            if self.check_permission(user_id, permission):
-                return True
-        return False
+        return self.auth_manager.has_any_permission(user_id, permissions)
+    
+    def check_permissions_bulk(self, user_ids: List[int], permissions: List[str]) -> PermissionMatrix:
+        """Check every (user, permission) pair in one query"""
+        return self.auth_manager.has_permissions_bulk(user_ids, permissions)
     
     # ==================== USER PERMISSIONS ====================
     
@@ -76,19 +81,29 @@ class PermissionManager:
     
     # ==================== ADMIN CHECKS ====================
     
+    def get_authorization_context(self, user_id: int) -> Optional[Dict]:
+        """Get is_admin, is_active and active role IDs (shared by every check below)"""
+        return self.auth_manager.get_authorization_context(user_id)
+    
     def is_admin(self, user_id: int) -> bool:
         """Check if user is an admin"""
-        user = self.auth_manager.get_user_by_id(user_id)
-        if user is None:
+        context = self.get_authorization_context(user_id)
+        if context is None:
             return False
-        return user.get('is_admin', False)
+        return context['is_admin']
     
     def is_active(self, user_id: int) -> bool:
         """Check if user is active"""
-        user = self.auth_manager.get_user_by_id(user_id)
-        if user is None:
+        context = self.get_authorization_context(user_id)
+        if context is None:
             return False
-        return user.get('is_active', False)
+        return context['is_active']
+    
+    # ==================== CACHE ====================
+    
+    def get_cache_stats(self) -> Dict:
+        """Get hit/miss/eviction counters of the user authorization cache"""
+        return get_permission_cache().get_stats()
     
     def close(self):
         """Close database connection pool"""
@@ -104,11 +119,14 @@ if __name__ == "__main__":
     print("   - check_permission(user_id, permission_name)")
     print("   - check_permissions(user_id, [permissions])")
     print("   - check_any_permission(user_id, [permissions])")
+    print("   - check_permissions_bulk([user_ids], [permissions])")
     print("   - get_user_permissions(user_id)")
     print("   - get_permission_names(user_id)")
     print("   - get_user_roles(user_id)")
     print("   - get_role_names(user_id)")
+    print("   - get_authorization_context(user_id)")
     print("   - is_admin(user_id)")
     print("   - is_active(user_id)")
+    print("   - get_cache_stats()")
     
     pm.close()
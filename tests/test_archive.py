@@ -0,0 +1,57 @@
+"""Tests for archiving monthly login partitions"""
+
+import pytest
+
+# archive imports the database layer
+pytest.importorskip('psycopg2')
+pytest.importorskip('dotenv')
+
+from auth_login import archive  # noqa: E402
+
+PARTITION = 'user_logins_p202401'
+
+
+class FakeAuth:
+    """Records partition detach/attach calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def detach_login_partition(self, name):
+        self.calls.append(('detach', name))
+        return True
+
+    def attach_login_partition(self, name):
+        self.calls.append(('attach', name))
+        return True
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    monkeypatch.setattr(archive, '_archive_query', lambda auth, name: f"SELECT * FROM {name}")
+    return FakeAuth()
+
+
+def test_failed_export_leaves_the_partition_attached(auth, monkeypatch, tmp_path):
+    def failing_export(auth, query, out, fmt, schema=None):
+        out.write(b'partial')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(archive, 'export_query', failing_export)
+
+    with pytest.raises(OSError):
+        archive.archive_login_partition(auth, PARTITION, str(tmp_path))
+
+    assert auth.calls == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_mismatched_archive_re_attaches_the_partition(auth, monkeypatch, tmp_path):
+    monkeypatch.setattr(archive, 'export_query', lambda auth, query, out, fmt, schema=None: out.write(b'x'))
+    monkeypatch.setattr(archive, '_count_rows', lambda auth, name: 10)
+    monkeypatch.setattr(archive, '_archived_rows', lambda path, fmt: 9)
+
+    with pytest.raises(RuntimeError):
+        archive.archive_login_partition(auth, PARTITION, str(tmp_path))
+
+    assert auth.calls == [('detach', PARTITION), ('attach', PARTITION)]
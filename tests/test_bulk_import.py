@@ -0,0 +1,69 @@
+"""Tests for parsing bulk user import files"""
+
+import json
+
+import pytest
+
+# bulk_import imports the database layer
+pytest.importorskip('psycopg2')
+pytest.importorskip('dotenv')
+
+from auth_login.bulk_import import parse_user_records  # noqa: E402
+
+
+def test_csv_records():
+    content = (
+        "username,password,email,is_admin,roles\n"
+        "alice,secret1,alice@example.com,yes,viewer; editor\n"
+        " bob ,secret2,,0,\n"
+    )
+    records, errors = parse_user_records(content, 'csv')
+    assert errors == []
+    assert records[0]['username'] == 'alice'
+    assert records[0]['is_admin'] is True
+    assert records[0]['roles'] == ['viewer', 'editor']
+    assert records[1]['username'] == 'bob'
+    assert records[1]['email'] is None
+    assert records[1]['is_admin'] is False
+    assert records[1]['roles'] == []
+
+
+def test_csv_bytes_with_bom():
+    records, errors = parse_user_records("﻿username,password\ncarol,pw\n".encode('utf-8'), 'csv')
+    assert errors == []
+    assert records[0]['username'] == 'carol'
+
+
+def test_json_records():
+    content = json.dumps([
+        {'username': 'dave', 'password': 'pw', 'is_admin': True, 'roles': ['admin', ' ', 'ops']},
+        {'username': 'erin', 'password': 'pw', 'extra': {'team': 'qa'}},
+    ])
+    records, errors = parse_user_records(content, 'json')
+    assert errors == []
+    assert records[0]['is_admin'] is True
+    assert records[0]['roles'] == ['admin', 'ops']
+    assert records[1]['extra'] == {'team': 'qa'}
+
+
+def test_rows_without_credentials_are_reported():
+    content = json.dumps([
+        {'username': 'frank'},
+        {'password': 'pw'},
+        'not an object',
+        {'username': 'grace', 'password': 'pw'},
+    ])
+    records, errors = parse_user_records(content, 'json')
+    assert [r['username'] for r in records] == ['grace']
+    assert errors == [
+        "Row 1: username and password are required",
+        "Row 2: username and password are required",
+        "Row 3: expected an object",
+    ]
+
+
+def test_bad_input_raises():
+    with pytest.raises(ValueError):
+        parse_user_records(json.dumps({'username': 'x'}), 'json')
+    with pytest.raises(ValueError):
+        parse_user_records("username,password\n", 'xml')
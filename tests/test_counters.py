@@ -0,0 +1,93 @@
+"""Tests for the write-behind daily login counters"""
+
+import threading
+from datetime import date
+
+from auth_login.counters import DailyLoginCounters
+
+DAY = date(2025, 1, 15)
+
+
+class RecordingFlush:
+    """flush_fn that records deltas, failing while fail is set"""
+
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+
+    def __call__(self, deltas):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.calls.append({day: list(row) for day, row in deltas.items()})
+
+
+def make_counters(flush_fn, shards=4) -> DailyLoginCounters:
+    # A long interval keeps the background flusher out of the way
+    return DailyLoginCounters(flush_fn, flush_interval=3600, shards=shards)
+
+
+def test_flush_sums_success_and_failed_per_day():
+    flush = RecordingFlush()
+    counters = make_counters(flush)
+    counters.add('success', day=DAY)
+    counters.add('success', day=DAY)
+    counters.add('failed', day=DAY)
+    counters.add('locked', day=date(2025, 1, 16))
+
+    assert counters.flush()
+    assert flush.calls == [{DAY: [2, 1], date(2025, 1, 16): [0, 1]}]
+    assert counters.pending() == {}
+    assert counters.flush()
+    assert len(flush.calls) == 1  # nothing left to write
+
+
+def test_failed_flush_keeps_deltas_for_retry():
+    flush = RecordingFlush()
+    counters = make_counters(flush)
+    counters.add('success', day=DAY)
+    flush.fail = True
+
+    assert not counters.flush()
+    assert counters.pending() == {DAY: [1, 0]}
+    counters.add('success', day=DAY)
+
+    flush.fail = False
+    assert counters.flush()
+    assert flush.calls == [{DAY: [2, 0]}]
+    assert counters.get_stats()['flush_failures'] == 1
+
+
+def test_threads_spread_over_every_shard():
+    counters = make_counters(RecordingFlush(), shards=4)
+    threads = [threading.Thread(target=counters.add, args=('success', DAY)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+
+    assert all(counts for _, counts in counters._shards)
+
+
+def test_concurrent_adds_are_all_counted():
+    flush = RecordingFlush()
+    counters = make_counters(flush)
+
+    def login():
+        for _ in range(500):
+            counters.add('success', day=DAY)
+
+    threads = [threading.Thread(target=login) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counters.flush()
+    assert flush.calls == [{DAY: [4000, 0]}]
+
+
+def test_close_flushes_what_is_left():
+    flush = RecordingFlush()
+    counters = make_counters(flush)
+    counters.add('failed', day=DAY)
+    counters.close()
+    assert flush.calls == [{DAY: [0, 1]}]
@@ -0,0 +1,230 @@
+"""Tests for the write-behind login journal"""
+
+import os
+import json
+import time
+import fcntl
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from auth_login.journal import LoginJournal, event_login_time
+
+
+class PoisonError(Exception):
+    """Stands in for a permanent database error (e.g. a foreign key violation)"""
+
+
+class RecordingWriter:
+    """flush_fn recording written user ids, failing for poison users or while down"""
+
+    def __init__(self, poison=()):
+        self.written = []
+        self.poison = set(poison)
+        self.down = False
+        self.attempts = 0
+
+    def __call__(self, events):
+        self.attempts += 1
+        if self.down:
+            raise ConnectionError("database unavailable")
+        if any(e['user_id'] in self.poison for e in events):
+            raise PoisonError("user does not exist")
+        self.written.extend(e['user_id'] for e in events)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def journals(tmp_path):
+    opened = []
+
+    def make(flush_fn, **kwargs):
+        kwargs.setdefault('flush_interval', 0.01)
+        journal = LoginJournal(str(tmp_path), flush_fn, **kwargs)
+        opened.append(journal)
+        return journal
+
+    yield make
+    for journal in opened:
+        journal.close()
+
+
+def test_events_are_written_in_order(journals):
+    writer = RecordingWriter()
+    journal = journals(writer, batch_size=3)
+    for user_id in range(7):
+        assert journal.append(user_id, 'success')
+
+    assert wait_for(lambda: journal.pending() == 0)
+    assert writer.written == list(range(7))
+    assert journal.get_stats()['flushed'] == 7
+
+
+def test_failed_batches_stay_queued_and_are_retried(journals):
+    writer = RecordingWriter()
+    writer.down = True
+    journal = journals(writer)
+    journal.append(1, 'failed')
+    journal.append(2, 'success')
+
+    assert wait_for(lambda: writer.attempts >= 2)
+    assert journal.pending() == 2
+    assert writer.written == []
+
+    writer.down = False
+    assert wait_for(lambda: journal.pending() == 0)
+    assert writer.written == [1, 2]
+    assert journal.get_stats()['flush_failures'] >= 2
+
+
+def test_poison_events_are_dead_lettered(journals, tmp_path):
+    writer = RecordingWriter(poison={3})
+    journal = journals(writer, batch_size=10, permanent_errors=(PoisonError,), max_attempts=2)
+    for user_id in range(6):
+        journal.append(user_id, 'success')
+
+    assert wait_for(lambda: journal.pending() == 0)
+    assert sorted(writer.written) == [0, 1, 2, 4, 5]
+    assert journal.get_stats()['dead_lettered'] == 1
+
+    with open(tmp_path / 'dead-letter.jsonl') as f:
+        dead = [json.loads(line) for line in f]
+    assert [d['event']['user_id'] for d in dead] == [3]
+    assert dead[0]['error'] == "user does not exist"
+
+
+def test_transient_errors_are_never_dead_lettered(journals, tmp_path):
+    writer = RecordingWriter()
+    writer.down = True
+    journal = journals(writer, permanent_errors=(PoisonError,), max_attempts=1)
+    journal.append(1, 'success')
+
+    assert wait_for(lambda: writer.attempts >= 3)
+    assert journal.pending() == 1
+    assert not os.path.exists(tmp_path / 'dead-letter.jsonl')
+
+
+def test_full_journal_falls_back_to_sync(journals):
+    release = threading.Event()
+
+    def blocked_writer(events):
+        release.wait()
+
+    journal = journals(blocked_writer, max_pending=2, batch_size=1, block_timeout=0.01)
+    assert journal.append(1, 'success')
+    assert journal.append(2, 'success')
+    assert not journal.append(3, 'success')
+    assert journal.get_stats()['sync_fallbacks'] == 1
+    release.set()
+
+
+def test_closed_journal_falls_back_to_sync(journals):
+    journal = journals(RecordingWriter())
+    journal.close()
+    assert not journal.append(1, 'success')
+    assert journal.get_stats()['sync_fallbacks'] == 1
+
+
+def test_close_writes_the_rest_and_removes_segments(tmp_path):
+    writer = RecordingWriter()
+    journal = LoginJournal(str(tmp_path), writer, flush_interval=60)
+    journal.append(1, 'success', count_daily=True)
+    journal.close()
+
+    assert writer.written == [1]
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('segment-')]
+
+
+def test_segments_of_dead_processes_are_replayed(journals, tmp_path):
+    orphan = tmp_path / "segment-deadinstance-000001.jsonl"
+    events = [
+        {'seq': i, 'user_id': i, 'login_time': '2025-01-15T10:00:00', 'login_status': 'success',
+         'touch_last_login': True, 'count_daily': True}
+        for i in (1, 2)
+    ]
+    # The torn last line of a crash is ignored
+    orphan.write_text(''.join(json.dumps(e) + '\n' for e in events) + '{"seq": 3, "us')
+
+    replayed = []
+    journal = journals(RecordingWriter(), replay_fn=lambda batch: replayed.extend(e['user_id'] for e in batch))
+
+    assert wait_for(lambda: journal.get_stats()['replayed'] == 2)
+    assert replayed == [1, 2]
+    assert not orphan.exists()
+
+
+def orphan_events(*user_ids):
+    return ''.join(
+        json.dumps({'seq': i, 'user_id': user_id, 'login_time': '2025-01-15T10:00:00',
+                    'login_status': 'success', 'touch_last_login': False, 'count_daily': True}) + '\n'
+        for i, user_id in enumerate(user_ids, start=1)
+    )
+
+
+def test_orphan_with_this_pid_is_replayed_not_adopted(tmp_path):
+    # A restarted process can get its crashed predecessor's pid (PID 1 in a container)
+    orphan = tmp_path / f"segment-{os.getpid()}-000001.jsonl"
+    orphan.write_text(orphan_events(7, 8))
+
+    replayed = []
+    writer = RecordingWriter()
+    journal = LoginJournal(str(tmp_path), writer, flush_interval=0.01,
+                           replay_fn=lambda batch: replayed.extend(e['user_id'] for e in batch))
+    assert wait_for(lambda: journal.get_stats()['replayed'] == 2)
+    journal.append(9, 'success')
+    journal.close()
+
+    assert replayed == [7, 8]
+    assert writer.written == [9]
+    assert not orphan.exists()
+
+
+def test_locked_segments_of_live_journals_are_left_alone(journals, tmp_path):
+    live = tmp_path / "segment-otherinstance-000001.jsonl"
+    live.write_text(orphan_events(5))
+    fd = os.open(live, os.O_RDONLY)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        replayed = []
+        journal = journals(RecordingWriter(), replay_fn=lambda batch: replayed.extend(batch))
+        journal.append(1, 'success')
+        assert wait_for(lambda: journal.pending() == 0)
+        assert replayed == []
+        assert live.exists()
+    finally:
+        os.close(fd)
+
+
+def test_two_journals_never_share_a_segment(tmp_path):
+    first = LoginJournal(str(tmp_path), RecordingWriter(), flush_interval=60)
+    second = LoginJournal(str(tmp_path), RecordingWriter(), flush_interval=60)
+    try:
+        assert first._segment_path != second._segment_path
+    finally:
+        first.close()
+        second.close()
+
+
+def test_events_are_stamped_in_utc(journals):
+    events = []
+    journal = journals(events.extend)
+    journal.append(1, 'success')
+    assert wait_for(lambda: journal.pending() == 0)
+
+    login_time = event_login_time(events[0])
+    assert login_time.utcoffset() is not None
+    assert abs((datetime.now(timezone.utc) - login_time).total_seconds()) < 5
+
+
+def test_naive_stamps_are_read_as_host_local_time():
+    login_time = event_login_time({'login_time': '2025-01-15T10:00:00'})
+    assert login_time == datetime(2025, 1, 15, 10, 0).astimezone()
@@ -0,0 +1,205 @@
+"""Tests for the compiled RBAC snapshot"""
+
+import time
+
+import pytest
+
+from auth_login.rbac import RBACSnapshot, PermissionMatcher, WILDCARD, matching_permissions, role_closure
+
+PERMISSIONS = [
+    {'id': 1, 'name': 'users:read', 'module': 'users', 'action': 'read'},
+    {'id': 2, 'name': 'users:write', 'module': 'users', 'action': 'write'},
+    {'id': 3, 'name': 'reports:read', 'module': 'reports', 'action': 'read'},
+]
+
+
+def loaded_snapshot(**kwargs) -> RBACSnapshot:
+    snapshot = RBACSnapshot(**kwargs)
+    snapshot.load(PERMISSIONS, {10: [1, 2], 20: [3]})
+    return snapshot
+
+
+# ==================== RBACSnapshot ====================
+
+def test_has_all_and_has_any():
+    snapshot = loaded_snapshot()
+    assert snapshot.has_all([10], ['users:read', 'users:write'])
+    assert not snapshot.has_all([10], ['users:read', 'reports:read'])
+    assert snapshot.has_all([10, 20], ['users:read', 'reports:read'])
+    assert snapshot.has_any([20], ['users:write', 'reports:read'])
+    assert not snapshot.has_any([20], ['users:write'])
+
+
+def test_unknown_roles_and_permissions_grant_nothing():
+    snapshot = loaded_snapshot()
+    assert not snapshot.has_any([99], ['users:read'])
+    assert not snapshot.has_all([10], ['missing:perm'])
+    assert snapshot.mask_for(['users:read', 'missing:perm'])[1] == 1
+
+
+def test_set_role_replaces_one_mask():
+    snapshot = loaded_snapshot()
+    snapshot.set_role(20, [PERMISSIONS[0]])
+    assert snapshot.has_all([20], ['users:read'])
+    assert not snapshot.has_any([20], ['reports:read'])
+
+    snapshot.set_role(10, PERMISSIONS, is_active=False)
+    assert not snapshot.has_any([10], ['users:read', 'users:write'])
+
+
+def test_add_permission_takes_a_new_bit():
+    snapshot = loaded_snapshot()
+    snapshot.add_permission(4, 'reports:export', 'reports', 'export')
+    snapshot.set_role(20, [PERMISSIONS[2], {'id': 4, 'name': 'reports:export', 'module': 'reports', 'action': 'export'}])
+    assert snapshot.has_all([20], ['reports:read', 'reports:export'])
+    assert not snapshot.has_any([10], ['reports:export'])
+
+
+def test_reload_rebuilds_bit_numbering():
+    snapshot = loaded_snapshot()
+    # Renumbered rows: a stale index would give role 10 the wrong bits
+    snapshot.load([PERMISSIONS[2], PERMISSIONS[0]], {10: [1]})
+    assert snapshot.has_all([10], ['users:read'])
+    assert not snapshot.has_any([10], ['reports:read', 'users:write'])
+    assert snapshot.mask_for(['users:write'])[1] == 1
+
+
+def test_checks_during_a_reload_see_the_previous_load(monkeypatch):
+    snapshot = loaded_snapshot()
+    seen = []
+    assign_bit = RBACSnapshot._assign_bit
+
+    def checking_assign_bit(*args):
+        seen.append((snapshot.has_all([10], ['users:read', 'users:write']),
+                     snapshot.has_any([20], ['reports:read'])))
+        return assign_bit(*args)
+
+    monkeypatch.setattr(RBACSnapshot, '_assign_bit', staticmethod(checking_assign_bit))
+    snapshot.load(PERMISSIONS, {10: [1], 20: [3]})
+
+    assert seen == [(True, True)] * len(PERMISSIONS)
+    assert not snapshot.has_all([10], ['users:read', 'users:write'])
+    assert snapshot.has_all([10], ['users:read'])
+
+
+def test_max_age_expires_snapshot():
+    snapshot = loaded_snapshot(max_age=0.05)
+    assert snapshot.is_fresh()
+    time.sleep(0.1)
+    assert not snapshot.is_fresh()
+    assert loaded_snapshot(max_age=None).is_fresh()
+
+
+def test_invalidate_unloads():
+    snapshot = loaded_snapshot()
+    snapshot.invalidate()
+    assert not snapshot.loaded
+    assert not snapshot.is_fresh()
+
+
+def test_stale_role_racing_a_load_is_kept():
+    snapshot = RBACSnapshot()
+    generation = snapshot.generation
+    snapshot.mark_role_stale(10)  # arrives while the rows are being read
+    snapshot.load(PERMISSIONS, {10: [1]}, generation=generation)
+    assert snapshot.loaded
+    assert snapshot.take_stale_roles([10, 20]) == [10]
+    assert snapshot.take_stale_roles([10]) == []
+
+
+def test_stale_role_before_a_load_is_cleared():
+    snapshot = RBACSnapshot()
+    snapshot.mark_role_stale(10)
+    snapshot.load(PERMISSIONS, {10: [1]}, generation=snapshot.generation)
+    assert snapshot.take_stale_roles([10]) == []
+
+
+def test_invalidate_racing_a_load_keeps_it_unloaded():
+    snapshot = RBACSnapshot()
+    generation = snapshot.generation
+    snapshot.invalidate()
+    snapshot.load(PERMISSIONS, {10: [1]}, generation=generation)
+    assert not snapshot.loaded
+
+
+# ==================== PermissionMatcher ====================
+
+def test_matcher_literal_and_wildcard_patterns():
+    matcher = PermissionMatcher()
+    matcher.add('users', 'read', 1)
+    matcher.add('users', WILDCARD, 2)
+    matcher.add(WILDCARD, 'read', 3)
+    matcher.add(WILDCARD, WILDCARD, 4)
+
+    assert matcher.match('users', 'read') == {1, 2, 3, 4}
+    assert matcher.match('users', 'write') == {2, 4}
+    assert matcher.match('reports', 'read') == {3, 4}
+    assert matcher.match('reports', 'export') == {4}
+
+
+def test_matcher_discard_prunes_empty_patterns():
+    matcher = PermissionMatcher()
+    matcher.add('users', WILDCARD, 2)
+    matcher.add('users', 'read', 2)
+    matcher.add('users', 'read', 5)
+    assert matcher
+
+    matcher.discard(2)
+    assert matcher.match('users', 'read') == {5}
+    assert matcher.match('users', 'write') == set()
+    matcher.discard(5)
+    assert not matcher
+
+
+def test_matching_permissions_skips_patterns():
+    permissions = PERMISSIONS + [{'id': 9, 'name': 'users:*', 'module': 'users', 'action': WILDCARD}]
+    assert [p['id'] for p in matching_permissions('users', WILDCARD, permissions)] == [1, 2]
+    assert [p['id'] for p in matching_permissions(WILDCARD, 'read', permissions)] == [1, 3]
+
+
+def test_snapshot_wildcard_grants_existing_and_new_permissions():
+    users_any = {'id': 9, 'name': 'users:*', 'module': 'users', 'action': WILDCARD}
+    snapshot = RBACSnapshot()
+    snapshot.load(PERMISSIONS + [users_any], {30: [9]})
+
+    assert snapshot.has_all([30], ['users:read', 'users:write'])
+    assert not snapshot.has_any([30], ['reports:read'])
+    # Names without a permission row are answered by the pattern trie
+    assert snapshot.has_all([30], ['users:delete'])
+
+    snapshot.add_permission(5, 'users:export', 'users', 'export')
+    assert snapshot.has_all([30], ['users:export'])
+
+    snapshot.set_role(30, [PERMISSIONS[2]])
+    assert not snapshot.has_any([30], ['users:read', 'users:delete'])
+
+
+# ==================== role_closure ====================
+
+def test_closure_of_a_chain():
+    assert role_closure([(1, 2), (2, 3)]) == {(1, 2): 1, (2, 3): 1, (1, 3): 2}
+
+
+def test_closure_keeps_the_shortest_depth():
+    closure = role_closure([(1, 2), (2, 3), (3, 4), (1, 4)])
+    assert closure[(1, 4)] == 1
+    assert closure[(2, 4)] == 2
+
+
+def test_closure_of_a_diamond():
+    closure = role_closure([(1, 2), (1, 3), (2, 4), (3, 4)])
+    assert closure == {(1, 2): 1, (1, 3): 1, (2, 4): 1, (3, 4): 1, (1, 4): 2}
+
+
+def test_closure_without_edges_is_empty():
+    assert role_closure([]) == {}
+
+
+@pytest.mark.parametrize('edges', [
+    [(1, 1)],
+    [(1, 2), (2, 1)],
+    [(1, 2), (2, 3), (3, 1)],
+])
+def test_closure_rejects_cycles(edges):
+    with pytest.raises(ValueError):
+        role_closure(edges)